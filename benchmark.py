@@ -0,0 +1,313 @@
+"""
+This script measures how fast the program loads its tables and generates
+treasure, so a change to the code or the workbooks can be checked for a
+slowdown. It measures:
+
+    load.cold_ms                loading and validating every workbook
+    load.warm_ms                loading them from the compiled table cache,
+                                kept in a temporary directory
+    lookup.d{n}.per_sec         TreasureEngine._get_table_result() lookups on
+                                tables rolled on a d4 up to a d1000
+    dice.{config}.per_sec       Dice.roll() for several dice configurations
+    generate.cr{n}.mean_ms      generating one treasure, for every CR from 0
+    generate.cr{n}.p95_ms       to 41+ (41)
+
+Every random number comes from a seeded RandomStream, so runs are repeatable.
+The results are written as JSON. For example,
+
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json --tolerance 0.25
+
+the second run fails with exit status 1 if any result is more than 25% worse
+than the baseline. Names ending in 'ms' are times, where lower is better, and
+names ending in 'per_sec' are rates, where higher is better.
+"""
+from entities import Dice, RandomStream
+from functions import TreasureEngine, configure_logging
+from generate_treasure import load_tables, DATA_DIRECTORY, CONFIG_FILE, TABLE_CACHE
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SEED = 12345
+# Every measurement is repeated and the median is reported.
+REPEATS = 5
+# The die sizes of the lookup tables.
+LOOKUP_SIZES = (4, 6, 8, 10, 12, 20, 100, 1000)
+LOOKUPS = 100000
+# The dice configurations timed with Dice.roll(), by name.
+DICE_CONFIGS = {
+    'd20': {'dice_size': 20},
+    'd100': {'dice_size': 100},
+    '4d6': {'dice_size': 6, 'dice_number': 4},
+    '4d6dl1': {'dice_size': 6, 'dice_number': 4, 'drop_number': 1},
+    'd20adv': {'dice_size': 20, 'roll_type': 'advantage'},
+    '12d8dis': {'dice_size': 8, 'dice_number': 12, 'roll_type': 'disadvantage'},
+    '12d8dis_cdf': {'dice_size': 8, 'dice_number': 12, 'roll_type': 'disadvantage',
+                    'sampling': 'cdf'},
+    '500d6_approximate': {'dice_size': 6, 'dice_number': 500,
+                          'sampling': 'approximate'},
+}
+DICE_ROLLS = 20000
+CHALLENGE_RATINGS = range(0, 42)
+# The treasures generated for each CR in every repeat.
+TREASURES_PER_CR = 50
+TOLERANCE = 0.2
+
+
+def _median_time(func, repeats):
+    """
+    This function calls func repeats times and returns the median time of a
+    call in seconds.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_load(data_directory, config, repeats, max_workers=1):
+    """
+    This function times load_tables() without the table cache (cold) and with
+    it (warm). The warm runs use a cache written to a temporary directory
+    first, so the cache in data_directory is neither read nor replaced.
+    :return: dict of results
+    """
+    cold = _median_time(lambda: load_tables(data_directory, config, use_cache=False,
+                                            max_workers=max_workers), repeats)
+    with tempfile.TemporaryDirectory() as cache_directory:
+        cache_fp = os.path.join(cache_directory, TABLE_CACHE)
+        load_tables(data_directory, config, max_workers=max_workers,
+                    cache_fp=cache_fp)
+        warm = _median_time(lambda: load_tables(data_directory, config,
+                                                max_workers=max_workers,
+                                                cache_fp=cache_fp), repeats)
+    return {'load.cold_ms': cold * 1000, 'load.warm_ms': warm * 1000}
+
+
+def lookup_table(dice_size):
+    """
+    This function builds a table rolled on a d{dice_size}, in the format of the
+    magic item worksheets, with up to 100 rows of equal roll ranges.
+    :param dice_size: int
+    :return: pd.DataFrame
+    """
+    rows = min(dice_size, 100)
+    width = dice_size // rows
+    rolls = [str(low) if width == 1 else f"{low}-{low + width - 1}"
+             for low in range(1, dice_size + 1, width)]
+    return pd.DataFrame({f"d{dice_size}": rolls,
+                         'Item': [f"Item {idx}" for idx in range(len(rolls))]})
+
+
+def bench_lookups(repeats, lookups=LOOKUPS, sizes=LOOKUP_SIZES):
+    """
+    This function times TreasureEngine._get_table_result() on a table of each
+    size in sizes and returns the lookups per second.
+    :return: dict of results
+    """
+    tables = {'Benchmark': {f"d{size}": lookup_table(size) for size in sizes}}
+    engine = TreasureEngine({'tables': {'required tables': {}}}, tables)
+    rng = RandomStream(SEED)
+    results = {}
+    for size in sizes:
+        ws_name = f"d{size}"
+        rolls = [rng.randint(1, size) for _ in range(lookups)]
+        get_table_result = engine._get_table_result
+
+        def run():
+            for roll in rolls:
+                get_table_result('Benchmark', ws_name, roll)
+
+        results[f"lookup.{ws_name}.per_sec"] = lookups / _median_time(run, repeats)
+    return results
+
+
+def bench_dice(repeats, rolls=DICE_ROLLS, configs=None):
+    """
+    This function times Dice.roll() for each configuration in configs, a dict
+    of Dice arguments by name, and returns the rolls per second.
+    :return: dict of results
+    """
+    results = {}
+    for name, kwargs in (configs or DICE_CONFIGS).items():
+        dice = Dice(**kwargs)
+        rng = RandomStream(SEED)
+        dice.roll(rng=rng)
+
+        def run():
+            for _ in range(rolls):
+                dice.roll(rng=rng)
+
+        results[f"dice.{name}.per_sec"] = rolls / _median_time(run, repeats)
+    return results
+
+
+def bench_generate(config, tables, repeats, treasures=TREASURES_PER_CR,
+                   crs=CHALLENGE_RATINGS):
+    """
+    This function times TreasureEngine.generate() for every CR in crs and
+    returns the mean and 95th percentile time of a treasure in milliseconds.
+    :return: dict of results
+    """
+    engine = TreasureEngine(config, tables, rng=RandomStream(SEED))
+    results = {}
+    for cr in crs:
+        engine.generate(cr)
+        times = []
+        for _ in range(repeats * treasures):
+            start = time.perf_counter()
+            engine.generate(cr)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        results[f"generate.cr{cr}.mean_ms"] = statistics.fmean(times) * 1000
+        results[f"generate.cr{cr}.p95_ms"] = times[int(len(times) * 0.95)] * 1000
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    This function compares results with baseline, both dicts of results by
+    name, and returns the names that are more than tolerance worse, as a list
+    of (name, baseline value, value, change) tuples. change is the fraction by
+    which the result is worse. Results missing from either side are skipped.
+    :param results: dict
+    :param baseline: dict
+    :param tolerance: float, e.g. 0.2 for 20%
+    :return: list of tuples
+    """
+    regressions = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if not base or not value:
+            continue
+        if name.endswith('per_sec'):
+            change = base / value - 1
+        else:
+            change = value / base - 1
+        if change > tolerance:
+            regressions.append((name, base, value, change))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark table loading, table lookups, dice rolls, and "
+                    "treasure generation.")
+    parser.add_argument('-d', '--data-directory', default=DATA_DIRECTORY,
+                        help=f"directory with config.json and the workbooks "
+                             f"(default {DATA_DIRECTORY})")
+    parser.add_argument('-r', '--repeats', type=int, default=REPEATS,
+                        help=f"times each measurement is repeated (default "
+                             f"{REPEATS})")
+    parser.add_argument('-o', '--output', default='-',
+                        help="file the results are written to (default: stdout)")
+    parser.add_argument('--baseline', default=None,
+                        help="results of an earlier run to compare with")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help=f"fraction by which a result may be worse than the "
+                             f"baseline (default {TOLERANCE})")
+    parser.add_argument('--save-baseline', default=None,
+                        help="also write the results to this file, as the "
+                             "baseline of later runs")
+    parser.add_argument('--skip', action='append', default=[],
+                        choices=('load', 'lookup', 'dice', 'generate'),
+                        help="leave out a group of benchmarks; may be repeated")
+    parser.add_argument('--log-level', default='WARNING',
+                        help="level of the messages logged to stderr (default "
+                             "WARNING)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        configure_logging(level=args.log_level)
+    except ValueError as e:
+        print(f"benchmark: {e}", file=sys.stderr)
+        return 2
+    if args.repeats < 1:
+        logger.error("benchmark: --repeats must be at least 1.")
+        return 2
+    baseline = None
+    if args.baseline is not None:
+        try:
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)['results']
+        except (FileNotFoundError, IOError, json.decoder.JSONDecodeError, KeyError):
+            logger.error("benchmark: Baseline, %s, could not be read.", args.baseline)
+            return 2
+
+    results = {}
+    config = tables = None
+    if not {'load', 'generate'} <= set(args.skip):
+        config_fp = f"{args.data_directory}/{CONFIG_FILE}"
+        try:
+            with open(config_fp, 'r') as f:
+                config = json.load(f)
+            tables = load_tables(args.data_directory, config, use_cache=False,
+                                 max_workers=1)
+        except (FileNotFoundError, IOError, json.decoder.JSONDecodeError, KeyError,
+                ValueError) as e:
+            logger.error("benchmark: The tables in %s could not be loaded: %s",
+                         args.data_directory, e)
+            return 1
+    # The benchmarks measure the program as it normally runs, metrics included.
+    if 'load' not in args.skip:
+        logger.info("benchmark: Timing load_tables().")
+        results.update(bench_load(args.data_directory, config, args.repeats))
+    if 'lookup' not in args.skip:
+        logger.info("benchmark: Timing table lookups.")
+        results.update(bench_lookups(args.repeats))
+    if 'dice' not in args.skip:
+        logger.info("benchmark: Timing dice rolls.")
+        results.update(bench_dice(args.repeats))
+    if 'generate' not in args.skip:
+        logger.info("benchmark: Timing treasure generation.")
+        results.update(bench_generate(config, tables, args.repeats))
+
+    report = {'seed': SEED, 'repeats': args.repeats,
+              'python': platform.python_version(), 'platform': platform.platform(),
+              'data_directory': os.path.abspath(args.data_directory),
+              'workbooks': list(config['tables']['required tables'])
+              if config is not None else [],
+              'results': results}
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        report['regressions'] = {name: {'baseline': base, 'result': value,
+                                        'change': round(change, 4)}
+                                 for name, base, value, change in regressions}
+    text = json.dumps(report, indent=2) + '\n'
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    if args.save_baseline is not None:
+        with open(args.save_baseline, 'w') as f:
+            f.write(text)
+
+    if baseline is not None:
+        for name, base, value, change in regressions:
+            logger.error("benchmark: %s is %.1f%% worse than the baseline: %.4g "
+                         "against %.4g.", name, change * 100, value, base)
+        if regressions:
+            return 1
+        logger.info("benchmark: No result is more than %.0f%% worse than the "
+                    "baseline.", args.tolerance * 100)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
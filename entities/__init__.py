@@ -1,3 +1,6 @@
-from .dice import Dice, return_die_roll
+from .dice import (Dice, DiceExpression, compile_dice_expression,
+                   return_die_roll, return_die_rolls)
+from .distributions import Distribution, dice_distribution
+from .random_streams import RandomStream, return_randint
 from .treasures import (Treasure, OtherWealth, MagicItem,
                         Coin, Gem, Valuable)
\ No newline at end of file
@@ -1,4 +1,37 @@
-from random import randint
+import logging
+from functools import lru_cache
+from random import randint as _randint
+from random import random as _random
+from random import gauss as _gauss
+import re
+import numpy as np
+from .distributions import dice_distribution, sum_moments, kept_sum_moments, \
+    cornish_fisher
+from .random_streams import RandomStream
+
+logger = logging.getLogger(__name__)
+
+# NumPy generator used by the batch rolls when none is supplied.
+_generator = np.random.default_rng()
+
+# Dice notation accepted by compile_dice_expression(), after spaces are removed
+# and the string is lowercased.
+_DICE_EXPRESSION = re.compile(r"""
+    ^(?P<number>\d*)d(?P<size>\d+)
+    (?:(?P<keep>kh|kl|k|dh|dl)(?P<keep_number>\d+))?
+    (?P<roll_type>advantage|adv|disadvantage|dis)?
+    (?P<operations>(?:[x*+-]\d+)*)$""", re.VERBOSE)
+_DICE_OPERATION = re.compile(r"([x*+-])(\d+)")
+SAMPLING_MODES = ("dice", "cdf", "approximate")
+# With sampling="approximate", pools of up to this many dice use the exact
+# cumulative distribution. Larger pools use the Edgeworth approximation.
+APPROXIMATE_EXACT_MAX_DICE = 100
+# The exact distribution of a pool with dropped dice takes time growing with the
+# square of the pool and of the die size. sampling="approximate" only builds it
+# for pools of up to APPROXIMATE_EXACT_MAX_DROP_DICE dice, under 0.05 s for d100s,
+# and sampling="cdf" refuses pools of more than CDF_MAX_DROP_DICE dice.
+APPROXIMATE_EXACT_MAX_DROP_DICE = 20
+CDF_MAX_DROP_DICE = 50
 
 
 class Dice:
@@ -10,7 +43,7 @@ class Dice:
 
     def __init__(self, dice_size: int, roll_type="normal",
                  dice_number=1, drop_number=0, highest=True,
-                 debug=False):
+                 debug=False, sampling="dice"):
         """
         The values for dice_size and dice_number must be positive integers. Values
         for roll_type must be "normal", "advantage", or "disadvantage". drop_number
@@ -20,12 +53,26 @@ class Dice:
 
         The debug argument reduces the number of messages appearing in the program
         output from this Class.
+
+        sampling selects how roll() and roll_many() produce a result. "dice" rolls
+        every die. "cdf" computes the exact distribution of the total once and then
+        turns a single uniform draw into a result by looking it up in the
+        cumulative distribution. Both give the same distribution of results, but
+        "cdf" costs the same for 4d6 drop lowest or 12d8 with advantage as for 1d6.
+        "approximate" is meant for pools of hundreds of dice. It uses "cdf" for up
+        to APPROXIMATE_EXACT_MAX_DICE dice, or APPROXIMATE_EXACT_MAX_DROP_DICE
+        dice when dice are dropped, and a normal draw corrected for skewness and
+        kurtosis (Edgeworth) for larger pools, rounded and clamped to the
+        possible totals. With dropped dice, the moments of the kept dice come
+        from kept_sum_moments(). sampling_mode() reports which of these was
+        used. "cdf" with dropped dice is limited to CDF_MAX_DROP_DICE dice.
         :param dice_size: int, greater than one
         :param roll_type: str, "normal", "advantage", or "disadvantage"
         :param dice_number: int, greater than zero
         :param drop_number: int, 0 or positive integer less dice_number
         :param highest: bool
         ":param debug: bool, defaults to False
+        :param sampling: str, "dice", "cdf", or "approximate", defaults to "dice"
         """
 
         # Check the values of the parameters.
@@ -51,13 +98,21 @@ class Dice:
             raise ValueError(f"Dice: drop_number must less than dice_number. Values"
                              f"provided are drop_number: {dice_number} and "
                              f"dice_number: {dice_number}.")
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Dice: sampling must be one of {SAMPLING_MODES}. "
+                             f"Value provided is {sampling}.")
+        if sampling == "cdf" and drop_number > 0 and dice_number > CDF_MAX_DROP_DICE:
+            raise ValueError(f"Dice: sampling='cdf' with dropped dice is limited to "
+                             f"{CDF_MAX_DROP_DICE} dice. Value provided is "
+                             f"{dice_number}. Use sampling='approximate'.")
 
         self.dice_size = dice_size
-        self.roll_type = roll_type
+        self.roll_type = roll_type.lower()
         self.number_of_rolls = dice_number
         self.number_of_rolls_dropped = drop_number
         self.drop_lowest = highest
         self.debug = debug
+        self.sampling = sampling
 
     def __str__(self):
         output = f"dice_size: {self.dice_size}\n" \
@@ -72,83 +127,330 @@ class Dice:
                  f"highest={self.drop_lowest})"
         return output
 
-    def _roll_advantage(self):
+    def _roll_advantage(self, randint=_randint):
         roll1 = randint(1, self.dice_size)
         roll2 = randint(1, self.dice_size)
         if self.debug:
-            print(f"Dice.roll_advantage: roll1: {roll1}. roll2: {roll2}")
+            logger.debug("Dice.roll_advantage: roll1: %s. roll2: %s", roll1, roll2)
         if roll1 >= roll2:
             return roll1
         else:
             return roll2
 
-    def _roll_disadvantage(self):
+    def _roll_disadvantage(self, randint=_randint):
         roll1 = randint(1, self.dice_size)
         roll2 = randint(1, self.dice_size)
         if self.debug:
-            print(f"Dice.roll_disadvantage: roll1: {roll1}. roll2: {roll2}")
+            logger.debug("Dice.roll_disadvantage: roll1: %s. roll2: %s", roll1, roll2)
         if roll1 <= roll2:
             return roll1
         else:
             return roll2
 
-    def roll(self):
-        """This method implements the actual roll of the defined dice."""
+    def sampling_mode(self):
+        """
+        This method returns how roll() and roll_many() produce results for
+        these dice: "dice", "cdf", or "edgeworth". With sampling="approximate",
+        it is "cdf" for pools of up to APPROXIMATE_EXACT_MAX_DICE dice, or
+        APPROXIMATE_EXACT_MAX_DROP_DICE dice when dice are dropped, and
+        "edgeworth" for larger ones.
+        :return: str
+        """
+        if self.sampling == "approximate":
+            if self.number_of_rolls_dropped > 0:
+                exact_max_dice = APPROXIMATE_EXACT_MAX_DROP_DICE
+            else:
+                exact_max_dice = APPROXIMATE_EXACT_MAX_DICE
+            if self.number_of_rolls <= exact_max_dice:
+                return "cdf"
+            return "edgeworth"
+        return self.sampling
+
+    def _approximate(self, z):
+        """
+        This method turns standard normal draws, z, into totals with the mean,
+        standard deviation, skewness, and kurtosis of these dice, rounded and
+        clamped to the possible totals.
+        :param z: float or np.ndarray
+        :return: int or np.ndarray of int
+        """
+        kept = self.number_of_rolls - self.number_of_rolls_dropped
+        if self.number_of_rolls_dropped > 0:
+            moments = kept_sum_moments(self.dice_size, self.roll_type,
+                                       self.number_of_rolls, kept, self.drop_lowest)
+        else:
+            moments = sum_moments(self.dice_size, self.roll_type,
+                                  self.number_of_rolls)
+        mean, std, skewness, kurtosis = moments
+        total = np.rint(mean + std * cornish_fisher(z, skewness, kurtosis))
+        total = np.clip(total, kept, kept * self.dice_size).astype(np.int64)
+        if total.ndim == 0:
+            return int(total)
+        return total
+
+    def roll(self, rng=None):
+        """
+        This method implements the actual roll of the defined dice. rng is a
+        RandomStream; if it is None, the global random module is used.
+        :param rng: RandomStream or None
+        :return: int
+        """
+        mode = self.sampling_mode()
+        if mode == "cdf":
+            u = _random() if rng is None else rng.random()
+            return self.distribution().quantile(u)
+        elif mode == "edgeworth":
+            z = _gauss(0.0, 1.0) if rng is None else rng.gauss()
+            return self._approximate(z)
+        if rng is None:
+            randint = _randint
+        else:
+            randint = rng.randint
         rolls = []
         if self.debug:
-            print(f"Dice.roll: rolls: {rolls}")
+            logger.debug("Dice.roll: rolls: %s", rolls)
         for n in range(self.number_of_rolls):
             match self.roll_type:
                 case "normal":
                     roll = randint(1, self.dice_size)
                 case "advantage":
-                    roll = self._roll_advantage()
+                    roll = self._roll_advantage(randint)
                 case "disadvantage":
-                    roll = self._roll_disadvantage()
+                    roll = self._roll_disadvantage(randint)
 
             rolls.append(roll)
 
         rolls.sort()
         if self.debug:
-            print(f"Dice.roll: rolls: {rolls}")
+            logger.debug("Dice.roll: rolls: %s", rolls)
         if self.number_of_rolls_dropped > 0:
             if self.drop_lowest:
                 rolls_final = rolls[self.number_of_rolls_dropped:]
             else:
                 rolls_final = rolls[0: -self.number_of_rolls_dropped]
             if self.debug:
-                print(f"Dice.roll: rolls_final: {rolls_final}")
+                logger.debug("Dice.roll: rolls_final: %s", rolls_final)
             return sum(rolls_final)
         else:
             return sum(rolls)
 
+    def distribution(self):
+        """
+        This method returns the exact Distribution of the totals of roll(),
+        including advantage, disadvantage, and dropped dice. It is computed
+        without rolling, so it answers questions such as the mean or the 90th
+        percentile of a roll directly.
+        :return: Distribution
+        """
+        return dice_distribution(self.dice_size, self.roll_type,
+                                 self.number_of_rolls, self.number_of_rolls_dropped,
+                                 self.drop_lowest)
+
+    def roll_many(self, n: int, rng=None):
+        """
+        This method makes n independent rolls of the defined dice at once and
+        returns their totals as a NumPy array. Every die is drawn in a single
+        array operation, so large batches avoid the per-die Python overhead of
+        roll(). Advantage and disadvantage draw a second array and keep the
+        higher or lower die. Dropped dice are removed after sorting each roll.
+        :param n: int, number of rolls, zero or greater
+        :param rng: RandomStream, np.random.Generator, or None, defaults to the
+            module generator
+        :return: np.ndarray of int with n elements
+        """
+        if not isinstance(n, (int, np.integer)) or n < 0:
+            raise ValueError(f"Dice.roll_many: n must be zero or a positive integer. "
+                             f"Value provided is {n}.")
+        if rng is None:
+            rng = _generator
+        elif isinstance(rng, RandomStream):
+            rng = rng.generator
+        mode = self.sampling_mode()
+        if mode == "cdf":
+            return self.distribution().quantiles(rng.random(n))
+        elif mode == "edgeworth":
+            return self._approximate(rng.standard_normal(n))
+        shape = (n, self.number_of_rolls)
+        rolls = rng.integers(1, self.dice_size, size=shape, endpoint=True)
+        match self.roll_type:
+            case "advantage":
+                np.maximum(rolls, rng.integers(1, self.dice_size, size=shape,
+                                               endpoint=True), out=rolls)
+            case "disadvantage":
+                np.minimum(rolls, rng.integers(1, self.dice_size, size=shape,
+                                               endpoint=True), out=rolls)
+        if self.number_of_rolls_dropped > 0:
+            rolls.sort(axis=1)
+            if self.drop_lowest:
+                rolls = rolls[:, self.number_of_rolls_dropped:]
+            else:
+                rolls = rolls[:, :-self.number_of_rolls_dropped]
+        if self.debug:
+            logger.debug("Dice.roll_many: n: %s. rolls: %s", n, rolls)
+        return rolls.sum(axis=1)
+
+
+class DiceExpression:
+    """
+    This class is a compiled dice expression, such as '2d8 x 100' or '4d6kh3'.
+    It holds the Dice to roll and the list of arithmetic operations applied to
+    the total, in the order they were written. Instances are created by
+    compile_dice_expression(), which parses each distinct string only once.
+    """
+    def __init__(self, text: str, dice: Dice, operations: tuple):
+        """
+        :param text: str, the expression without spaces, in lowercase
+        :param dice: Dice
+        :param operations: tuple of 2-tuples of str ('x', '+', or '-') and int
+        """
+        self.text = text
+        self.dice = dice
+        self.operations = operations
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"DiceExpression('{self.text}')"
+
+    def _apply(self, total):
+        for op, k in self.operations:
+            match op:
+                case 'x':
+                    total = total * k
+                case '+':
+                    total = total + k
+                case '-':
+                    total = total - k
+        return total
+
+    def roll(self, rng=None):
+        """
+        This method rolls the dice once and returns the result as an int.
+        :param rng: RandomStream or None
+        :return: int
+        """
+        return self._apply(self.dice.roll(rng=rng))
+
+    def distribution(self):
+        """
+        This method returns the exact Distribution of the expression, with its
+        operations applied to the Distribution of its dice.
+        :return: Distribution
+        """
+        distribution = self.dice.distribution()
+        for op, k in self.operations:
+            match op:
+                case 'x':
+                    distribution = distribution.scale(k)
+                case '+':
+                    distribution = distribution.shift(k)
+                case '-':
+                    distribution = distribution.shift(-k)
+        return distribution
+
+    def roll_many(self, n: int, rng=None):
+        """
+        This method rolls the expression n times with Dice.roll_many() and
+        returns the results as a NumPy array.
+        :param n: int
+        :param rng: RandomStream, np.random.Generator, or None
+        :return: np.ndarray of int
+        """
+        return self._apply(self.dice.roll_many(n, rng=rng))
+
+
+@lru_cache(maxsize=1024)
+def compile_dice_expression(s, debug=False):
+    """
+    This function compiles a dice expression into a DiceExpression. The
+    results are cached by string, so each expression is parsed only once. The
+    notation is, in order:
+        ndm or nDm      n dice with m sides. n defaults to 1, as in 'd20'.
+        khk, klk, or k  keep the k highest (kh or k) or lowest (kl) dice
+        dhk or dlk      drop the k highest (dh) or lowest (dl) dice
+        adv or dis      roll each die with advantage or disadvantage (the
+                        full words also work)
+        x k, * k, + k, - k  multiply, add, or subtract, applied left to right
+    Spaces are ignored. A ValueError is raised for anything else, including
+    dice that Dice itself rejects. debug is passed on to the Dice.
+    :param s: str
+    :param debug: bool, defaults to False
+    :return: DiceExpression
+    """
+    text = ''.join(str(s).lower().split())
+    match = _DICE_EXPRESSION.match(text)
+    if match is None:
+        raise ValueError(f"compile_dice_expression: The dice expression, {s}, must "
+                         f"be in the format 'ndm' or 'nDm', where n and m are "
+                         f"integers, optionally followed by keep/drop (kh, kl, dh, "
+                         f"dl), adv or dis, and 'x k', '+ k', or '- k'.")
+    dice_number = int(match['number']) if match['number'] != '' else 1
+    drop_number = 0
+    highest = True
+    if match['keep'] is not None:
+        keep_number = int(match['keep_number'])
+        match match['keep']:
+            case 'kh' | 'k':
+                drop_number = dice_number - keep_number
+            case 'kl':
+                drop_number = dice_number - keep_number
+                highest = False
+            case 'dl':
+                drop_number = keep_number
+            case 'dh':
+                drop_number = keep_number
+                highest = False
+    roll_type = "normal"
+    if match['roll_type'] is not None:
+        if match['roll_type'].startswith('adv'):
+            roll_type = "advantage"
+        else:
+            roll_type = "disadvantage"
+    dice = Dice(int(match['size']), roll_type=roll_type, dice_number=dice_number,
+                drop_number=drop_number, highest=highest, debug=debug)
+    operations = tuple(('x' if op == '*' else op, int(k))
+                       for op, k in _DICE_OPERATION.findall(match['operations']))
+    return DiceExpression(text, dice, operations)
+
 
 # Useful functions to help use Dice are below.
-def return_die_roll(s, debug=False):
+def return_die_roll(s, debug=False, rng=None):
     """
-    This function takes a string in format ndm or nDm where n and m are
-    integers. It will return the die roll called for.
-    The parameter, debug, controls the output of debug messages.
+    This function takes a dice expression, such as 'ndm' or 'nDm' where n and
+    m are integers, and returns the die roll called for. The expression is
+    compiled by compile_dice_expression(), so each string is parsed only once.
+    The parameter, debug, controls the output of debug messages, including
+    those of the Dice rolled. rng is the RandomStream to roll with; if it is
+    None, the global random module is used.
     :param s: str
     :param debug: bool, defaults to False
+    :param rng: RandomStream or None
     :return: int
     """
-    s = s.lower()
-    l = s.split('d')
+    expression = compile_dice_expression(s, debug)
+    result = expression.roll(rng=rng)
+    if debug:
+        logger.debug("return_die_roll: s: %s. expression: %r. result: %s.", s,
+                     expression, result)
+    return result
+
+
+def return_die_rolls(s, number, rng=None, debug=False):
+    """
+    This function is the batch form of return_die_roll(). It takes a dice
+    expression and returns a NumPy array of number rolls of it, made with
+    Dice.roll_many().
+    :param s: str
+    :param number: int, number of rolls
+    :param rng: RandomStream, np.random.Generator, or None
+    :param debug: bool, defaults to False
+    :return: np.ndarray of int
+    """
+    expression = compile_dice_expression(s, debug)
     if debug:
-        print(f"return_die_roll: s: {s}. l: {l}.")
-    try:
-        n = int(l[0])
-        m = int(l[1])
-        if debug:
-            print(f"return_die_roll: n: {n}. m: {m}.")
-    except ValueError:
-        error_msg = (f"Dice.return_die_roll: The string provided must be in the "
-                     f"format 'ndm' or 'nDm' where n and m are integers. The"
-                     f"string supplied is {s}.")
-        raise ValueError(error_msg)
-
-    return Dice(m, dice_number=n, debug=debug).roll()
+        logger.debug("return_die_rolls: s: %s. expression: %r.", s, expression)
+    return expression.roll_many(number, rng=rng)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,363 @@
+from bisect import bisect_right
+from functools import lru_cache
+from math import comb, erf, exp, pi
+import numpy as np
+
+
+class Distribution:
+    """
+    This class is an exact discrete probability distribution over integer
+    values, such as the totals of a dice roll. values holds the possible
+    outcomes in increasing order and probabilities holds the probability of
+    each. Both are NumPy arrays of the same length. Distributions are built
+    by the functions below and are not meant to be changed afterwards.
+    """
+    def __init__(self, values, probabilities):
+        self.values = np.asarray(values, dtype=np.int64)
+        self.probabilities = np.asarray(probabilities, dtype=np.float64)
+        self._cumulative = np.cumsum(self.probabilities)
+        # Plain lists make single lookups by quantile() faster than NumPy.
+        self._value_list = None
+        self._cumulative_list = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return (f"Distribution(min={self.min()}, max={self.max()}, "
+                f"mean={self.mean():.4f})")
+
+    def min(self):
+        return int(self.values[0])
+
+    def max(self):
+        return int(self.values[-1])
+
+    def mean(self):
+        """This method returns the expected value of the distribution."""
+        return float(np.dot(self.values, self.probabilities))
+
+    def variance(self):
+        """This method returns the variance of the distribution."""
+        deviation = self.values - self.mean()
+        return float(np.dot(deviation * deviation, self.probabilities))
+
+    def std(self):
+        """This method returns the standard deviation of the distribution."""
+        return self.variance() ** 0.5
+
+    def pmf(self, x):
+        """
+        This method returns the probability that the outcome equals x.
+        :param x: int
+        :return: float
+        """
+        idx = np.searchsorted(self.values, x)
+        if idx < len(self.values) and self.values[idx] == x:
+            return float(self.probabilities[idx])
+        return 0.0
+
+    def cdf(self, x):
+        """
+        This method returns the probability that the outcome is x or less.
+        :param x: int or float
+        :return: float
+        """
+        idx = np.searchsorted(self.values, x, side='right')
+        if idx == 0:
+            return 0.0
+        return min(float(self._cumulative[idx - 1]), 1.0)
+
+    def percentile(self, q):
+        """
+        This method returns the smallest outcome whose cdf is at least q
+        percent. percentile(50) is the median.
+        :param q: float, from 0 to 100
+        :return: int
+        """
+        if q < 0 or q > 100:
+            raise ValueError(f"Distribution.percentile: q must be between 0 and "
+                             f"100. Value provided is {q}.")
+        # The small tolerance keeps rounding errors in the cumulative sum from
+        # skipping an outcome that reaches q exactly.
+        idx = np.searchsorted(self._cumulative, q / 100 - 1e-12)
+        return int(self.values[min(idx, len(self.values) - 1)])
+
+    def quantile(self, u):
+        """
+        This method returns the outcome at the cumulative probability u. If u is
+        drawn uniformly from [0, 1), the outcomes follow this distribution,
+        which is how Dice samples with sampling="cdf".
+        :param u: float, from 0 to 1
+        :return: int
+        """
+        if self._value_list is None:
+            self._value_list = self.values.tolist()
+            self._cumulative_list = self._cumulative.tolist()
+        idx = bisect_right(self._cumulative_list, u)
+        return self._value_list[min(idx, len(self._value_list) - 1)]
+
+    def quantiles(self, u):
+        """
+        This method is the array form of quantile().
+        :param u: np.ndarray of float, from 0 to 1
+        :return: np.ndarray of int
+        """
+        idx = np.searchsorted(self._cumulative, u, side='right')
+        return self.values[np.minimum(idx, len(self.values) - 1)]
+
+    def add(self, other):
+        """
+        This method returns the distribution of the sum of an outcome of this
+        distribution and an independent outcome of other.
+        :param other: Distribution
+        :return: Distribution
+        """
+        if _is_contiguous(self) and _is_contiguous(other):
+            return Distribution(np.arange(self.min() + other.min(),
+                                          self.max() + other.max() + 1),
+                                np.convolve(self.probabilities, other.probabilities))
+        totals = np.add.outer(self.values, other.values).ravel()
+        weights = np.multiply.outer(self.probabilities, other.probabilities).ravel()
+        values, inverse = np.unique(totals, return_inverse=True)
+        return Distribution(values, np.bincount(inverse, weights=weights))
+
+    def shift(self, k):
+        """
+        This method returns the distribution of the outcome plus k.
+        :param k: int
+        :return: Distribution
+        """
+        return Distribution(self.values + k, self.probabilities)
+
+    def scale(self, k):
+        """
+        This method returns the distribution of the outcome multiplied by k.
+        :param k: int
+        :return: Distribution
+        """
+        if k < 0:
+            return Distribution(self.values[::-1] * k, self.probabilities[::-1])
+        elif k == 0:
+            return Distribution([0], [1.0])
+        return Distribution(self.values * k, self.probabilities)
+
+
+def _is_contiguous(distribution):
+    return distribution.max() - distribution.min() + 1 == len(distribution)
+
+
+def single_die_probabilities(dice_size, roll_type="normal"):
+    """
+    This function returns the probabilities of rolling 1 to dice_size on one
+    die, as a NumPy array. With advantage the die is the higher of two rolls,
+    with disadvantage the lower.
+    :param dice_size: int
+    :param roll_type: str, "normal", "advantage", or "disadvantage"
+    :return: np.ndarray of float
+    """
+    faces = np.arange(1, dice_size + 1, dtype=np.float64)
+    match roll_type.lower():
+        case "advantage":
+            return (faces ** 2 - (faces - 1) ** 2) / dice_size ** 2
+        case "disadvantage":
+            return ((dice_size - faces + 1) ** 2 - (dice_size - faces) ** 2) / \
+                dice_size ** 2
+        case _:
+            return np.full(dice_size, 1 / dice_size)
+
+
+def _sum_distribution(probabilities, dice_number):
+    """
+    This function returns the distribution of the sum of dice_number dice with
+    the single die probabilities, by repeated squaring of the convolution.
+    """
+    result = np.array([1.0])
+    power = probabilities
+    n = dice_number
+    while n > 0:
+        if n & 1:
+            result = np.convolve(result, power)
+        n >>= 1
+        if n > 0:
+            power = np.convolve(power, power)
+    return Distribution(np.arange(dice_number, dice_number * len(probabilities) + 1),
+                        result)
+
+
+def _kept_sum_distribution(probabilities, dice_number, keep_number, keep_highest):
+    """
+    This function returns the distribution of the sum of the keep_number
+    highest (or lowest) of dice_number dice. The faces are visited from the
+    kept end. state[j, s] is the probability that j dice have been assigned to
+    the faces visited so far and the kept ones among them sum to s. The number
+    of the remaining dice that show the current face is binomial, given that
+    they all show this face or one not yet visited.
+    """
+    dice_size = len(probabilities)
+    faces = list(range(dice_size, 0, -1)) if keep_highest else list(range(1, dice_size + 1))
+    remaining_mass = 1.0
+    max_sum = keep_number * dice_size
+    state = np.zeros((dice_number + 1, max_sum + 1))
+    state[0, 0] = 1.0
+    for face in faces:
+        p = probabilities[face - 1]
+        q = min(p / remaining_mass, 1.0) if remaining_mass > 0 else 1.0
+        new_state = np.zeros_like(state)
+        for j in range(dice_number + 1):
+            row = state[j]
+            if not row.any():
+                continue
+            left = dice_number - j
+            for c in range(left + 1):
+                weight = comb(left, c) * q ** c * (1 - q) ** (left - c)
+                if weight == 0.0:
+                    continue
+                kept = min(c, max(keep_number - j, 0))
+                shift = kept * face
+                if shift == 0:
+                    new_state[j + c] += weight * row
+                else:
+                    new_state[j + c, shift:] += weight * row[:-shift]
+        state = new_state
+        remaining_mass -= p
+    sums = state[dice_number]
+    return Distribution(np.arange(keep_number, max_sum + 1), sums[keep_number:])
+
+
+@lru_cache(maxsize=256)
+def dice_distribution(dice_size, roll_type="normal", dice_number=1, drop_number=0,
+                      highest=True):
+    """
+    This function returns the exact Distribution of a Dice roll with the same
+    arguments as Dice. It is computed by convolution when no dice are dropped
+    and by dynamic programming over the face values when some are. Results
+    are cached by their arguments.
+    :param dice_size: int
+    :param roll_type: str, "normal", "advantage", or "disadvantage"
+    :param dice_number: int
+    :param drop_number: int
+    :param highest: bool, True drops the lowest dice, False the highest
+    :return: Distribution
+    """
+    probabilities = single_die_probabilities(dice_size, roll_type)
+    if drop_number == 0:
+        return _sum_distribution(probabilities, dice_number)
+    return _kept_sum_distribution(probabilities, dice_number,
+                                  dice_number - drop_number, highest)
+
+
+@lru_cache(maxsize=256)
+def sum_moments(dice_size, roll_type="normal", dice_number=1):
+    """
+    This function returns the mean, standard deviation, skewness, and excess
+    kurtosis of the sum of dice_number dice, with no dice dropped. They are
+    found from the cumulants of one die, which add up over independent dice,
+    so the cost does not depend on dice_number.
+    :param dice_size: int
+    :param roll_type: str, "normal", "advantage", or "disadvantage"
+    :param dice_number: int
+    :return: 4-tuple of float
+    """
+    probabilities = single_die_probabilities(dice_size, roll_type)
+    faces = np.arange(1, dice_size + 1, dtype=np.float64)
+    mean, k2, k3, k4 = _cumulants(faces, probabilities)
+    return (dice_number * mean, (dice_number * k2) ** 0.5,
+            k3 / (k2 ** 1.5 * dice_number ** 0.5), k4 / (k2 ** 2 * dice_number))
+
+
+def _cumulants(values, probabilities):
+    """
+    This function returns the mean and the second, third, and fourth cumulants
+    of a variable that takes values with probabilities.
+    """
+    mean = float(np.dot(values, probabilities))
+    deviation = values - mean
+    k2 = float(np.dot(deviation ** 2, probabilities))
+    k3 = float(np.dot(deviation ** 3, probabilities))
+    k4 = float(np.dot(deviation ** 4, probabilities)) - 3 * k2 ** 2
+    return mean, k2, k3, k4
+
+
+@lru_cache(maxsize=256)
+def kept_sum_moments(dice_size, roll_type="normal", dice_number=1, keep_number=1,
+                     keep_highest=True):
+    """
+    This function returns the approximate mean, standard deviation, skewness,
+    and excess kurtosis of the sum of the keep_number highest (or lowest) of
+    dice_number dice, at a cost that does not depend on dice_number.
+
+    The kept dice are cut off at the face, t, where the expected share of dice
+    showing t or more (or t or less) first reaches keep_number / dice_number.
+    When at least keep_number dice show t or more, the kept sum is exactly
+    t * keep_number plus the sum over every die of how far it lies above t,
+    counting lower dice as 0: a sum of independent draws. Otherwise the
+    missing dice, M, show less than t, which the sum corrects by M, taking M as
+    the positive part of a normal count correlated with the sum. The
+    correction matters when the cut falls on the edge of a face, such as
+    keeping half of a pool of d6.
+    :param dice_size: int
+    :param roll_type: str, "normal", "advantage", or "disadvantage"
+    :param dice_number: int
+    :param keep_number: int, from 1 to dice_number
+    :param keep_highest: bool, True keeps the highest dice, False the lowest
+    :return: 4-tuple of float
+    """
+    probabilities = single_die_probabilities(dice_size, roll_type)
+    faces = np.arange(1, dice_size + 1, dtype=np.float64)
+    share = keep_number / dice_number
+    if keep_highest:
+        # reach[i] is the chance that a die shows face i + 1 or more.
+        reach = np.cumsum(probabilities[::-1])[::-1]
+        cut = int(np.nonzero(reach >= share - 1e-12)[0][-1]) + 1
+        beyond = np.where(faces > cut, faces - cut, 0.0)
+        sign = -1.0
+    else:
+        reach = np.cumsum(probabilities)
+        cut = int(np.nonzero(reach >= share - 1e-12)[0][0]) + 1
+        beyond = np.where(faces < cut, faces - cut, 0.0)
+        sign = 1.0
+    mean, k2, k3, k4 = _cumulants(beyond, probabilities)
+    mean, k2, k3, k4 = (cut * keep_number + dice_number * mean, dice_number * k2,
+                        dice_number * k3, dice_number * k4)
+
+    # The shortfall, keep_number less the dice reaching the cut, is close to
+    # normal. Its positive part is the number of kept dice short of the cut.
+    reached = float(reach[cut - 1])
+    shortfall_mean = keep_number - dice_number * reached
+    shortfall_var = dice_number * reached * (1 - reached)
+    if shortfall_var > 0:
+        shortfall_std = shortfall_var ** 0.5
+        ratio = shortfall_mean / shortfall_std
+        below = 0.5 * (1 + erf(ratio / 2 ** 0.5))
+        density = exp(-ratio ** 2 / 2) / (2 * pi) ** 0.5
+        short = shortfall_mean * below + shortfall_std * density
+        short_square = (shortfall_mean ** 2 + shortfall_var) * below + \
+            shortfall_mean * shortfall_std * density
+        # Stein's lemma gives the covariance of the sum with the positive part.
+        covariance = -dice_number * float(np.dot(beyond, probabilities)) * \
+            (1 - reached) * below
+        mean += sign * short
+        k2 += short_square - short ** 2 + 2 * sign * covariance
+    elif shortfall_mean > 0:
+        mean += sign * shortfall_mean
+    if k2 <= 0.0:
+        return mean, 0.0, 0.0, 0.0
+    return mean, k2 ** 0.5, k3 / k2 ** 1.5, k4 / k2 ** 2
+
+
+def cornish_fisher(z, skewness, kurtosis):
+    """
+    This function turns a standard normal draw, z, into a standardized draw
+    from a distribution with the given skewness and excess kurtosis. It is the
+    Cornish-Fisher expansion, the quantile form of the Edgeworth expansion. z
+    can be a float or a NumPy array.
+    :param z: float or np.ndarray
+    :param skewness: float
+    :param kurtosis: float
+    :return: float or np.ndarray
+    """
+    z2 = z * z
+    return (z + (z2 - 1) * skewness / 6 + (z2 * z - 3 * z) * kurtosis / 24 -
+            (2 * z2 * z - 5 * z) * skewness ** 2 / 36)
+
@@ -0,0 +1,82 @@
+import random
+import numpy as np
+
+
+class RandomStream:
+    """
+    This class is a seedable source of random numbers for Dice and treasure
+    generation. It holds a random.Random, random_source, for single rolls and
+    a NumPy Generator, generator, for batch rolls, both derived from one
+    np.random.SeedSequence. The same seed always replays the same rolls.
+
+    spawn() splits a stream into independent child streams, one per worker,
+    so parallel runs started from one seed are both reproducible and
+    statistically independent. A stream can be pickled and sent to another
+    process.
+    """
+    def __init__(self, seed=None, seed_sequence=None):
+        """
+        seed is an int or None. None draws fresh entropy from the operating
+        system; the seed actually used is kept in the seed attribute so a
+        session can be replayed. seed_sequence is used by spawn() and
+        overrides seed.
+        :param seed: int or None
+        :param seed_sequence: np.random.SeedSequence or None
+        """
+        if seed_sequence is None:
+            seed_sequence = np.random.SeedSequence(seed)
+        self.seed_sequence = seed_sequence
+        self.seed = seed_sequence.entropy
+        self.generator = np.random.default_rng(seed_sequence)
+        state = seed_sequence.generate_state(4, np.uint32)
+        self.random_source = random.Random(int.from_bytes(state.tobytes(), 'little'))
+
+    def __repr__(self):
+        return (f"RandomStream(seed={self.seed}, "
+                f"spawn_key={self.seed_sequence.spawn_key})")
+
+    def randint(self, a: int, b: int):
+        """
+        This method returns a random integer from a to b, inclusive.
+        :param a: int
+        :param b: int
+        :return: int
+        """
+        return self.random_source.randint(a, b)
+
+    def random(self):
+        """
+        This method returns a random float from 0 up to, but not including, 1.
+        :return: float
+        """
+        return self.random_source.random()
+
+    def gauss(self):
+        """
+        This method returns a draw from the standard normal distribution.
+        :return: float
+        """
+        return self.random_source.gauss(0.0, 1.0)
+
+    def spawn(self, n: int):
+        """
+        This method returns a list of n independent child streams.
+        :param n: int
+        :return: list of RandomStream
+        """
+        return [RandomStream(seed_sequence=child)
+                for child in self.seed_sequence.spawn(n)]
+
+
+def return_randint(a, b, rng=None):
+    """
+    This function returns a random integer from a to b, inclusive, from rng,
+    a RandomStream. If rng is None, the global random module is used.
+    :param a: int
+    :param b: int
+    :param rng: RandomStream or None
+    :return: int
+    """
+    if rng is None:
+        return random.randint(a, b)
+    return rng.randint(a, b)
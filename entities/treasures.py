@@ -1,5 +1,8 @@
+import logging
 from collections import namedtuple
 
+logger = logging.getLogger(__name__)
+
 # value is an integer or float in the main currency for the game.  For D&D, that
 # would be integer gold pieces. For TFT, that would silver dollars.
 Gem = namedtuple('Gem',
@@ -68,16 +71,15 @@ class OtherWealth:
                          f"{self.max_index}. Adding to the end of the list "
                          f"instead.")
             index = None
-            print(error_msg)
+            logger.warning(error_msg)
         if isinstance(item, Gem) or isinstance(item, Valuable):
             if index is not None:
                 self.item_list.insert(index, item)
-                msg = (f"OtherWealth: Inserted item {item} into index "
-                       f"{index}.")
+                logger.debug("OtherWealth: Inserted item %s into index %s.", item,
+                             index)
             else:
                 self.item_list.append(item)
-                msg = f"OtherWealth: Added item {item} to end of list."
-            print(msg)
+                logger.debug("OtherWealth: Added item %s to end of list.", item)
         else:
             error_msg = (f"OtherWealth.add_item: Only items of type Gem or Valuable "
                          f"may added to OtherWealth objects. items is type "
@@ -100,14 +102,14 @@ class OtherWealth:
             error_msg = (f"OtherWealth.replace_item: Index was beyond the range of "
                          f"the OtherWealth object. Cannot continue. IndexError "
                          f"trapped.")
-            print(error_msg)
+            logger.warning(error_msg)
             return False
         if not(isinstance(item, Gem) or isinstance(item, Valuable)):
             error_msg = (f"OtherWealth.replace_item: item must be of type Gem or "
                          f"type Valuable. Instead it is type {type(item)}, which"
                          f"cannot be added to OtherWealth objects. TypeError "
                          f"trapped.")
-            print(error_msg)
+            logger.warning(error_msg)
             return False
         self.delete_item(index)
         self.add_item(item, index)
@@ -124,14 +126,14 @@ class OtherWealth:
         """
         if self.max_index >= index:
             item = self.item_list.pop(index)
-            print(f"OtherWealth.delete_item: Item, {item}, removed from "
-                  f"OtherWealth object at index {index}.")
+            logger.debug("OtherWealth.delete_item: Item, %s, removed from "
+                         "OtherWealth object at index %s.", item, index)
             self.max_index = self.__len__() - 1
             return item
         else:
             error_msg = (f"OtherWealth.delete_item: Index is out of range "
                          f"for this object. max_index is {self.max_index}.")
-            print(error_msg)
+            logger.warning(error_msg)
             return False
 
 
@@ -169,6 +171,29 @@ class Treasure:
                     s += f"Cash: {item.number} {item.type}\n"
             return s.replace('\n\n', '\n')
 
+    def to_dict(self):
+        """
+        This method returns the contents of the treasure as a dict of lists,
+        ready to be written as JSON. The keys are 'coins', 'magic_items',
+        'gems', and 'valuables', and each item is a dict of its fields. Items
+        keep the order they have in item_list.
+        :return: dict
+        """
+        d = {'coins': [], 'magic_items': [], 'gems': [], 'valuables': []}
+        for item in self.item_list:
+            if isinstance(item, Coin):
+                d['coins'].append(item._asdict())
+            elif isinstance(item, MagicItem):
+                d['magic_items'].append({'name': item.item_name,
+                                         'source': item.item_source})
+            else:
+                for other_item in item.item_list:
+                    if isinstance(other_item, Gem):
+                        d['gems'].append(other_item._asdict())
+                    else:
+                        d['valuables'].append(other_item._asdict())
+        return d
+
     def add_item(self, item, index=None):
         """
         This method adds an item to Treasure.item_list. The item must
@@ -186,19 +211,18 @@ class Treasure:
                          f"of range {self.max_index}. Adding item to end of "
                          f"list instead.")
             index = None
-            print(error_msg)
+            logger.warning(error_msg)
         if (isinstance(item, Coin) or
                 isinstance(item, OtherWealth) or
                 isinstance(item, MagicItem)):
             if index is not None:
                 self.item_list.insert(index, item)
-                msg = (f"Treasure.add_item: Inserted item {item} into "
-                       f"index, {index}.")
+                logger.debug("Treasure.add_item: Inserted item %s into index, %s.",
+                             item, index)
             else:
                 self.item_list.append(item)
-                msg = (f"Treasure.add_item: Added item {item} to the "
-                       f"end of the list.")
-            print(msg)
+                logger.debug("Treasure.add_item: Added item %s to the end of the "
+                             "list.", item)
 
         elif (isinstance(item, Gem) or
                 isinstance(item, Valuable)):
@@ -226,14 +250,14 @@ class Treasure:
         """
         if self.max_index >= index:
             item = self.item_list.pop(index)
-            print(f"Treasure.remove_item: The item, {item}, at index, {index},"
-                  f"has been removed.")
+            logger.debug("Treasure.remove_item: The item, %s, at index, %s,has been "
+                         "removed.", item, index)
             self.max_index = len(self.item_list) - 1
             return item
         else:
             error_msg = (f"Treasure.remove_item: The index, {index}, is out of "
                          f"range for this object. max_index is {self.max_index}")
-            print(error_msg)
+            logger.warning(error_msg)
             return False
 
     def replace_item(self, new_item, index: int):
@@ -251,7 +275,7 @@ class Treasure:
             error_msg = (f"Treasure.replace_item: Index is out of range for "
                          f"this treasure object. Cannot continue. IndexError "
                          f"trapped.")
-            print(error_msg)
+            logger.warning(error_msg)
             return False
 
         if not (isinstance(new_item, Coin) or
@@ -262,13 +286,13 @@ class Treasure:
             error_msg = (f"Treasure.replace_item: Treasure can only use Coin, "
                          f"MagicItem, and OtherValuable objects, not "
                          f"{type(new_item)}.")
-            print(error_msg)
+            logger.warning(error_msg)
             return False
         elif isinstance(new_item, Gem) or isinstance(new_item, Valuable):
             error_msg = (f"Treasure.replace_item: Gem and Valuable items "
                          f"must be added to an OtherValuable and the latter "
                          f"added to Treasure.")
-            print(error_msg)
+            logger.warning(error_msg)
             return False
 
         self.remove_item(index)
@@ -5,3 +5,46 @@ from .data_checks import check_worksheet
 from .data_checks import check_string
 from .data_checks import fix_worksheet
 from .text_manipulation import return_range
+from .table_loading import clean_worksheet
+from .table_loading import load_workbook
+from .table_loading import load_workbooks
+from .table_cache import fingerprint_workbook
+from .table_cache import read_table_cache
+from .table_cache import find_cached_tables
+from .table_cache import write_table_cache
+from .table_cache import is_cacheable
+from .table_loading import validate_workbook
+from .table_loading import load_and_validate_workbook
+from .table_loading import LazyWorkbook
+from .table_loading import open_lazy_workbook
+from .table_cache import find_changed_files
+from .roll_tables import RollTable
+from .roll_tables import RollTableIndex
+from .treasure_index import find_cr_workbook
+from .treasure_index import parse_cr_worksheet_title
+from .treasure_index import CRIndex
+from .treasure_index import build_cr_index
+from .workbook_roles import strip_workbook_extension
+from .workbook_roles import WorkbookRegistry
+from .treasure_plans import CoinPlan
+from .treasure_plans import MagicPlan
+from .treasure_plans import OtherValPlan
+from .treasure_plans import compile_treasure_result
+from .treasure_plans import TreasurePlans
+from .treasure_engine import TreasureIssue
+from .treasure_engine import TreasureError
+from .treasure_engine import TreasureResult
+from .treasure_engine import TreasureEngine
+from .treasure_pool import materialize_tables
+from .treasure_pool import generate_treasures
+from .treasure_engine import parse_cr_list
+from .treasure_output import json_default
+from .treasure_output import treasure_record
+from .treasure_output import treasure_rows
+from .treasure_output import CSV_FIELDS
+from .treasure_server import TreasureServer
+from .logging_config import configure_logging
+from .instrumentation import Metrics
+from .instrumentation import metrics
+from .profiling import Profiler
+from .profiling import collapsed_stacks
@@ -1,9 +1,14 @@
+import logging
 import os.path
 import pandas as pd
 import numpy as np
-from entities import return_die_roll
+from entities import compile_dice_expression
+from .instrumentation import metrics
 
+logger = logging.getLogger(__name__)
 
+
+@metrics.timed('load.fix_worksheet')
 def fix_worksheet(table: pd.DataFrame):
     """
     An error in Pandas conversion of some worksheets can result in first
@@ -20,32 +25,32 @@ def fix_worksheet(table: pd.DataFrame):
     cols = table.columns
     roll_col_name = ''
     col_no = None
-    print(f"fix_worksheet: table: {table}.")
-    print(f"fix_worksheet: cols: {cols}.")
+    logger.debug("fix_worksheet: table: %s.", table)
+    logger.debug("fix_worksheet: cols: %s.", cols)
     for idx, col_name in enumerate(cols):
         possible_dice = ['d'+str(num) for num in range(100, 1001, 100)]
-        print(f"fix_worksheet: possible_dice: {possible_dice}.")
-        print(f"fix_worksheet: idx: {idx}. col_name: {col_name}.")
+        logger.debug("fix_worksheet: possible_dice: %s.", possible_dice)
+        logger.debug("fix_worksheet: idx: %s. col_name: %s.", idx, col_name)
         for die in possible_dice:
-            print(f"fix_worksheet: die: {die}.")
+            logger.debug("fix_worksheet: die: %s.", die)
             if die == col_name.lower():
                 roll_col_name = col_name
                 col_no = idx
-                print(f"fix_worksheet: roll_col_name: {roll_col_name}. "
-                      f"col_no: {col_no}.")
+                logger.debug("fix_worksheet: roll_col_name: %s. col_no: %s.",
+                             roll_col_name, col_no)
                 break
             else:
                 continue
-    print(f"fix_worksheet: roll_col_name: {roll_col_name}. col_no: {col_no}.")
+    logger.debug("fix_worksheet: roll_col_name: %s. col_no: %s.", roll_col_name, col_no)
     if roll_col_name == '' or col_no is None or len(cols) != 2:
         # This table is not in the format for this function to do anything.
-        print(f"fix_worksheet: This table does not have format that needs data "
-              f"repair. Returning original table.")
+        logger.debug("fix_worksheet: This table does not have format that needs data "
+                     "repair. Returning original table.")
         return table
     else:
         if table.iloc[col_no, 0] is None:
             table.iloc[col_no, 0] = 1
-            print(f"fix_worksheet: updated table: {table}.")
+            logger.debug("fix_worksheet: updated table: %s.", table)
         return table
 
 
@@ -78,7 +83,7 @@ def roll_test(s):
                          f"failed because it has an invalid format. Format is "
                          f"m or m-n, where m,n are positive integers "
                          f"such m <= n. 0, 00, or 000 will fail the test.")
-            print(error_msg)
+            logger.warning(error_msg)
             return (False,)
         else:
             if len(l) == 2:
@@ -89,7 +94,7 @@ def roll_test(s):
                                  f"failed because it has an invalid format. Format is "
                                  f"m or m-n, where m,n are positive integers "
                                  f"such m <= n. 0, 00, or 000 will fail the test.")
-                    print(error_msg)
+                    logger.warning(error_msg)
                     return (False,)
                 else:
                     if low > high:
@@ -98,7 +103,7 @@ def roll_test(s):
                                      f"m or m-n, where m,n are positive integers "
                                      f"such m <= n. Do not use 0, 00, or 000 for "
                                      f"end values.")
-                        print(error_msg)
+                        logger.warning(error_msg)
                         return (False,)
                     elif low == high:
                         return (low,)
@@ -112,12 +117,13 @@ def roll_test(s):
                              f"m or m-n, where m,n are positive integers "
                              f"such m <= n. Do not use 0, 00, or 000 for "
                              f"end values.")
-                print(error_msg)
+                logger.warning(error_msg)
                 return (False,)
     else:
         raise ValueError(f"roll_test: argument is invalid type '{type(s)}'.")
 
 
+@metrics.timed('load.check_workbook')
 def check_workbook(input_fp, ws_list):
     """
     Pulls all worksheets in the input_fp and compares the names with the
@@ -140,8 +146,9 @@ def check_workbook(input_fp, ws_list):
         else:
             actual_worksheets.pop(idx)
             try:
-                df = pd.read_excel(input_fp, sheet_name=name,
-                                   index_col=None, na_values=False)
+                with metrics.timer('load.read_excel', os.path.basename(input_fp)):
+                    df = pd.read_excel(input_fp, sheet_name=name,
+                                       index_col=None, na_values=False)
             except ValueError:
                 corrupt_worksheets.append(name)
             else:
@@ -154,8 +161,9 @@ def check_workbook(input_fp, ws_list):
         data['extras'] = actual_worksheets
         for name in actual_worksheets:
             try:
-                df = pd.read_excel(input_fp, sheet_name=name,
-                                   index_col=None, na_values=False)
+                with metrics.timer('load.read_excel', os.path.basename(input_fp)):
+                    df = pd.read_excel(input_fp, sheet_name=name,
+                                       index_col=None, na_values=False)
             except ValueError:
                 corrupt_worksheets.append(name)
             else:
@@ -175,6 +183,7 @@ def check_workbook(input_fp, ws_list):
     return data
 
 
+@metrics.timed('load.find_workbooks')
 def find_workbooks(wb_fp_list):
     """
     This function looks for Excel workbooks, wb_fp_list. Each entry must be a
@@ -186,8 +195,8 @@ def find_workbooks(wb_fp_list):
     missing_workbooks = []
     corrupt_files = []
     data = {}
-    print(f"find_workbooks: missing_workbooks: {missing_workbooks}. "
-          f"corrupt_file: {corrupt_files}. data: {data}")
+    logger.debug("find_workbooks: missing_workbooks: %s. corrupt_file: %s. data: %s",
+                 missing_workbooks, corrupt_files, data)
     for fp in wb_fp_list:
         if os.path.exists(fp):
             try:
@@ -206,11 +215,12 @@ def find_workbooks(wb_fp_list):
         data['corrupt'] = None
     else:
         data['corrupt'] = corrupt_files
-    print(f"find_workbooks: missing_workbooks: {missing_workbooks}. "
-          f"corrupt_file: {corrupt_files}. data: {data}")
+    logger.debug("find_workbooks: missing_workbooks: %s. corrupt_file: %s. data: %s",
+                 missing_workbooks, corrupt_files, data)
     return data
 
 
+@metrics.timed('load.check_worksheet')
 def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
     """
     Most of the worksheets that will be used in tables should in the
@@ -255,11 +265,11 @@ def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
         # column header. The first column header is the name of the statistic
         # (stat) or the word 'stat' or 'statistic'. The only required table
         # so far is Stat Bonuses, which stat and bonus columns.
-        print(f"check_worksheet: Beginning test of a stat table.")
+        logger.debug("check_worksheet: Beginning test of a stat table.")
 
         if len(headers) != 2:
-            print(f"check_worksheet: Invalid Format: Invalid number of columns "
-                  f"for stat tables: {len(headers)}. It should be 2.")
+            logger.warning("check_worksheet: Invalid Format: Invalid number of "
+                           "columns for stat tables: %s. It should be 2.", len(headers))
             return False
 
         first_col_header = headers[0]
@@ -267,9 +277,9 @@ def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
         if ('bonus' not in second_col_header.lower()) and \
                 ('penalty' not in second_col_header.lower()) and \
                 ('description' not in second_col_header.lower()):
-            print(f"check_worksheet: Invalid Format: Second column header must "
-                  f"contain 'bonus', 'penalty', or 'description'. The current "
-                  f"header is {headers[1]}.")
+            logger.warning("check_worksheet: Invalid Format: Second column header "
+                           "must contain 'bonus', 'penalty', or 'description'. The "
+                           "current header is %s.", headers[1])
             return False
         elif ('bonus' in second_col_header.lower()) or \
                 ('penalty' in second_col_header.lower()):
@@ -282,8 +292,8 @@ def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
         # We can use _check_roll_column_consistency() on this column
         # to validate it.
         if not _check_roll_column_consistency(stat_series, stat_max):
-            print(f"check_worksheet: Invalid Format: Stat column failed "
-                  f"the sequential values test.")
+            logger.warning("check_worksheet: Invalid Format: Stat column failed the "
+                           "sequential values test.")
             return False
 
         if bonus_series is not None:
@@ -293,14 +303,15 @@ def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
                     try:
                         test_val = int(val)
                     except ValueError:
-                        print(f"check_worksheet: Invalid Format: Bonus/Penalty column "
-                              f"contains {val} which cannot used as an integer.")
+                        logger.warning("check_worksheet: Invalid Format: "
+                                       "Bonus/Penalty column contains %s which "
+                                       "cannot used as an integer.", val)
                         return False
                 else:
                     continue
 
         # Description columns can contain any values, include NoneType or blanks.
-        print(f"check_worksheet: Stat table validated.")
+        logger.debug("check_worksheet: Stat table validated.")
         return True
     elif other_valuables:
         # These tables have one of two legit formats. Both share a column
@@ -310,14 +321,14 @@ def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
         # columns simply need to be non-empty so that something can be
         # displayed in the GUI.
         if len(headers) != 3:
-            print(f"check_worksheet: Invalid Format: Invalid number of columns "
-                  f"for gem or other valuables tables: {len(headers)}. It should "
-                  f"be 3.")
+            logger.warning("check_worksheet: Invalid Format: Invalid number of "
+                           "columns for gem or other valuables tables: %s. It should "
+                           "be 3.", len(headers))
             return False
         roll_max = _check_roll_column(headers)
         if roll_max is None:
-            print(f"check_worksheet: Invalid Format: First column is not a roll "
-                  f"column or has an invalid header: {headers[0]}.")
+            logger.warning("check_worksheet: Invalid Format: First column is not a "
+                           "roll column or has an invalid header: %s.", headers[0])
             return False
         else:
             roll_series = table[headers[0]]
@@ -326,28 +337,28 @@ def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
         col2_header = headers[1].lower()
         col3_header = headers[2].lower()
         if 'gemstone' not in col2_header and 'valuable' not in col2_header:
-            print(f"check_worksheet: Invalid Format: Second column must contain "
-                  f"either 'gemstone' or 'valuable' to be valid. Instead, it "
-                  f"is {headers[1]}.")
+            logger.warning("check_worksheet: Invalid Format: Second column must "
+                           "contain either 'gemstone' or 'valuable' to be valid. "
+                           "Instead, it is %s.", headers[1])
             return False
         if 'description' not in col3_header and 'example' not in col3_header:
-            print(f"check_worksheet: Invalid Format: Second column must contain "
-                  f"either 'description' or 'example' to be valid. Instead, it "
-                  f"is {headers[2]}.")
+            logger.warning("check_worksheet: Invalid Format: Second column must "
+                           "contain either 'description' or 'example' to be valid. "
+                           "Instead, it is %s.", headers[2])
             return False
 
         # We need to make sure that the 2nd and 3rd column headers agree.
         if 'gemstone' in col2_header and 'description' not in col3_header:
-            print(f"check_worksheet: Invalid Format: Column 2 and 3 headers "
-                  f"do not agree on type of item. Column 2 is {headers[1]}, "
-                  f"but Column 3 header does not contain 'description. It "
-                  f"contains {headers[2]}.")
+            logger.warning("check_worksheet: Invalid Format: Column 2 and 3 headers "
+                           "do not agree on type of item. Column 2 is %s, but Column "
+                           "3 header does not contain 'description. It contains %s.",
+                           headers[1], headers[2])
             return False
         if 'valuable' in col2_header and 'example' not in col3_header:
-            print(f"check_worksheet: Invalid Format: Column 2 and 3 headers "
-                  f"do not agree on type of item. Column 2 is {headers[1]}, "
-                  f"but Column 3 header does not contain 'example'. It "
-                  f"contains {headers[2]}.")
+            logger.warning("check_worksheet: Invalid Format: Column 2 and 3 headers "
+                           "do not agree on type of item. Column 2 is %s, but Column "
+                           "3 header does not contain 'example'. It contains %s.",
+                           headers[1], headers[2])
             return False
 
         # The headers are correct. There cannot be any NoneType or blank ('')
@@ -357,14 +368,14 @@ def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
         col2_nulls = col2_series.dropna()
         col3_nulls = col3_series.dropna()
         if len(col2_nulls) != len(col2_series):
-            print(f"check_worksheet: Invalid Format: Column 2 cannot have "
-                  f"NaN, null, or NoneType entries. A blank string is "
-                  f"acceptable, but not recommended.")
+            logger.warning("check_worksheet: Invalid Format: Column 2 cannot have "
+                           "NaN, null, or NoneType entries. A blank string is "
+                           "acceptable, but not recommended.")
             return False
         if len(col3_nulls) != len(col3_series):
-            print(f"check_worksheet: Invalid Format: Column 3 cannot have "
-                  f"NaN, null, or NoneType entries. A blank string is "
-                  f"acceptable, but not recommended.")
+            logger.warning("check_worksheet: Invalid Format: Column 3 cannot have "
+                           "NaN, null, or NoneType entries. A blank string is "
+                           "acceptable, but not recommended.")
             return False
 
         # Final check is the consistency of the roll column.
@@ -372,27 +383,30 @@ def check_worksheet(table, stat_values=False, other_valuables=False) -> bool:
 
     else:
         if len(headers) != 2:
-            print(f"check_worksheet: Invalid Format: Invalid number of columns "
-                  f"for normal tables: {len(headers)}. It should be 2.")
+            logger.warning("check_worksheet: Invalid Format: Invalid number of "
+                           "columns for normal tables: %s. It should be 2.",
+                           len(headers))
             return False
 
         roll_max = _check_roll_column(headers)
         if roll_max is None:
-            print(f"check_worksheet: Invalid Format: First column is not a roll "
-                  f"column or has an invalid header: {headers[0]}.")
+            logger.warning("check_worksheet: Invalid Format: First column is not a "
+                           "roll column or has an invalid header: %s.", headers[0])
             return False
 
         roll_header = headers[0]
         desc_header = headers[1]
         roll_column = table[roll_header]
         desc_column = table[desc_header]
-        print(f"check_worksheet: roll_max: {roll_max}.")
-        print(f"check_worksheet: roll_header: {roll_header}. roll_column: {roll_column}.")
-        print(f"check_worksheet: desc_header: {desc_header}. desc_column: {desc_column}.")
+        logger.debug("check_worksheet: roll_max: %s.", roll_max)
+        logger.debug("check_worksheet: roll_header: %s. roll_column: %s.", roll_header,
+                     roll_column)
+        logger.debug("check_worksheet: desc_header: %s. desc_column: %s.", desc_header,
+                     desc_column)
 
         if not _check_roll_column_consistency(roll_column, roll_max):
-            print(f"check_worksheet: Invalid Format: The roll column failed its "
-                  f"consistency check.")
+            logger.warning("check_worksheet: Invalid Format: The roll column failed "
+                           "its consistency check.")
             return False
 
         else:
@@ -425,43 +439,45 @@ def _check_roll_column_consistency(col: pd.Series, roll_max: int):
     """
     last_val = 0
     for idx, item in enumerate(col):
-        print(f"_check_roll_column_consistency: last_val: {last_val}. item: {item}.")
+        logger.debug("_check_roll_column_consistency: last_val: %s. item: %s.",
+                     last_val, item)
         if item is None or item == '-':
-            print(f"_check_roll_column_consistency: Blank item found in the roll column "
-                  f"of this table column at index {idx}.")
+            logger.warning("_check_roll_column_consistency: Blank item found in the "
+                           "roll column of this table column at index %s.", idx)
             return False
         else:
             item_ck = roll_test(str(item))
-            print(f"_check_roll_column_consistency: item_ck: {item_ck}.")
+            logger.debug("_check_roll_column_consistency: item_ck: %s.", item_ck)
             if item_ck[0] is False:
                 # If roll_test returned (False,), there is a bad entry in the
                 # roll column. 0 is also an invalid entry, since rolls start
                 # with 1.
-                print(f"_check_roll_column_consistency: Invalid Format: Item, "
-                      f"{item_ck} has an invalid format.")
+                logger.warning("_check_roll_column_consistency: Invalid Format: "
+                               "Item, %s has an invalid format.", item_ck)
                 return False
             else:
                 if last_val + 1 != item_ck[0]:
                     # There is a gap or an overlap.
-                    print(f"_check_roll_column_consistency: Invalid Format: Item, "
-                          f"{item_ck}, creates a gap or an overlap. ")
+                    logger.warning("_check_roll_column_consistency: Invalid Format: "
+                                   "Item, %s, creates a gap or an overlap. ", item_ck)
                     return False
                 else:
                     if len(item_ck) == 2:
                         last_val = item_ck[1]
                     else:
                         last_val = item_ck[0]
-    print(f"_check_roll_column_consistency: last_val: {last_val}. roll_max: {roll_max}.")
+    logger.debug("_check_roll_column_consistency: last_val: %s. roll_max: %s.",
+                 last_val, roll_max)
     if last_val != roll_max:
         # Either the values goes over the maximum dice value or under it. Either
         # way, the roll column is invalid.
         gap = last_val - roll_max
-        print(f"_check_roll_column_consistency: Invalid Format: Roll column has a gap "
-              f"of {gap} between max die result of {roll_max} and the last value "
-              f"{last_val}.")
+        logger.warning("_check_roll_column_consistency: Invalid Format: Roll column "
+                       "has a gap of %s between max die result of %s and the last "
+                       "value %s.", gap, roll_max, last_val)
         return False
     else:
-        print(f"_check_roll_column_consistency: Roll column validated.")
+        logger.debug("_check_roll_column_consistency: Roll column validated.")
         return True
 
 
@@ -479,24 +495,24 @@ def _check_roll_column(cols: list):
                             'd4', 'd2')
     roll_header = cols[0]
     roll_header_clean = roll_header.lower().strip()
-    print(f"_check_roll_column: roll_header: {roll_header}. "
-          f"roll_header_clean: {roll_header_clean}.")
+    logger.debug("_check_roll_column: roll_header: %s. roll_header_clean: %s.",
+                 roll_header, roll_header_clean)
 
     if roll_header_clean in possible_roll_values:
         roll_type = roll_header.lower().strip()
         roll_max = int(roll_type[1:])
-        print(f"_check_roll_column: roll_max: {roll_max}.")
+        logger.debug("_check_roll_column: roll_max: %s.", roll_max)
     else:
         if roll_header_clean[0] != 'd':
-            print(f"_check_roll_column: Invalid Format: Roll column has an "
-                  f"invalid header, {roll_header}.")
+            logger.warning("_check_roll_column: Invalid Format: Roll column has an "
+                           "invalid header, %s.", roll_header)
             return None
         else:
             try:
                 roll_max = int(roll_header_clean[1:])
             except ValueError:
-                print(f"_find_roll_column: Invalid Format: Roll column has an "
-                      f"invalid header, {roll_header}.")
+                logger.warning("_find_roll_column: Invalid Format: Roll column has "
+                               "an invalid header, %s.", roll_header)
                 return None
     return roll_max
 
@@ -546,9 +562,9 @@ def _validate_coin_table_format(coin_col: pd.Series):
 
     for raw_coin_result in coin_col:
         if raw_coin_result is None:
-            print(f"_validate_coin_table_format: Invalid Format. Raw coin result "
-                  f"is NoneType which is invalid for any encounter. Even a peon "
-                  f"carries a few coppers.")
+            logger.warning("_validate_coin_table_format: Invalid Format. Raw coin "
+                           "result is NoneType which is invalid for any encounter. "
+                           "Even a peon carries a few coppers.")
             return False
         raw_coin_result = raw_coin_result.rstrip()
         coin_results = raw_coin_result.split(", ")
@@ -557,8 +573,8 @@ def _validate_coin_table_format(coin_col: pd.Series):
         for idx, result in enumerate(coin_results):
             coin_results[idx] = result.replace(",", "")
 
-        print(f"_validate_coin_table_format: item: {raw_coin_result}. "
-              f"item_list: {coin_results}.")
+        logger.debug("_validate_coin_table_format: item: %s. item_list: %s.",
+                     raw_coin_result, coin_results)
 
         dice = []
         numbers = []
@@ -572,9 +588,9 @@ def _validate_coin_table_format(coin_col: pd.Series):
                 l_paren = result.index('(')
                 r_paren = result.index(')')
             except ValueError:
-                print(f"_validate_coin_table_format: Invalid Format: Item, "
-                      f"{raw_coin_result}, content, {coin_results[idx]}, is "
-                      f"missing at least one parentheses.")
+                logger.warning("_validate_coin_table_format: Invalid Format: Item, "
+                               "%s, content, %s, is missing at least one parentheses.",
+                               raw_coin_result, coin_results[idx])
                 return False
             # roll_section needs to look like nd
             roll_section = result[l_paren+1:r_paren]
@@ -582,16 +598,16 @@ def _validate_coin_table_format(coin_col: pd.Series):
             try:
                 fudge_amts.append(int(fudge_amt))
             except ValueError:
-                print(f"_validate_coin_table_format: Invalid Format: For item, "
-                      f"{raw_coin_result}, content, {coin_results[idx]}, first "
-                      f"{l_paren} characters must be integers.")
+                logger.warning("_validate_coin_table_format: Invalid Format: For "
+                               "item, %s, content, %s, first %s characters must be "
+                               "integers.", raw_coin_result, coin_results[idx], l_paren)
                 return False
 
             try:
                 x_loc = result.index('x')
             except ValueError:
-                print(f"_validate_coin_table_format: x is not present. Add 1 to "
-                      f"numbers and roll_section, {roll_section}, to dice.")
+                logger.debug("_validate_coin_table_format: x is not present. Add 1 "
+                             "to numbers and roll_section, %s, to dice.", roll_section)
                 dice.append(roll_section)
                 numbers.append(1)
             else:
@@ -600,27 +616,29 @@ def _validate_coin_table_format(coin_col: pd.Series):
                 try:
                     numbers.append(int(result[x_loc+2:r_paren]))
                 except ValueError:
-                    print(f"_validate_coin_table_format: Invalid Format: For item, "
-                          f"{raw_coin_result}, content, {coin_results[idx]}, number "
-                          f"{no_test} must be an integer.")
+                    logger.warning("_validate_coin_table_format: Invalid Format: For "
+                                   "item, %s, content, %s, number %s must be an "
+                                   "integer.", raw_coin_result, coin_results[idx],
+                                   no_test)
                     return False
                 else:
                     try:
-                        die_roll = return_die_roll(dice[idx])
+                        compile_dice_expression(dice[idx])
                     except ValueError:
-                        print(f"_validate_coin_table_format: Invalid Format: For item, "
-                              f"{raw_coin_result}, content, {coin_results[idx]} with "
-                              f"dice roll {dice[idx]} must be 'ndm' or 'nDm', where"
-                              f"n and m are integers and d/D is the utf-8 letter.")
+                        logger.warning("_validate_coin_table_format: Invalid Format: "
+                                       "For item, %s, content, %s with dice roll %s "
+                                       "must be 'ndm' or 'nDm', wheren and m are "
+                                       "integers and d/D is the utf-8 letter.",
+                                       raw_coin_result, coin_results[idx], dice[idx])
                         return False
 
         # Final check: None of the currencies can be duplicates in a single result.
         # This program will not add them all up.
         currency_set = set(currency)
         if len(currency_set) != len(currency):
-            print(f"_validate_coin_table_format: Invalid Format: Item, "
-                  f"{raw_coin_result} contains duplicate currency types "
-                  f"which is not supported by this software.")
+            logger.warning("_validate_coin_table_format: Invalid Format: Item, %s "
+                           "contains duplicate currency types which is not supported "
+                           "by this software.", raw_coin_result)
             return False
     return True
 
@@ -0,0 +1,211 @@
+import threading
+import time
+from functools import wraps
+
+
+class _Timer:
+    """
+    The context manager returned by Metrics.timer(). It adds the wall time of
+    its block to the stage, and to the stage's detail entry if there is one.
+    """
+    __slots__ = ('metrics', 'stage', 'detail', 'start')
+
+    def __init__(self, metrics, stage, detail):
+        self.metrics = metrics
+        self.stage = stage
+        self.detail = detail
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.add_time(self.stage, elapsed)
+        if self.detail is not None:
+            self.metrics.add_time(f"{self.stage}[{self.detail}]", elapsed)
+        return False
+
+
+class _NullTimer:
+    """The context manager returned by Metrics.timer() when it is disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    This class records the wall time and number of calls of each stage of
+    loading and treasure generation, plus simple counters. Stages are named
+    '{area}.{stage}', such as 'load.read_excel' or 'generate.coin'. A timer can
+    also be given a detail, such as the workbook name, which is recorded a
+    second time as 'load.read_excel[Magic Items A.xlsx]', so the workbook or
+    table responsible for a slow stage can be found.
+
+    snapshot() returns everything recorded so far as a plain dict. Stages run
+    in worker processes are recorded there and merged back by the caller with
+    export() and merge(). Recording can be turned off with enabled.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # Each timer is a list of [count, total seconds, max seconds].
+        self._timers = {}
+        self._counters = {}
+
+    def timer(self, stage, detail=None):
+        """
+        This method returns a context manager that times its block as stage.
+        :param stage: str
+        :param detail: str or None, e.g. the workbook or worksheet name
+        :return: context manager
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, detail)
+
+    def timed(self, stage):
+        """
+        This method returns a decorator that times every call of the decorated
+        function as stage.
+        :param stage: str
+        :return: function
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add_time(self, stage, seconds, count=1):
+        """
+        This method adds count calls taking seconds in all to stage.
+        :param stage: str
+        :param seconds: float
+        :param count: int
+        :return: None
+        """
+        longest = seconds / count if count else 0.0
+        with self._lock:
+            entry = self._timers.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+            if longest > entry[2]:
+                entry[2] = longest
+
+    def count(self, name, n=1):
+        """
+        This method adds n to the counter, name.
+        :param name: str
+        :param n: int
+        :return: None
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        """This method clears every timer and counter."""
+        with self._lock:
+            self._timers = {}
+            self._counters = {}
+
+    def export(self):
+        """
+        This method returns the raw timers and counters, to be sent from a
+        worker process to merge().
+        :return: 2-tuple of dict
+        """
+        with self._lock:
+            return ({stage: list(entry) for stage, entry in self._timers.items()},
+                    dict(self._counters))
+
+    def merge(self, exported):
+        """
+        This method adds the timers and counters returned by export() in
+        another process to this one.
+        :param exported: 2-tuple of dict
+        :return: None
+        """
+        timers, counters = exported
+        with self._lock:
+            for stage, (count, total, longest) in timers.items():
+                entry = self._timers.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+            for name, n in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self, prefix=''):
+        """
+        This method returns the timers and counters whose names start with
+        prefix. Each timer is a dict with its count and its total, mean, and
+        longest time in milliseconds.
+        :param prefix: str, e.g. 'load.' or 'generate.'
+        :return: dict with keys 'timers' and 'counters'
+        """
+        with self._lock:
+            timers = {stage: {'count': count, 'total_ms': total * 1000,
+                              'mean_ms': total * 1000 / count if count else 0.0,
+                              'max_ms': longest * 1000}
+                      for stage, (count, total, longest) in self._timers.items()
+                      if stage.startswith(prefix)}
+            counters = {name: n for name, n in self._counters.items()
+                        if name.startswith(prefix)}
+        return {'timers': timers, 'counters': counters}
+
+    def summary(self, prefix=''):
+        """
+        This method returns a one-line summary of the stages starting with
+        prefix, slowest first, such as
+        'load.read_excel: 412.0 ms (14 calls), load.check_worksheet: ...'.
+        Detail entries are left out.
+        :param prefix: str
+        :return: str
+        """
+        timers = self.snapshot(prefix)['timers']
+        stages = sorted((stage for stage in timers if '[' not in stage),
+                        key=lambda stage: -timers[stage]['total_ms'])
+        return ', '.join(f"{stage}: {timers[stage]['total_ms']:.1f} ms "
+                         f"({timers[stage]['count']} calls)" for stage in stages)
+
+    def slowest(self, stage):
+        """
+        This method returns the detail entry of stage with the largest total
+        time, as a (detail, total_ms) tuple, or None if stage has no details.
+        :param stage: str
+        :return: 2-tuple or None
+        """
+        timers = self.snapshot(f"{stage}[")['timers']
+        if not timers:
+            return None
+        name = max(timers, key=lambda key: timers[key]['total_ms'])
+        return name[len(stage) + 1:-1], timers[name]['total_ms']
+
+
+# The metrics of this process. Every instrumented stage records here.
+metrics = Metrics()
+
+
+def run_measured(func, *args):
+    """
+    This function is used in worker processes. It calls func(*args) with the
+    worker's metrics cleared first, and returns the result together with the
+    metrics it recorded, so the caller can merge() them.
+    :param func: function
+    :return: 2-tuple of the result and Metrics.export()
+    """
+    metrics.reset()
+    result = func(*args)
+    return result, metrics.export()
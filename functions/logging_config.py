@@ -0,0 +1,61 @@
+import logging
+import sys
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+# The level used when neither config.json nor the caller sets one.
+DEFAULT_LEVEL = 'INFO'
+
+# The loggers given their own level by the last call to configure_logging().
+_module_loggers = []
+
+
+def parse_log_level(level):
+    """
+    This function converts a level name, such as 'debug' or 'WARNING', or a
+    number to the integer level used by logging. A ValueError is raised for an
+    unknown name.
+    :param level: str or int
+    :return: int
+    """
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    if not isinstance(value, int):
+        raise ValueError(f"parse_log_level: Invalid log level, {level}.")
+    return value
+
+
+def configure_logging(settings=None, level=None, stream=None):
+    """
+    This function sets up logging for the program. Every module logs to its own
+    logger, named after the module, and the messages are written to stream,
+    stderr by default. Messages are only formatted if their level is enabled,
+    so debug messages cost next to nothing when they are off.
+
+    settings is the optional 'logging' section of config.json, e.g.
+        "logging": {"level": "INFO", "levels": {"functions.data_checks": "DEBUG"}}
+    'level' sets the level of every module and 'levels' overrides it for single
+    modules or packages. level, e.g. from the command line, overrides the
+    'level' setting. Calling this function again replaces the earlier setup.
+    :param settings: dict or None
+    :param level: str, int, or None
+    :param stream: a text file object or None
+    :return: None
+    """
+    settings = settings or {}
+    root_level = parse_log_level(level or settings.get('level', DEFAULT_LEVEL))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if getattr(handler, '_npc_generator', False):
+            root.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler._npc_generator = True
+    root.addHandler(handler)
+    root.setLevel(root_level)
+    while _module_loggers:
+        _module_loggers.pop().setLevel(logging.NOTSET)
+    for name, module_level in settings.get('levels', {}).items():
+        module_logger = logging.getLogger(name)
+        module_logger.setLevel(parse_log_level(module_level))
+        _module_loggers.append(module_logger)
@@ -0,0 +1,159 @@
+import cProfile
+import hashlib
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Stacks deeper than this are cut off when the collapsed stacks are built.
+MAX_STACK_DEPTH = 64
+# Paths carrying a smaller share of a function's time are left out.
+MIN_PATH_FRACTION = 0.001
+
+
+def workbook_set_tag(wb_names):
+    """
+    This function returns a short tag for a set of workbooks, the first 8 hex
+    digits of a hash of their sorted names. Profiles taken with the same
+    workbooks have the same tag.
+    :param wb_names: iterable of str
+    :return: str
+    """
+    joined = '\n'.join(sorted(wb_names))
+    return hashlib.sha1(joined.encode()).hexdigest()[:8]
+
+
+def _function_name(func):
+    """
+    This function turns a pstats function key, (filename, line, name), into
+    the frame name used in the collapsed stacks, such as
+    'treasure_engine.py:496(_get_table_result)'.
+    """
+    filename, line, name = func
+    if filename == '~':
+        # Built-in functions, such as <method 'append' of 'list' objects>.
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def collapsed_stacks(stats):
+    """
+    This function converts a pstats.Stats into collapsed stacks, the input
+    format of flamegraph.pl and speedscope: one line per call stack, with the
+    frames joined by ';' and the time spent in the last frame in microseconds.
+
+    cProfile only records which function called which, not whole stacks, so
+    the stacks are rebuilt by following the callers of each function and
+    splitting its time between them in proportion to the time each caller
+    accounted for. The result is exact for functions that are only ever called
+    from one place and a close estimate otherwise.
+    :param stats: pstats.Stats
+    :return: list of str
+    """
+    entries = stats.stats
+    lines = {}
+
+    def walk(func, fraction, path, seen):
+        callers = entries[func][4] if func in entries else {}
+        callers = {caller: edge for caller, edge in callers.items()
+                   if caller not in seen and caller in entries}
+        if not callers or len(path) >= MAX_STACK_DEPTH:
+            yield path, fraction
+            return
+        total = sum(edge[3] for edge in callers.values())
+        for caller, edge in callers.items():
+            share = edge[3] / total if total else 1 / len(callers)
+            if fraction * share < MIN_PATH_FRACTION:
+                continue
+            yield from walk(caller, fraction * share, [caller] + path,
+                            seen | {caller})
+
+    for func, (_, _, own_time, _, _) in entries.items():
+        if own_time <= 0:
+            continue
+        for path, fraction in walk(func, 1.0, [func], {func}):
+            stack = ';'.join(_function_name(frame) for frame in path)
+            lines[stack] = lines.get(stack, 0) + own_time * fraction
+    return [f"{stack} {round(seconds * 1e6)}"
+            for stack, seconds in sorted(lines.items()) if round(seconds * 1e6) > 0]
+
+
+class Profiler:
+    """
+    This class profiles parts of the program with cProfile and writes three
+    files to directory for each one:
+        {name}.txt: a report of every function, sorted by cumulative time,
+            headed by the details of the profile, such as the CR and the
+            workbooks in use
+        {name}.prof: the raw profile, for pstats, snakeviz, or gprof2dot
+        {name}.folded: collapsed stacks for a flame graph (see
+            collapsed_stacks())
+
+    name is made of a sequence number, the label, and the CR and workbook set
+    tag if they are given, e.g. '0003-generate-cr5-1a2b3c4d', so the files of a
+    session sort in the order they were taken.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.profiles = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def profile(self, label, **details):
+        """
+        This context manager profiles its block and writes the files of the
+        profile when it ends. The details are written at the top of the report.
+        'cr' and 'workbooks', a list of workbook names, are also used in the
+        file name. The details dict is yielded, so details only known at the
+        end of the block can be added to it.
+        :param label: str, e.g. 'startup' or 'generate'
+        :return: dict, details
+        """
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield details
+        finally:
+            profiler.disable()
+            details['wall_time_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            self.write(profiler, label, details)
+
+    def write(self, profiler, label, details):
+        """
+        This method writes the report, raw profile, and collapsed stacks of
+        profiler and returns the path of the report.
+        :param profiler: cProfile.Profile
+        :param label: str
+        :param details: dict
+        :return: str
+        """
+        self.profiles += 1
+        name = f"{self.profiles:04d}-{label}"
+        if details.get('cr') is not None:
+            name += f"-cr{details['cr']}"
+        if details.get('workbooks'):
+            details['workbook_set'] = workbook_set_tag(details['workbooks'])
+            name += f"-{details['workbook_set']}"
+        # CRs such as '1/4' or lists of them must not create directories.
+        name = re.sub(r'[^\w.+-]', '_', name)
+        fp = os.path.join(self.directory, name)
+
+        report = io.StringIO()
+        for key, value in details.items():
+            report.write(f"# {key}: {value}\n")
+        report.write('\n')
+        stats = pstats.Stats(profiler, stream=report)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats()
+        with open(f"{fp}.txt", 'w') as f:
+            f.write(report.getvalue())
+        stats.dump_stats(f"{fp}.prof")
+        with open(f"{fp}.folded", 'w') as f:
+            f.writelines(line + '\n' for line in collapsed_stacks(stats))
+        logger.info("Profiler.write: Wrote the %s profile to %s.txt.", label, fp)
+        return f"{fp}.txt"
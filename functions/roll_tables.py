@@ -0,0 +1,180 @@
+import logging
+from bisect import bisect_left
+import pandas as pd
+from .data_checks import roll_test
+
+logger = logging.getLogger(__name__)
+
+# Tables rolled on dice up to this size get a direct roll-to-row list. Larger
+# tables fall back on a binary search of the upper ends of the roll ranges.
+DIRECT_LOOKUP_MAX = 1000
+
+
+class RollTable:
+    """
+    This class is a compiled form of a worksheet whose first column holds dice
+    roll ranges, such as '1-5' or '19'. The roll column is parsed once when the
+    RollTable is created, so a lookup never parses a string again. Tables rolled
+    on a d1000 or smaller map every roll directly to its row. Larger tables use
+    a binary search on the sorted upper ends of the ranges.
+
+    The result columns are kept as plain lists. Gem and valuable tables have a
+    second result column that lookup() joins to the first.
+    """
+    def __init__(self, table: pd.DataFrame):
+        """
+        The first column of table must be the roll column and its header must
+        be a single die, such as 'd20' or 'D100'. A ValueError is raised if the
+        header or any roll range cannot be parsed.
+        :param table: pd.DataFrame
+        """
+        roll_col_name = table.columns[0]
+        try:
+            self.dice_size = int(str(roll_col_name).lower().strip().replace('d', ''))
+        except ValueError:
+            raise ValueError(f"RollTable: Roll column header, {roll_col_name}, "
+                             f"must be a single die such as 'd20'.")
+        self.lower_bounds = []
+        self.upper_bounds = []
+        for idx, item in enumerate(table[roll_col_name]):
+            # Sometimes, there is a error converting a '1' string at the top of
+            # the table. Instead of a '1' or 1, it becomes NoneType.
+            if idx == 0 and item is None:
+                bounds = (1,)
+            elif item is None:
+                raise ValueError(f"RollTable: Blank roll range at row {idx}.")
+            else:
+                bounds = roll_test(str(item).replace(' ', ''))
+            if bounds[0] is False:
+                raise ValueError(f"RollTable: Invalid roll range, {item}, at row "
+                                 f"{idx}.")
+            self.lower_bounds.append(bounds[0])
+            self.upper_bounds.append(bounds[-1])
+
+        self.results = list(table[table.columns[1]])
+        if len(table.columns) > 2:
+            self.results_2 = list(table[table.columns[2]])
+        else:
+            self.results_2 = None
+
+        # The direct lookup list has one entry per possible roll. Rolls that no
+        # range covers map to None.
+        self.direct = None
+        if self.dice_size <= DIRECT_LOOKUP_MAX:
+            self.direct = [None] * (self.dice_size + 1)
+            for row in range(len(self.upper_bounds) - 1, -1, -1):
+                low = max(self.lower_bounds[row], 1)
+                high = min(self.upper_bounds[row], self.dice_size)
+                for roll in range(low, high + 1):
+                    self.direct[roll] = row
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        return f"RollTable(d{self.dice_size}, rows={len(self.results)})"
+
+    def find_row(self, roll: int):
+        """
+        This method returns the row number whose roll range contains roll, or
+        None if no range contains it.
+        :param roll: int
+        :return: int or None
+        """
+        if self.direct is not None:
+            if 0 < roll <= self.dice_size:
+                return self.direct[roll]
+            return None
+        row = bisect_left(self.upper_bounds, roll)
+        if row < len(self.upper_bounds) and self.lower_bounds[row] <= roll:
+            return row
+        return None
+
+    def row_probabilities(self):
+        """
+        This method returns the probability of landing on each row when the
+        table's die is rolled, as a list in row order. Rolls that no range
+        covers are not counted, so the total can be less than 1.
+        :return: list of float
+        """
+        counts = [0] * len(self.results)
+        if self.direct is not None:
+            for row in self.direct[1:]:
+                if row is not None:
+                    counts[row] += 1
+        else:
+            for row in range(len(self.results)):
+                low = max(self.lower_bounds[row], 1)
+                high = min(self.upper_bounds[row], self.dice_size)
+                counts[row] = max(high - low + 1, 0)
+        return [count / self.dice_size for count in counts]
+
+    def lookup(self, roll: int, table_type='normal'):
+        """
+        This method returns the result for roll. For table_type 'gems', the
+        result is 'gemstone Desc: description'. For 'valuables', it is
+        'valuable Ex: example'. A KeyError is raised if no roll range contains
+        roll.
+        :param roll: int
+        :param table_type: str, defaults to 'normal', alternate values are 'gems'
+            or 'valuables'
+        :return: str or None
+        """
+        row = self.find_row(roll)
+        if row is None:
+            raise KeyError(roll)
+        if table_type == 'gems':
+            return f"{self.results[row]} Desc: {self.results_2[row]}"
+        elif table_type == 'valuables':
+            return f"{self.results[row]} Ex: {self.results_2[row]}"
+        else:
+            return self.results[row]
+
+
+class RollTableIndex:
+    """
+    This class holds a RollTable for each worksheet in a tables dict, the
+    same dict StartWindow and TreasureWindow share. compile_tables() compiles
+    every table that is already loaded, which StartWindow does at load time.
+    get() compiles anything that is missing, such as a lazily loaded magic item
+    worksheet. It also recompiles a worksheet whose DataFrame was replaced by
+    a hot reload.
+    """
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self._compiled = {}
+
+    def compile_tables(self):
+        """
+        This method compiles every worksheet that is already in memory.
+        Workbooks that are loaded on first use are skipped. Worksheets without
+        a roll column, such as stat tables, are skipped as well.
+        :return: None
+        """
+        for wb_name, ws_tables in self.tables.items():
+            if not isinstance(ws_tables, dict):
+                continue
+            for ws_name in ws_tables:
+                try:
+                    self.get(wb_name, ws_name)
+                except ValueError as e:
+                    logger.warning("RollTableIndex.compile_tables: Skipping %s: %s",
+                                   ws_name, e)
+        logger.debug("RollTableIndex.compile_tables: Compiled %s tables.",
+                     len(self._compiled))
+
+    def get(self, wb_name, ws_name):
+        """
+        This method returns the RollTable for the worksheet, ws_name, in the
+        workbook, wb_name. A KeyError is raised if the worksheet does not exist
+        and a ValueError if it cannot be compiled.
+        :param wb_name: str
+        :param ws_name: str
+        :return: RollTable
+        """
+        table = self.tables[wb_name][ws_name]
+        entry = self._compiled.get((wb_name, ws_name))
+        if entry is None or entry[0] is not table:
+            entry = (table, RollTable(table))
+            self._compiled[(wb_name, ws_name)] = entry
+        return entry[1]
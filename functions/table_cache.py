@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import os
+import pickle
+from .table_loading import LazyWorkbook
+
+logger = logging.getLogger(__name__)
+
+# The cache version must be raised whenever the cleaning or validation of
+# worksheets changes, so that tables compiled by older code are not reused.
+CACHE_VERSION = 2
+
+
+def fingerprint_workbook(wb_fp, previous=None):
+    """
+    This function returns the fingerprint of the workbook at wb_fp as a dict
+    with the keys 'size', 'mtime_ns', and 'sha256'. If previous is the stored
+    fingerprint of the same file and its size and modification time still
+    match, its content hash is reused instead of reading the file again.
+    Returns None if the workbook does not exist.
+    :param wb_fp: filepath to an Excel workbook
+    :param previous: dict or None, the previous fingerprint of this workbook
+    :return: dict or None
+    """
+    try:
+        stat = os.stat(wb_fp)
+    except OSError:
+        return None
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous is not None and previous['size'] == fingerprint['size'] and \
+            previous['mtime_ns'] == fingerprint['mtime_ns']:
+        fingerprint['sha256'] = previous['sha256']
+        return fingerprint
+
+    sha256 = hashlib.sha256()
+    with open(wb_fp, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    fingerprint['sha256'] = sha256.hexdigest()
+    return fingerprint
+
+
+def read_table_cache(cache_fp):
+    """
+    This function reads the compiled table cache from cache_fp. It returns a
+    dict mapping workbook names to cache entries. A missing, unreadable, or
+    outdated cache file returns an empty dict, so every workbook is parsed again.
+    :param cache_fp: filepath of the cache file
+    :return: dict
+    """
+    if cache_fp is None or not os.path.exists(cache_fp):
+        return {}
+    try:
+        with open(cache_fp, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+            ImportError, IndexError):
+        logger.warning("read_table_cache: Cache file, %s, could not be read. It will "
+                       "be rebuilt.", cache_fp)
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        logger.debug("read_table_cache: Cache file, %s, is outdated. It will be "
+                     "rebuilt.", cache_fp)
+        return {}
+    return cache['workbooks']
+
+
+def find_cached_tables(cache, wb_fps, wb_names, required_tables):
+    """
+    This function compares every workbook with its entry in cache, the dict
+    returned by read_table_cache(). A workbook is a cache hit if its content
+    hash and its list of required worksheets are unchanged. wb_names must be
+    in the same order as wb_fps.
+
+    It returns a tuple (cached_tables, fingerprints). cached_tables maps the
+    workbook names that can be used from the cache to their tables.
+    fingerprints maps every workbook name to its current fingerprint (None if
+    the workbook is missing).
+    :param cache: dict
+    :param wb_fps: list of filepaths
+    :param wb_names: list of str, workbook names as they appear in config.json
+    :param required_tables: dict, 'required tables' section of config.json
+    :return: 2-tuple of dict
+    """
+    cached_tables = {}
+    fingerprints = {}
+    for idx, wb_name in enumerate(wb_names):
+        entry = cache.get(wb_name)
+        previous = entry['fingerprint'] if entry is not None else None
+        fingerprint = fingerprint_workbook(wb_fps[idx], previous)
+        fingerprints[wb_name] = fingerprint
+        if entry is None or fingerprint is None:
+            continue
+        if fingerprint['sha256'] == previous['sha256'] and \
+                entry['worksheets'] == list(required_tables[wb_name]):
+            cached_tables[wb_name] = entry['tables']
+    logger.debug("find_cached_tables: Workbooks loaded from cache: %s.",
+                 list(cached_tables.keys()))
+    return cached_tables, fingerprints
+
+
+def is_cacheable(ws_tables):
+    """
+    This function returns False for a LazyWorkbook that has not loaded and
+    validated every worksheet, and True for anything else. Storing such a
+    workbook would load the rest of it on the spot.
+    :param ws_tables: dict of pd.DataFrame or LazyWorkbook
+    :return: bool
+    """
+    return not isinstance(ws_tables, LazyWorkbook) or ws_tables.is_loaded()
+
+
+def write_table_cache(cache_fp, tables, fingerprints, required_tables):
+    """
+    This function stores validated tables in the cache file at cache_fp. The
+    file is written to a temporary file first and then moved into place, so a
+    crash never leaves a partially written cache behind. A LazyWorkbook is
+    left out until it is fully loaded (see is_cacheable()). Returns True if
+    the cache was written, False otherwise.
+    :param cache_fp: filepath of the cache file
+    :param tables: dict mapping workbook names to dicts of pd.DataFrame
+    :param fingerprints: dict mapping workbook names to fingerprints
+    :param required_tables: dict, 'required tables' section of config.json
+    :return: bool
+    """
+    workbooks = {}
+    for wb_name, ws_tables in tables.items():
+        fingerprint = fingerprints.get(wb_name)
+        if fingerprint is None:
+            continue
+        if not is_cacheable(ws_tables):
+            logger.debug("write_table_cache: %s is not fully loaded and is left "
+                         "out.", wb_name)
+            continue
+        # The workbook is fully loaded, so dict() only copies its tables.
+        workbooks[wb_name] = {'fingerprint': fingerprint,
+                              'worksheets': list(required_tables[wb_name]),
+                              'tables': dict(ws_tables)}
+    cache = {'version': CACHE_VERSION, 'workbooks': workbooks}
+    tmp_fp = f"{cache_fp}.tmp"
+    try:
+        with open(tmp_fp, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_fp, cache_fp)
+    except OSError as e:
+        logger.warning("write_table_cache: Cache file, %s, could not be written: %s.",
+                       cache_fp, e)
+        return False
+    logger.debug("write_table_cache: Cached tables for %s.", list(workbooks.keys()))
+    return True
+
+
+def find_changed_files(files, fingerprints):
+    """
+    This function compares the files in files with their fingerprints from
+    fingerprint_workbook(). files maps a name (a workbook name or any other
+    label) to a filepath, and fingerprints maps the same names to the last known
+    fingerprint. A file whose content hash is unchanged is not reported, even if
+    it was touched. A file that is new, changed, or has disappeared is.
+
+    It returns a tuple (changed_names, new_fingerprints), where new_fingerprints
+    maps every name in files to its current fingerprint.
+    :param files: dict mapping names to filepaths
+    :param fingerprints: dict mapping names to fingerprints or None
+    :return: 2-tuple of list and dict
+    """
+    changed_names = []
+    new_fingerprints = {}
+    for name, fp in files.items():
+        previous = fingerprints.get(name)
+        fingerprint = fingerprint_workbook(fp, previous)
+        new_fingerprints[name] = fingerprint
+        if previous is None and fingerprint is None:
+            continue
+        if previous is None or fingerprint is None or \
+                previous['sha256'] != fingerprint['sha256']:
+            changed_names.append(name)
+    return changed_names, new_fingerprints
@@ -0,0 +1,414 @@
+import logging
+import os
+import threading
+import zipfile
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import pandas as pd
+import numpy as np
+from .data_checks import fix_worksheet, check_worksheet
+from .instrumentation import metrics, run_measured
+
+logger = logging.getLogger(__name__)
+
+
+def clean_worksheet(df: pd.DataFrame, ws_name: str):
+    """
+    This function takes a worksheet freshly read by pandas and prepares it for
+    validation. Every np.NaN is replaced by None. Magic item worksheets are also
+    sent through fix_worksheet() to repair the '1' that pandas sometimes turns
+    into np.NaN at the top of the roll column.
+    :param df: pd.DataFrame
+    :param ws_name: str, title of the worksheet
+    :return: pd.DataFrame
+    """
+    df_pass_1 = df.replace(to_replace=np.nan, value=None)
+    # The following is a fix for an error in some magic item
+    # table conversions that changes a row in the form:
+    # '1', 'description' or 1, 'description' to
+    # np.NaN, 'description'. df_pass_1 then turns that
+    # 1 value into None.
+    if 'magic item' in ws_name.lower():
+        return fix_worksheet(df_pass_1)
+    else:
+        return df_pass_1
+
+
+def load_workbook(wb_fp, ws_list):
+    """
+    This function opens the Excel workbook at wb_fp exactly once and reads every
+    worksheet named in ws_list from that open file. Worksheets that are not in
+    ws_list are never parsed. Each worksheet read is cleaned by clean_worksheet().
+
+    The returned dict has the following keys:
+        'missing_workbook': bool, True if the file does not exist
+        'corrupt_workbook': bool, True if the file could not be opened
+        'missing': list of worksheet titles not found in the workbook or None
+        'corrupt': list of worksheet titles that could not be read or None
+        'tables': dict mapping worksheet titles to pd.DataFrame
+    :param wb_fp: filepath to an Excel workbook
+    :param ws_list: list of str, names of the worksheets to load
+    :return: dict
+    """
+    data = {'missing_workbook': False, 'corrupt_workbook': False,
+            'missing': None, 'corrupt': None, 'tables': {}}
+    if not os.path.exists(wb_fp):
+        data['missing_workbook'] = True
+        return data
+    wb_file_name = os.path.basename(wb_fp)
+    try:
+        with metrics.timer('load.open_workbook', wb_file_name):
+            f = pd.ExcelFile(wb_fp)
+    except (ValueError, zipfile.BadZipFile):
+        data['corrupt_workbook'] = True
+        return data
+
+    actual_worksheets = f.sheet_names
+    missing_names = []
+    corrupt_worksheets = []
+    for ws_name in ws_list:
+        if ws_name not in actual_worksheets:
+            missing_names.append(ws_name)
+            continue
+        try:
+            with metrics.timer('load.read_excel', wb_file_name):
+                df = f.parse(sheet_name=ws_name, index_col=0, na_values=True)
+        except ValueError:
+            corrupt_worksheets.append(ws_name)
+        else:
+            data['tables'][ws_name] = clean_worksheet(df, ws_name)
+            metrics.count('load.worksheets')
+    f.close()
+
+    if len(missing_names) != 0:
+        data['missing'] = missing_names
+    if len(corrupt_worksheets) != 0:
+        data['corrupt'] = corrupt_worksheets
+    return data
+
+
+def validate_workbook(wb_name, ws_tables):
+    """
+    This function runs check_worksheet() on every table in ws_tables. The
+    workbook name decides which format the worksheets must have. Character
+    workbooks use the stat table format, and gem or other valuable workbooks
+    use the 3 column format. Returns the list of worksheet titles with an invalid
+    format or None if every worksheet is valid.
+    :param wb_name: str, workbook name as it appears in config.json
+    :param ws_tables: dict mapping worksheet titles to pd.DataFrame
+    :return: list of str or None
+    """
+    logger.debug("validate_workbook: Starting validation of %s tables.", wb_name)
+    # The structure of character-related tables differs from the rest.
+    # There is an override feature in check_worksheet that handles it.
+    stat_override = 'character' in wb_name.lower()
+    # We need a second override value, gem_override, to warn check_worksheet()
+    # to use a 3 column format tables used for gems and other valuables.
+    gem_override = ('gem' in wb_name.lower()) or \
+                   ('other valuable' in wb_name.lower())
+    bad_ws_list = []
+    with metrics.timer('load.validate_workbook', wb_name):
+        for ws_name, table in ws_tables.items():
+            if check_worksheet(table, stat_override, gem_override):
+                logger.debug("validate_workbook: Validated worksheet, %s.", ws_name)
+            else:
+                bad_ws_list.append(ws_name)
+                logger.warning("validate_workbook: Worksheet, %s, has invalid "
+                               "formatting.", ws_name)
+
+    if len(bad_ws_list) != 0:
+        return bad_ws_list
+    else:
+        logger.debug("validate_workbook: Workbook, %s, has been fully validated.",
+                     wb_name)
+        return None
+
+
+def load_and_validate_workbook(wb_fp, wb_name, ws_list):
+    """
+    This function loads a workbook with load_workbook() and validates the
+    worksheets it read with validate_workbook(). It is the unit of work sent to
+    each worker process by load_workbooks(). The returned dict is the one from
+    load_workbook() with an extra key, 'bad_format', holding the result of
+    validate_workbook().
+    :param wb_fp: filepath to an Excel workbook
+    :param wb_name: str, workbook name as it appears in config.json
+    :param ws_list: list of str, names of the worksheets to load
+    :return: dict
+    """
+    data = load_workbook(wb_fp, ws_list)
+    data['bad_format'] = validate_workbook(wb_name, data['tables'])
+    return data
+
+
+class LazyWorkbook(Mapping):
+    """
+    This class stands in for the dict of worksheets of a single workbook in the
+    tables attribute of StartWindow and TreasureWindow. It is indexed exactly
+    like that dict, tables[wb_name][ws_name], but a worksheet is only read,
+    repaired, and validated the first time it is used. It is meant for the
+    magic item workbooks, most of whose worksheets are never rolled on in a
+    session.
+
+    A worksheet that fails validation raises a ValueError every time it is
+    used. A worksheet that cannot be read, e.g. because the workbook was
+    deleted or is being saved, raises a ValueError as well, but it is read
+    again the next time it is used. warm_up() loads every worksheet, and
+    start_warm_up() does so on a background thread.
+    """
+    def __init__(self, wb_fp: str, wb_name: str, ws_list: list):
+        self.wb_fp = wb_fp
+        self.wb_name = wb_name
+        self.ws_list = list(ws_list)
+        self.bad_format = []
+        self._tables = {}
+        self._lock = threading.RLock()
+        self._warm_up_thread = None
+
+    def __getitem__(self, ws_name):
+        if ws_name not in self.ws_list:
+            raise KeyError(ws_name)
+        with self._lock:
+            if ws_name not in self._tables and ws_name not in self.bad_format:
+                read_errors = self._load([ws_name])
+                if ws_name in read_errors:
+                    error_msg = (f"LazyWorkbook: Worksheet, {ws_name}, in workbook, "
+                                 f"{self.wb_name}, could not be read: "
+                                 f"{read_errors[ws_name]}")
+                    raise ValueError(error_msg)
+            if ws_name in self.bad_format:
+                error_msg = (f"LazyWorkbook: Worksheet, {ws_name}, in workbook, "
+                             f"{self.wb_name}, has an invalid format.")
+                raise ValueError(error_msg)
+            return self._tables[ws_name]
+
+    def __iter__(self):
+        return iter(self.ws_list)
+
+    def __len__(self):
+        return len(self.ws_list)
+
+    def __repr__(self):
+        return (f"LazyWorkbook({self.wb_fp}, loaded={len(self._tables)}, "
+                f"worksheets={len(self.ws_list)})")
+
+    def _load(self, ws_names):
+        """
+        This method reads, repairs, and validates the worksheets in ws_names,
+        opening the workbook once for all of them. The workbook is closed again
+        straight away so that it is not locked while the GM edits it. Valid
+        worksheets are stored, invalid ones are added to bad_format.
+
+        Worksheets that cannot be read, because the workbook is missing or
+        damaged or the worksheet cannot be parsed, are neither stored nor
+        added to bad_format, so they are read again on their next use. They
+        are returned with the reason.
+        :param ws_names: list of str
+        :return: dict mapping worksheet titles to str
+        """
+        wb_file_name = os.path.basename(self.wb_fp)
+        read_errors = {}
+        try:
+            with metrics.timer('load.open_workbook', wb_file_name):
+                f = pd.ExcelFile(self.wb_fp)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            logger.warning("LazyWorkbook._load: Workbook, %s, could not be opened: "
+                           "%s", self.wb_fp, e)
+            return {ws_name: str(e) for ws_name in ws_names}
+        try:
+            for ws_name in ws_names:
+                try:
+                    with metrics.timer('load.read_excel', wb_file_name):
+                        df = f.parse(sheet_name=ws_name, index_col=0, na_values=True)
+                except (OSError, ValueError, zipfile.BadZipFile) as e:
+                    logger.warning("LazyWorkbook._load: Worksheet, %s, in %s could "
+                                   "not be read: %s", ws_name, self.wb_fp, e)
+                    read_errors[ws_name] = str(e)
+                    continue
+                table = clean_worksheet(df, ws_name)
+                metrics.count('load.worksheets')
+                if validate_workbook(self.wb_name, {ws_name: table}) is None:
+                    self._tables[ws_name] = table
+                else:
+                    self.bad_format.append(ws_name)
+        finally:
+            f.close()
+        logger.debug("LazyWorkbook._load: Loaded %s from %s.", ws_names, self.wb_fp)
+        return read_errors
+
+    def is_loaded(self):
+        """
+        This method returns True once every worksheet has been loaded and
+        validated, False otherwise.
+        :return: bool
+        """
+        return len(self._tables) == len(self.ws_list)
+
+    def warm_up(self):
+        """
+        This method loads every worksheet that has not been used yet. Each
+        worksheet is loaded under the lock separately, so a lookup from the GUI
+        only ever waits for a single worksheet. Worksheets that cannot be read
+        are left to be read on first use.
+        :return: None
+        """
+        for ws_name in self.ws_list:
+            with self._lock:
+                if ws_name not in self._tables and ws_name not in self.bad_format:
+                    self._load([ws_name])
+        with self._lock:
+            bad_format = list(self.bad_format)
+        logger.debug("LazyWorkbook.warm_up: Workbook, %s, is fully loaded. Invalid "
+                     "worksheets: %s.", self.wb_name, bad_format)
+
+    def start_warm_up(self):
+        """
+        This method runs warm_up() on a daemon thread and returns the thread.
+        :return: threading.Thread
+        """
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self.warm_up, daemon=True)
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def to_dict(self):
+        """
+        This method returns the loaded worksheets as a plain dict.
+        :return: dict mapping worksheet titles to pd.DataFrame
+        """
+        with self._lock:
+            return dict(self._tables)
+
+
+def open_lazy_workbook(wb_fp, wb_name, ws_list):
+    """
+    This function checks the workbook at wb_fp without parsing any worksheet
+    and returns a report in the same format as load_and_validate_workbook().
+    The 'tables' key holds a LazyWorkbook instead of a dict of DataFrames.
+    Only the list of worksheet titles is read, so problems inside a worksheet
+    are found when it is first used.
+    :param wb_fp: filepath to an Excel workbook
+    :param wb_name: str, workbook name as it appears in config.json
+    :param ws_list: list of str, names of the required worksheets
+    :return: dict
+    """
+    data = {'missing_workbook': False, 'corrupt_workbook': False,
+            'missing': None, 'corrupt': None, 'bad_format': None,
+            'tables': None}
+    if not os.path.exists(wb_fp):
+        data['missing_workbook'] = True
+        return data
+    try:
+        f = pd.ExcelFile(wb_fp)
+    except (ValueError, zipfile.BadZipFile):
+        data['corrupt_workbook'] = True
+        return data
+    actual_worksheets = f.sheet_names
+    f.close()
+
+    missing_names = [ws_name for ws_name in ws_list
+                     if ws_name not in actual_worksheets]
+    if len(missing_names) != 0:
+        data['missing'] = missing_names
+    data['tables'] = LazyWorkbook(wb_fp, wb_name, ws_list)
+    return data
+
+
+@metrics.timed('load.load_workbooks')
+def load_workbooks(wb_fps, wb_names, required_tables, max_workers=None,
+                   lazy_names=()):
+    """
+    This function loads and validates every workbook in wb_fps using
+    load_and_validate_workbook(). wb_names must be in the same order as wb_fps.
+    required_tables is the 'required tables' section of config.json, which maps
+    each workbook name to its list of worksheets.
+
+    Each workbook is handled by its own task on a process pool, so several
+    workbooks are read and validated at the same time. max_workers limits the
+    number of worker processes. It defaults to the number of CPUs. With a single
+    workbook or max_workers set to 1, everything runs in the calling process.
+
+    Workbooks named in lazy_names are not loaded at all. They are only checked
+    for missing worksheets by open_lazy_workbook(), and their entry in 'tables'
+    is a LazyWorkbook that loads and validates each worksheet on first use.
+
+    The time taken by each stage is recorded in metrics, including the stages
+    run by the worker processes.
+
+    The returned dict has the following keys:
+        'missing': list of workbook filepaths that do not exist or None
+        'corrupt': list of workbook filepaths that could not be opened or None
+        'missing_worksheets': dict mapping workbook filepaths to the list of
+            missing worksheets
+        'corrupt_worksheets': dict mapping workbook filepaths to the list of
+            worksheets that could not be read
+        'bad_format': dict mapping workbook names to the list of worksheets
+            that failed check_worksheet()
+        'tables': dict mapping workbook names to dicts of worksheet titles
+            and pd.DataFrame
+    :param wb_fps: list of filepaths
+    :param wb_names: list of str, workbook names as they appear in config.json
+    :param required_tables: dict
+    :param max_workers: int or None, defaults to the number of CPUs
+    :param lazy_names: list of str, names of workbooks to load lazily
+    :return: dict
+    """
+    missing_workbooks = []
+    corrupt_workbooks = []
+    data = {'missing': None, 'corrupt': None, 'missing_worksheets': {},
+            'corrupt_worksheets': {}, 'bad_format': {}, 'tables': {}}
+    results = {}
+    for idx, wb_name in enumerate(wb_names):
+        if wb_name in lazy_names:
+            results[wb_name] = open_lazy_workbook(wb_fps[idx], wb_name,
+                                                  required_tables[wb_name])
+    eager_names = [wb_name for wb_name in wb_names if wb_name not in results]
+    eager_fps = [wb_fps[idx] for idx, wb_name in enumerate(wb_names)
+                 if wb_name not in results]
+    ws_lists = [required_tables[wb_name] for wb_name in eager_names]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(eager_names))
+    if max_workers > 1:
+        # The stages timed in the workers are added to the metrics of this process.
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            eager_results = []
+            for wb_data, worker_metrics in executor.map(
+                    run_measured, repeat(load_and_validate_workbook), eager_fps,
+                    eager_names, ws_lists):
+                eager_results.append(wb_data)
+                metrics.merge(worker_metrics)
+    else:
+        eager_results = [load_and_validate_workbook(wb_fp, wb_name, ws_list)
+                         for wb_fp, wb_name, ws_list in
+                         zip(eager_fps, eager_names, ws_lists)]
+    results.update(zip(eager_names, eager_results))
+
+    # The report keeps the order of wb_names.
+    for idx, wb_name in enumerate(wb_names):
+        wb_fp = wb_fps[idx]
+        wb_data = results[wb_name]
+        if wb_data['missing_workbook']:
+            missing_workbooks.append(wb_fp)
+            continue
+        if wb_data['corrupt_workbook']:
+            corrupt_workbooks.append(wb_fp)
+            continue
+        if wb_data['missing'] is not None:
+            data['missing_worksheets'][wb_fp] = wb_data['missing']
+        if wb_data['corrupt'] is not None:
+            data['corrupt_worksheets'][wb_fp] = wb_data['corrupt']
+        if wb_data['bad_format'] is not None:
+            data['bad_format'][wb_name] = wb_data['bad_format']
+        data['tables'][wb_name] = wb_data['tables']
+
+    if len(missing_workbooks) != 0:
+        data['missing'] = missing_workbooks
+    if len(corrupt_workbooks) != 0:
+        data['corrupt'] = corrupt_workbooks
+    logger.debug("load_workbooks: missing: %s. corrupt: %s. missing_worksheets: %s. "
+                 "corrupt_worksheets: %s. bad_format: %s.", data['missing'],
+                 data['corrupt'], data['missing_worksheets'],
+                 data['corrupt_worksheets'], data['bad_format'])
+    return data
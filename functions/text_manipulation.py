@@ -1,3 +1,8 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 def return_range(s, debug=False):
     """
     This function takes a string in one of two forms: n or m-n, where
@@ -10,7 +15,7 @@ def return_range(s, debug=False):
     :param debug: bool, defaults to False
     :return: tuple in the form (m, m) or (m, n)
     """
-    print(f"return_range: s: {s}.")
+    logger.debug("return_range: s: %s.", s)
     # First, make sure the string is not NoneType.
     if s is None:
         error_msg = (f"return_range: Fatal Error: The string cannot be "
@@ -20,15 +25,15 @@ def return_range(s, debug=False):
     # Second, check the string for integers and dashes.
     s = str(s)
     if debug:
-        print(f"return_range: s: {s}.")
+        logger.debug("return_range: s: %s.", s)
     # Remove blank spaces.
     s = s.replace(' ', '')
     if debug:
-        print(f"return_range: s: {s}.")
+        logger.debug("return_range: s: %s.", s)
     ctr = 0
     for c in s:
         if debug:
-            print(f"return_range: c: {c}. ctr: {ctr}")
+            logger.debug("return_range: c: %s. ctr: %s", c, ctr)
         if c != '-':
             try:
                 n = int(c.strip())
@@ -55,5 +60,5 @@ def return_range(s, debug=False):
         n = int(l[1].strip())
         result = (m, n)
 
-    print(f"return_range: result: {result}")
+    logger.debug("return_range: result: %s", result)
     return result
\ No newline at end of file
@@ -0,0 +1,601 @@
+import logging
+from collections import namedtuple
+from entities import (Treasure, OtherWealth, MagicItem, Coin, Gem, Valuable,
+                      compile_dice_expression, return_die_roll, return_randint)
+from .roll_tables import RollTableIndex
+from .treasure_index import build_cr_index, TREASURE_TYPES
+from .workbook_roles import WorkbookRegistry
+from .treasure_plans import TreasurePlans
+from .instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+dict_path = namedtuple('dict_path', ['workbook', 'worksheet'])
+# A problem that left part of a treasure out. severity is 'Serious Error' or
+# 'Trappable Error', the same titles the treasure window uses for its dialogs.
+TreasureIssue = namedtuple('TreasureIssue', ['severity', 'message'])
+# One treasure from TreasureEngine.generate_many(). challenge_rating is the CR
+# as it was given and issues is a tuple of TreasureIssue.
+TreasureResult = namedtuple('TreasureResult', ['challenge_rating', 'treasure', 'issues'])
+# The coin, magic, and other valuables worksheets for a CR. Each is a tuple of
+# the worksheet name and the DiceExpression in its header.
+ResolvedCR = namedtuple('ResolvedCR', ['cr', 'coin', 'magic', 'other'])
+
+
+class TreasureError(ValueError):
+    """
+    This exception is raised by TreasureEngine when a treasure cannot be
+    generated at all. severity is 'Fatal Error', the title the treasure window
+    uses for its dialog, and message describes the problem.
+    """
+    def __init__(self, severity: str, message: str):
+        super().__init__(message)
+        self.severity = severity
+        self.message = message
+
+    def __reduce__(self):
+        # Lets the error be sent back from a worker process.
+        return TreasureError, (self.severity, self.message)
+
+
+class TreasureEngine:
+    """
+    This class generates treasure from the CR-based treasure workbook and the
+    magic item, gem, and valuables workbooks, without any user interface. It
+    is built from the 'tables' section of config.json and the tables dict that
+    StartWindow loads. The compiled helpers (roll tables, CR index, workbook
+    registry, and treasure plans) are built here if they are not supplied.
+
+    Every roll and table choice comes from rng, a RandomStream. None uses the
+    global random module. Problems are never shown to the user here: fatal
+    ones raise a TreasureError and the rest are collected in self.issues as
+    TreasureIssue tuples, for the caller to report.
+    """
+    def __init__(self, config: dict, tables: dict, roll_tables=None,
+                 cr_index=None, workbook_roles=None, treasure_plans=None,
+                 rng=None):
+        self.config = config
+        self.tables = tables
+        required_tables = config['tables']['required tables']
+        # The compiled roll tables are normally built by StartWindow at load time.
+        # Anything missing is compiled on first use.
+        if roll_tables is None:
+            roll_tables = RollTableIndex(tables)
+        self.roll_tables = roll_tables
+        # The CR index maps each CR and treasure type to its worksheet.
+        if cr_index is None:
+            cr_index = build_cr_index(required_tables, roll_tables)
+        self.cr_index = cr_index
+        # The registry sorts the workbooks by role, such as 'magic item'.
+        if workbook_roles is None:
+            workbook_roles = WorkbookRegistry(required_tables)
+        self.workbook_roles = workbook_roles
+        # The treasure plans are the compiled cells of the CR-based workbook.
+        if treasure_plans is None and cr_index is not None:
+            treasure_plans = TreasurePlans(cr_index, roll_tables)
+            treasure_plans.compile_tables()
+        self.treasure_plans = treasure_plans
+        self.rng = rng
+        self.treasure = None
+        self.issues = []
+
+    @staticmethod
+    def parse_cr(challenge_rating):
+        """
+        This static method converts a challenge rating as it appears in the
+        treasure window, such as '1/8', '1/2', '11', or '41+', to the integer
+        CR used to find the treasure worksheets. An int is returned unchanged.
+        :param challenge_rating: str or int
+        :return: int
+        """
+        if isinstance(challenge_rating, int):
+            return challenge_rating
+        match challenge_rating:
+            case '0'|'1/8':
+                return 0
+            case '1/4'|'1/2':
+                return 1
+            case '41+':
+                return 41
+            case _:
+                return int(challenge_rating)
+
+    def _report(self, severity, error_msg):
+        """
+        This method records a problem that left part of the treasure out.
+        :param severity: str, 'Serious Error' or 'Trappable Error'
+        :param error_msg: str
+        :return: None
+        """
+        logger.warning("TreasureEngine._report: %s: %s", severity, error_msg)
+        metrics.count('generate.issues')
+        self.issues.append(TreasureIssue(severity=severity, message=error_msg))
+
+    def generate(self, cr):
+        """
+        This method generates the treasure for an encounter with the challenge
+        rating, cr, and returns it. cr is an int or a challenge rating string as
+        it appears in the treasure window, such as '1/4' or '41+'. Problems that
+        stop generation raise a TreasureError. Problems that only leave part of
+        the treasure out are collected in self.issues, which is cleared at the
+        start of each call.
+        :param cr: int or str
+        :return: Treasure
+        """
+        return self._generate_resolved(self._resolve_cr(cr))
+
+    def generate_many(self, crs, number=1):
+        """
+        This generator method generates number treasures for each challenge
+        rating in crs and yields them one at a time as TreasureResult tuples,
+        in order. crs is a single challenge rating or an iterable of them, in
+        any form generate() accepts. The worksheets and header dice of each CR
+        are resolved once for the whole batch, and every roll comes from
+        self.rng, so a seeded engine replays the same batch.
+
+        A TreasureError for a CR that has no worksheets is raised when that CR
+        is reached. The issues of each treasure are in its TreasureResult;
+        self.issues holds those of the last treasure yielded.
+        :param crs: int, str, or iterable of int or str
+        :param number: int, the number of treasures for each CR
+        :return: generator of TreasureResult
+        """
+        if isinstance(crs, (int, str)):
+            crs = (crs,)
+        resolved = {}
+        for challenge_rating in crs:
+            cr = self.parse_cr(challenge_rating)
+            if cr not in resolved:
+                resolved[cr] = self._resolve_cr(cr)
+            for _ in range(number):
+                treasure = self._generate_resolved(resolved[cr])
+                yield TreasureResult(challenge_rating=challenge_rating,
+                                     treasure=treasure, issues=tuple(self.issues))
+
+    def _resolve_cr(self, cr):
+        """
+        This method finds the coin, magic, and other valuables worksheets for
+        cr and compiles the dice in the header of each. It returns a
+        ResolvedCR, which _generate_resolved() can use for any number of
+        treasures. A TreasureError is raised if there is no CR-based treasure
+        workbook or it has no worksheets for cr.
+        :param cr: int or str
+        :return: ResolvedCR
+        """
+        cr = self.parse_cr(cr)
+        # The CR-Based treasure workbook was found when the CR index was built.
+        if self.cr_index is None:
+            error_msg = (f"TreasureEngine._resolve_cr: A CR-based "
+                         f"treasure workbook could not be found in "
+                         f"required tables.")
+            raise TreasureError("Fatal Error", error_msg)
+        cr_wb_name = self.cr_index.wb_name
+        worksheets = {}
+        for treasure_type in TREASURE_TYPES:
+            ws_name = self._return_ws_name(treasure_type, cr)
+            table = self.tables[cr_wb_name][ws_name]
+            die = compile_dice_expression(table.columns[0].lower())
+            worksheets[treasure_type] = (ws_name, die)
+        resolved = ResolvedCR(cr=cr, **worksheets)
+        logger.debug("TreasureEngine._resolve_cr: resolved: %s.", resolved)
+        return resolved
+
+    @metrics.timed('generate.treasure')
+    def _generate_resolved(self, resolved):
+        """
+        This method generates one treasure from the worksheets in resolved, a
+        ResolvedCR, and returns it. self.issues is cleared first. The time
+        taken by the coin, magic, and other valuables phases is recorded in
+        metrics.
+        :param resolved: ResolvedCR
+        :return: Treasure
+        """
+        self.issues = []
+
+        # Create an empty Treasure object.
+        self.treasure = Treasure()
+        logger.debug("TreasureEngine._generate_resolved: cr: %s. treasure: %s.",
+                     resolved.cr, self.treasure)
+
+        # Generate the coin treasure from the coin (cash) worksheet.
+        with metrics.timer('generate.coin'):
+            coin_ws, coin_die = resolved.coin
+            coin_result = coin_die.roll(rng=self.rng)
+            logger.debug("TreasureEngine._generate_resolved: coin_ws: %s. "
+                         "coin_result: %s.", coin_ws, coin_result)
+
+            coin_plans = self._get_treasure_plans(coin_ws, coin_result)
+            self._roll_coins(coin_plans)
+        logger.debug("TreasureEngine._generate_resolved: Coin Treasure completed.")
+
+        # Generate the magic items to include in treasures.
+        with metrics.timer('generate.magic'):
+            magic_ws, magic_die = resolved.magic
+            magic_result = magic_die.roll(rng=self.rng)
+            logger.debug("TreasureEngine._generate_resolved: magic_ws: %s. "
+                         "magic_result: %s.", magic_ws, magic_result)
+
+            magic_plans = self._get_treasure_plans(magic_ws, magic_result)
+            if magic_plans != ():
+                self._roll_magic_items(magic_plans)
+        logger.debug("TreasureEngine._generate_resolved: Magic Items completed.")
+
+        # Generate gems and other valuables.
+        with metrics.timer('generate.other'):
+            other_val_ws, other_val_die = resolved.other
+            other_val_result = other_val_die.roll(rng=self.rng)
+            logger.debug("TreasureEngine._generate_resolved: other_val_ws: %s. "
+                         "other_val_result: %s.", other_val_ws, other_val_result)
+
+            other_val_plans = self._get_treasure_plans(other_val_ws, other_val_result)
+            if other_val_plans != ():
+                self._roll_other_val_items(other_val_plans)
+        logger.debug("TreasureEngine._generate_resolved: Other Valuables completed.")
+        logger.debug("TreasureEngine._generate_resolved: treasure: %s.", self.treasure)
+        return self.treasure
+
+    def _roll_other_val_items(self, other_val_plans):
+        """
+        This internal function rolls the number of each type of item in the
+        compiled other_val_plans, a tuple of OtherValPlan. Next, it determines which
+        table in the other valuables workbook that handles those items.
+
+        All of its actions take place internally, changing only the treasure attribute.
+        :param other_val_plans: tuple of OtherValPlan
+        :return:
+        """
+        logger.debug("TreasureEngine._roll_other_val_items: other_val_plans: %s.",
+                     other_val_plans)
+
+        rolls = []
+        tables = []
+        values = []
+        for plan in other_val_plans:
+            values.append(plan.value)
+            tables.append(plan.item_type)
+            if plan.dice is None:
+                rolls.append(plan.number)
+            else:
+                rolls.append(return_die_roll(plan.dice, rng=self.rng))
+        logger.debug("TreasureEngine._roll_other_val_items: rolls: %s. tables: %s. "
+                     "values: %s.", rolls, tables, values)
+
+        other_wealth = OtherWealth()
+        for idx, item_type in enumerate(tables):
+            no_items = rolls[idx]
+            item_val = values[idx]
+            logger.debug("TreasureEngine._roll_other_val_items: no_items: %s, "
+                         "item_val: %s, item_type: %s.", no_items, item_val, item_type)
+            other_val_wb_names = self.workbook_roles.workbooks(item_type)
+            if other_val_wb_names == []:
+                error_msg = (f"TreasureEngine._roll_other_val_items: There are no "
+                             f"other valuables workbooks in the data tables. This is a "
+                             f"not a fatal error, but it means that no specific "
+                             f"other valuables can be determined.")
+                self._report('Serious Error', error_msg)
+                return
+            else:
+                logger.debug("TreasureEngine._roll_other_val_items: "
+                             "other_val_wb_names: %s.", other_val_wb_names)
+
+            # Since the denominations could differ from valuables and gem tables,
+            # other_val_ws_names must contain tuples of (wb_name, ws_name).
+            other_val_ws_names = [dict_path(workbook=wb_name, worksheet=ws_name)
+                                  for wb_name, ws_name in
+                                  self.workbook_roles.other_val_ws_names(item_type,
+                                                                         item_val)]
+
+            if other_val_ws_names == []:
+                error_msg = (f"TreasureEngine._roll_other_val_items: There are no "
+                             f"other valuables worksheets in the data tables. This is a "
+                             f"not a fatal error, but it means that no specific "
+                             f"other valuables can be determined.")
+                self._report('Serious Error', error_msg)
+                return
+            else:
+                logger.debug("TreasureEngine._roll_other_val_items: "
+                             "other_val_ws_names: %s.", other_val_ws_names)
+
+            # We have our paths to the worksheets are needed. Gem and other
+            # valuables worksheets have 3 columns: roll, 'gemstone[s]'
+            # or 'valuable[s]', and 'description[s]' or 'example[s]'.
+            no_other_val_tables = len(other_val_ws_names)
+            for n in range(no_items):
+                # Pick the table from those found.
+                table_no = return_randint(0, no_other_val_tables - 1, self.rng)
+                table_choice = other_val_ws_names[table_no]
+                logger.debug("TreasureEngine._roll_other_val_items: idx: %s. "
+                             "table_no: %s. table_choice: %s.", idx, table_no,
+                             table_choice)
+                other_val_table = self.tables[table_choice[0]][table_choice[1]]
+                logger.debug("TreasureEngine._roll_other_val_items: other_val_table: "
+                             "%s.", other_val_table)
+
+                die_roll = self._extract_dice_from_table_header_return_result(
+                    other_val_table, self.rng)
+                logger.debug("TreasureEngine._roll_other_val_items: die_roll: %s.",
+                             die_roll)
+                logger.debug("TreasureEngine._roll_other_val_items: item_type: %s. "
+                             "item_val: %s.", item_type, item_val)
+                result = self._get_table_result(table_choice[0], table_choice[1],
+                                                die_roll, table_type=item_type)
+                logger.debug("TreasureEngine._roll_other_val_items: result: %s.",
+                             result)
+
+                # Now, the result needs to be split up by type and the treasures
+                # created and added to self.treasure.
+                if item_type == 'gems':
+                    gem_info = result.split(" Desc: ")
+                    gem_type = gem_info[0]
+                    gem_desc = gem_info[1]
+                    gem = Gem(type=gem_type, description=gem_desc, value=item_val)
+                    logger.debug("TreasureEngine._roll_other_val_items: gem: %s.", gem)
+                    other_wealth.add_item(gem)
+                else:
+                    other_val_info = result.split(" Ex: ")
+                    other_val_item = other_val_info[0]
+                    other_val_ex = other_val_info[1]
+                    valuable = Valuable(item=other_val_item, example=other_val_ex,
+                                        value=item_val)
+                    logger.debug("TreasureEngine._roll_other_val_items: valuable: %s.",
+                                 valuable)
+                    other_wealth.add_item(valuable)
+                logger.debug("TreasureEngine._roll_other_val_items: other_wealth: %s.",
+                             other_wealth)
+        logger.debug("TreasureEngine._roll_other_val_items: other_wealth: %s.",
+                     other_wealth)
+        self.treasure.add_item(other_wealth)
+
+    def _roll_magic_items(self, magic_plans):
+        """
+        This method takes the compiled magic_plans, a tuple of MagicPlan, and rolls
+        the number of magic items to take from each Magic Items table. It, then,
+        makes the desired rolls on those tables and adds the results to
+        self.treasure. There is no output.
+        :param magic_plans: tuple of MagicPlan
+        :return: None, all activity changes self.treasure attribute
+        """
+        logger.debug("TreasureEngine._roll_magic_items: magic_plans: %s.", magic_plans)
+
+        rolls = []
+        tables = []
+        for plan in magic_plans:
+            tables.append(plan.table)
+            if plan.dice is None:
+                rolls.append(plan.number)
+            else:
+                rolls.append(return_die_roll(plan.dice, rng=self.rng))
+        logger.debug("TreasureEngine._roll_magic_items: rolls %s. tables: %s.", rolls,
+                     tables)
+
+        # Convert table numbers to names of Magic Item tables.
+        magic_item_wb_names = self.workbook_roles.workbooks('magic item')
+        if magic_item_wb_names == []:
+            error_msg = (f"TreasureEngine._roll_magic_items: There are no magic item "
+                         f"tables in the data tables. This is a not a fatal error, but "
+                         f"it means that no specific magic items can be determined.")
+            self._report('Serious Error', error_msg)
+            return
+        else:
+            logger.debug("TreasureEngine._roll_magic_items: magic_item_wb_names: %s.",
+                         magic_item_wb_names)
+        no_magic_item_wbs = len(magic_item_wb_names)
+        for idx, num in enumerate(rolls):
+            for i in range(num):
+                logger.debug("TreasureEngine._roll_magic_items: idx: %s, num: %s. i: "
+                             "%s.", idx, num, i)
+                # Determine the workbook to use.
+                wb_choice = return_randint(0, no_magic_item_wbs - 1, self.rng)
+                magic_item_wb_name = magic_item_wb_names[wb_choice]
+                magic_item_wb = self.tables[magic_item_wb_name]
+                logger.debug("TreasureEngine._roll_magic_items: wb_choice: %s. "
+                             "magic_item_wb_name: %s.", wb_choice, magic_item_wb_name)
+
+                # The format for Magic Item tables is '{wb_name} N', where N is an integer
+                # from 1 to 26. The registry built these names without the file
+                # extension when the tables were loaded.
+                n = int(tables[idx])
+                try:
+                    magic_item_ws_name = self.workbook_roles.magic_item_ws_name(
+                        magic_item_wb_name, n)
+                except ValueError:
+                    error_msg = (f"TreasureEngine._roll_magic_items: The magic item "
+                                 f"workbook has an invalid name format. Only 3 or 4 "
+                                 f"letter extensions are supported.")
+                    self._report('Serious Error', error_msg)
+                    return
+                wb_name_sans_ext = self.workbook_roles.wb_names_sans_ext[
+                    magic_item_wb_name]
+
+                try:
+                    magic_item_ws = magic_item_wb[magic_item_ws_name]
+                except KeyError:
+                    error_msg = (f"TreasureEngine._roll_magic_items: A magic item "
+                                 f"worksheet in workbook, {magic_item_wb} is not "
+                                 f"formatted correctly. Worksheet names must be formated as "
+                                 f"'{wb_name_sans_ext} N', where N is an integer between "
+                                 f"1 and 26. This is a not a fatal error, but it means "
+                                 f"that no specific magic items can be determined "
+                                 f"using this workbook.")
+                    self._report('Serious Error', error_msg)
+                    return
+                except ValueError as e:
+                    # Magic item worksheets loaded on first use are validated
+                    # here instead of at startup.
+                    error_msg = (f"TreasureEngine._roll_magic_items: {e} This is a "
+                                 f"not a fatal error, but it means that no specific "
+                                 f"magic items can be determined using this "
+                                 f"worksheet.")
+                    self._report('Serious Error', error_msg)
+                    return
+
+                # magic_item_ws should be set at this point.
+                logger.debug("TreasureEngine._roll_magic_items: magic_item_ws_name: "
+                             "%s. magic_item_ws: %s.", magic_item_ws_name,
+                             magic_item_ws)
+                roll_result = self._extract_dice_from_table_header_return_result(
+                    magic_item_ws, self.rng)
+                result = self._get_table_result(magic_item_wb_name, magic_item_ws_name,
+                                                roll_result)
+                logger.debug("TreasureEngine._roll_magic_items: roll_result: %s. "
+                             "result: %s.", roll_result, result)
+                self.treasure.add_item(MagicItem(result, magic_item_ws_name))
+        logger.debug("TreasureEngine._roll_magic_items: self.treasure: %s.",
+                     self.treasure)
+        logger.debug("TreasureEngine._roll_magic_items: Magic Item determination "
+                     "completed.")
+        return
+
+    @staticmethod
+    def _extract_dice_from_table_header_return_result(table, rng=None):
+        """
+        This static method requires a treasure table that has the format in which the
+        first column is the dice to use and rolled ranges. It will return the dice roll,
+        an integer.
+        :param table: pd.DataFrame
+        :param rng: RandomStream or None
+        :return: int
+        """
+        dice_info = table.columns[0].lower()
+        die = compile_dice_expression(dice_info)
+        roll = die.roll(rng=rng)
+        logger.debug("TreasureEngine._extract_dice_roll_dice: dice_info: %s. roll: "
+                     "%s.", dice_info, roll)
+        logger.debug("TreasureEngine._extract_dice_roll_dice: \ndie: %s.", die.dice)
+        return roll
+
+    def _roll_coins(self, coin_plans):
+        """
+        This method takes the compiled coin_plans, a tuple of CoinPlan, rolls the
+        dice of each, and multiplies the roll by its multiplier. It will then add
+        the correct Coin objects to self.treasure.
+        :param coin_plans: tuple of CoinPlan
+        :return: None
+        """
+        for plan in coin_plans:
+            die_roll = return_die_roll(plan.dice, rng=self.rng)
+            total = die_roll * plan.multiplier
+            coin = Coin(number=total, type=plan.currency)
+            self.treasure.add_item(coin)
+            logger.debug("TreasureEngine:_roll_coins: treasure: %s.", self.treasure)
+        logger.debug("TreasureEngine._roll_coins: Process completed.")
+
+    def _get_treasure_plans(self, ws, roll):
+        """
+        This method returns the compiled plans for the row of the CR-based
+        treasure worksheet, ws, whose roll range contains roll. The plans were
+        compiled when the tables were loaded, so no result text is parsed here.
+        If the worksheet has no row for roll, an empty tuple is returned.
+        :param ws: str
+        :param roll: int
+        :return: tuple of CoinPlan, MagicPlan, or OtherValPlan
+        """
+        logger.debug("TreasureEngine._get_treasure_plans: ws: %s, roll: %s.", ws, roll)
+        try:
+            plans = self.treasure_plans.get_plans(ws, roll)
+        except (KeyError, ValueError):
+            error_msg = (f"TreasureEngine._get_treasure_plans: {ws} is invalid. "
+                         f"Returning empty treasure.")
+            self._report('Trappable Error', error_msg)
+            plans = ()
+        logger.debug("TreasureEngine._get_treasure_plans: plans: %s.", plans)
+        return plans
+
+    def _get_table_result(self, wb_name, ws, roll, table_type='normal'):
+        """
+        This method takes the roll integer, finds the value in the dXX columns
+        that contains that value (or is in the range of values) and returns the
+        corresponding result text. The worksheet, ws, in the workbook, wb_name,
+        is looked up in its compiled RollTable, so no roll range is parsed here.
+        This method needs the name of worksheet sent to it in case there is an error
+        in the table content that prevents this method from returning a str from
+        the table based on the roll. Each lookup is timed in metrics.
+        The behavior of this method changes when the table_type is set to 'gems'
+        or 'valuables'. Under this setting, it looks for 2 columns of results to put
+        together to produce the desired output string. For gems, the second column
+        is 'gemstone', the third is 'description'. For other valuables, the second
+        column is 'valuable', the third is 'example'. The format of the output for
+        gems is gemstone (desc: description). The format of the output for other
+        valuables is valuable (ex: example).
+        :param wb_name: str
+        :param ws: str
+        :param roll: int
+        :param table_type: str, defaults to 'normal', alternate values are 'gems'
+            or 'valuables'
+        :return: str
+        """
+        logger.debug("TreasureEngine._get_table_result: ws: %s, roll: %s. "
+                     "table_type: %s.", ws, roll, table_type)
+        try:
+            with metrics.timer('generate.table_lookup', wb_name):
+                result = self.roll_tables.get(wb_name, ws).lookup(roll, table_type)
+        except (KeyError, ValueError):
+            error_msg = (f"TreasureEngine._get_table_result: {ws} is invalid. "
+                         f"Returning empty coin treasure.")
+            self._report('Trappable Error', error_msg)
+            result = "nothing"
+
+        if result == "-":
+            result = "nothing"
+        logger.debug("TreasureEngine._get_table_result: result: %s.", result)
+        return result
+
+    def _return_ws_name(self, treasure_type, cr):
+        """
+        This method returns the worksheet title in the CR-based treasure
+        workbook whose CR range contains the cr and which matches the
+        treasure_type. It is a single lookup in self.cr_index, which parsed
+        every worksheet title when it was built.
+        :param treasure_type: str, only 'coin', 'magic', and 'other
+            are valid values
+        :param cr: int
+        :return: str, worksheet title
+        """
+        if treasure_type not in TREASURE_TYPES:
+            error_msg = (f"TreasureEngine._return_ws_name: Invalid "
+                         f"type of treasure, {treasure_type}. Only"
+                         f"coin, magic, or other are supported.")
+            raise TreasureError("Fatal Error", error_msg)
+
+        try:
+            return self.cr_index.worksheet(treasure_type, cr)
+        except KeyError:
+            error_msg = (f"TreasureEngine._return_ws_name: No "
+                         f"worksheet in {self.cr_index.wb_name} contains the "
+                         f"CR {cr}.")
+            raise TreasureError("Fatal Error", error_msg)
+
+
+def parse_cr_list(cr_args):
+    """
+    This function expands CR arguments, as given on the command line or to the
+    treasure server, into a list of challenge ratings. Each argument is a
+    single CR as it appears in the treasure window, such as '1/4', '11', or
+    '41+', a range of integer CRs, such as '5-10', or a comma separated list
+    of either. A ValueError is raised for anything else.
+    :param cr_args: list of str
+    :return: list of str
+    """
+    crs = []
+    for arg in cr_args:
+        for element in arg.split(','):
+            element = element.strip()
+            if element == '':
+                continue
+            if '-' in element:
+                low, high = element.split('-', 1)
+                try:
+                    low, high = int(low), int(high)
+                except ValueError:
+                    raise ValueError(f"parse_cr_list: Invalid CR range, {element}.")
+                if low > high:
+                    raise ValueError(f"parse_cr_list: CR range, {element}, is "
+                                     f"reversed.")
+                crs.extend(str(cr) for cr in range(low, high + 1))
+            else:
+                try:
+                    TreasureEngine.parse_cr(element)
+                except ValueError:
+                    raise ValueError(f"parse_cr_list: Invalid CR, {element}.")
+                crs.append(element)
+    return crs
@@ -0,0 +1,164 @@
+import logging
+from .text_manipulation import return_range
+
+logger = logging.getLogger(__name__)
+
+TREASURE_TYPES = ('coin', 'magic', 'other')
+# Highest CR offered by the treasure window. CR 41 stands for '41+'.
+MAX_CR = 41
+
+
+def find_cr_workbook(required_tables):
+    """
+    This function returns the name of the CR-based treasure workbook from the
+    'required tables' section of config.json. It is the last workbook whose
+    name contains 'cr'. Returns '' if there is none.
+    :param required_tables: dict
+    :return: str
+    """
+    cr_wb_name = ''
+    for wb_name in required_tables:
+        if 'cr' in wb_name.lower():
+            cr_wb_name = wb_name
+    return cr_wb_name
+
+
+def parse_cr_worksheet_title(ws_name):
+    """
+    This function splits a CR-based treasure worksheet title, such as
+    'Treasure For CRs 1-4 Coin' or 'Treasure For CR 41+ Magic', into its CR
+    range and treasure type. The treasure type is the last word of the title
+    and the CR range is the word before it. A trailing '+' is ignored.
+    A ValueError is raised if the title does not have this format.
+    :param ws_name: str, worksheet title
+    :return: 3-tuple of int, int, str (low CR, high CR, treasure type)
+    """
+    l = ws_name.lower().split()
+    if len(l) < 2:
+        raise ValueError(f"parse_cr_worksheet_title: Worksheet title, {ws_name}, "
+                         f"must end with a CR range and a treasure type.")
+    r_txt = l[-2]
+    if r_txt[-1] == '+':
+        r_txt = r_txt[:-1]
+    low, high = return_range(r_txt)
+    if low > high:
+        low, high = high, low
+    return low, high, l[-1]
+
+
+class CRIndex:
+    """
+    This class maps every integer CR and treasure type ('coin', 'magic', or
+    'other') straight to its worksheet in the CR-based treasure workbook. The
+    worksheet titles are parsed once when the index is built, which is also
+    when gaps and overlaps are found:
+        gaps: list of (cr, treasure type) with no worksheet
+        overlaps: list of (cr, treasure type, worksheet) where a later
+            worksheet covers a CR already covered by an earlier one. The
+            earlier worksheet is used.
+        invalid_titles: list of worksheet titles that could not be parsed
+    If roll_tables, a RollTableIndex, is given, get_table() also returns the
+    compiled table of the worksheet.
+    """
+    def __init__(self, wb_name: str, ws_list: list, roll_tables=None,
+                 max_cr=MAX_CR):
+        self.wb_name = wb_name
+        self.roll_tables = roll_tables
+        self.worksheets = {}
+        self.gaps = []
+        self.overlaps = []
+        self.invalid_titles = []
+        for ws_name in ws_list:
+            try:
+                low, high, treasure_type = parse_cr_worksheet_title(ws_name)
+            except ValueError:
+                self.invalid_titles.append(ws_name)
+                continue
+            if treasure_type not in TREASURE_TYPES:
+                self.invalid_titles.append(ws_name)
+                continue
+            for cr in range(low, high + 1):
+                if (cr, treasure_type) in self.worksheets:
+                    self.overlaps.append((cr, treasure_type, ws_name))
+                else:
+                    self.worksheets[(cr, treasure_type)] = ws_name
+        for cr in range(0, max_cr + 1):
+            for treasure_type in TREASURE_TYPES:
+                if (cr, treasure_type) not in self.worksheets:
+                    self.gaps.append((cr, treasure_type))
+        logger.debug("CRIndex: Indexed %s CR and treasure type pairs in %s. gaps: %s. "
+                     "overlaps: %s. invalid_titles: %s.", len(self.worksheets), wb_name,
+                     self.gaps, self.overlaps, self.invalid_titles)
+
+    def worksheet(self, treasure_type, cr):
+        """
+        This method returns the title of the worksheet for treasure_type at the
+        integer cr. A KeyError is raised if there is none.
+        :param treasure_type: str, 'coin', 'magic', or 'other'
+        :param cr: int
+        :return: str
+        """
+        return self.worksheets[(cr, treasure_type)]
+
+    def get_table(self, treasure_type, cr):
+        """
+        This method returns a tuple of the worksheet title and its compiled
+        RollTable for treasure_type at the integer cr.
+        :param treasure_type: str, 'coin', 'magic', or 'other'
+        :param cr: int
+        :return: 2-tuple of str and RollTable
+        """
+        ws_name = self.worksheet(treasure_type, cr)
+        return ws_name, self.roll_tables.get(self.wb_name, ws_name)
+
+    def problems(self):
+        """
+        This method returns a description of the gaps, overlaps, and invalid
+        titles found, or '' if there are none.
+        :return: str
+        """
+        return f"{self.gap_problems()} {self.errors()}".strip()
+
+    def gap_problems(self):
+        """
+        This method returns a description of the gaps found, or '' if there are
+        none. A gap only matters if treasure is generated for its CR, so it is
+        a warning rather than an error.
+        :return: str
+        """
+        if self.gaps == []:
+            return ""
+        gap_txt = ', '.join(f"CR {cr} {treasure_type}"
+                            for cr, treasure_type in self.gaps)
+        return f"No worksheet covers: {gap_txt}."
+
+    def errors(self):
+        """
+        This method returns a description of the overlaps and invalid titles
+        found, or '' if there are none.
+        :return: str
+        """
+        msg = ""
+        if self.overlaps != []:
+            overlap_txt = ', '.join(f"CR {cr} {treasure_type} in {ws_name}"
+                                    for cr, treasure_type, ws_name in self.overlaps)
+            msg += f"Covered more than once: {overlap_txt}. "
+        if self.invalid_titles != []:
+            msg += (f"Titles that are not in the format 'Treasure For CRs m-n "
+                    f"Type': {', '.join(self.invalid_titles)}. ")
+        return msg.rstrip()
+
+
+def build_cr_index(required_tables, roll_tables=None):
+    """
+    This function finds the CR-based treasure workbook in the 'required
+    tables' section of config.json with find_cr_workbook() and returns its
+    CRIndex. Returns None if there is no CR-based workbook.
+    :param required_tables: dict
+    :param roll_tables: RollTableIndex or None
+    :return: CRIndex or None
+    """
+    cr_wb_name = find_cr_workbook(required_tables)
+    if cr_wb_name == '':
+        return None
+    return CRIndex(cr_wb_name, required_tables[cr_wb_name], roll_tables)
@@ -0,0 +1,63 @@
+import numpy as np
+
+CSV_FIELDS = ['index', 'challenge_rating', 'kind', 'name', 'detail', 'number',
+              'value']
+
+
+def json_default(obj):
+    """
+    This function is the default= hook of json.dumps() for treasure output.
+    Rolls made with NumPy, such as those of large dice pools, are NumPy ints.
+    :param obj: object
+    :return: int or float
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"json_default: {type(obj)} is not JSON serializable.")
+
+
+def treasure_record(index, result, seed):
+    """
+    This function turns a TreasureResult into the dict written for it as JSON:
+    its index in the output, challenge rating, the seed of the run, the
+    contents of the treasure (see Treasure.to_dict()), and its issues.
+    :param index: int, the position of the treasure in the output
+    :param result: TreasureResult
+    :param seed: int
+    :return: dict
+    """
+    return {'index': index, 'challenge_rating': result.challenge_rating,
+            'seed': seed, 'treasure': result.treasure.to_dict(),
+            'issues': [issue._asdict() for issue in result.issues]}
+
+
+def treasure_rows(index, result):
+    """
+    This generator function turns a TreasureResult into CSV rows, one for each
+    coin, magic item, gem, or valuable. A treasure with nothing in it still
+    gets a row, with an empty kind, so every treasure appears in the output.
+    :param index: int, the position of the treasure in the output
+    :param result: TreasureResult
+    :return: generator of dict
+    """
+    base = {'index': index, 'challenge_rating': result.challenge_rating}
+    contents = result.treasure.to_dict()
+    rows = 0
+    for coin in contents['coins']:
+        rows += 1
+        yield {**base, 'kind': 'coin', 'name': coin['type'], 'number': coin['number']}
+    for item in contents['magic_items']:
+        rows += 1
+        yield {**base, 'kind': 'magic item', 'name': item['name'],
+               'detail': item['source'], 'number': 1}
+    for gem in contents['gems']:
+        rows += 1
+        yield {**base, 'kind': 'gem', 'name': gem['type'],
+               'detail': gem['description'], 'number': 1, 'value': gem['value']}
+    for valuable in contents['valuables']:
+        rows += 1
+        yield {**base, 'kind': 'valuable', 'name': valuable['item'],
+               'detail': valuable['example'], 'number': 1,
+               'value': valuable['value']}
+    if rows == 0:
+        yield base
@@ -0,0 +1,255 @@
+import logging
+from collections import namedtuple
+from entities import compile_dice_expression
+from .treasure_index import parse_cr_worksheet_title
+
+logger = logging.getLogger(__name__)
+
+# A compiled coin entry rolls dice, multiplies the total by multiplier, and
+# pays it in currency, such as 'gp'. '900 (2d8 x 100) gp' compiles to
+# CoinPlan(dice='2d8', multiplier=100, currency='gp').
+CoinPlan = namedtuple('CoinPlan', ['dice', 'multiplier', 'currency'])
+# A compiled magic item entry makes number rolls (or rolls dice to find the
+# number) on Magic Items table, table. '1d4 rolls on Table: Magic Items #1'
+# compiles to MagicPlan(number=None, dice='1d4', table=1).
+MagicPlan = namedtuple('MagicPlan', ['number', 'dice', 'table'])
+# A compiled other valuables entry picks number items (or rolls dice to find
+# the number) of item_type, 'gems' or 'valuables', worth value, such as
+# '10 gold'. '7 (2d6) 10 gp gems' compiles to
+# OtherValPlan(number=None, dice='2d6', item_type='gems', value='10 gold').
+OtherValPlan = namedtuple('OtherValPlan', ['number', 'dice', 'item_type', 'value'])
+
+# Cells with these values produce no treasure of their type.
+EMPTY_RESULTS = (None, '-', 'nothing')
+DENOMINATIONS = {'pp': 'platinum', 'ep': 'electrum', 'gp': 'gold',
+                 'sp': 'silver', 'cp': 'copper'}
+
+
+def compile_dice(s):
+    """
+    This function checks that s is a valid dice expression, such as 'ndm' or
+    'nDm' where n and m are integers, and returns it without spaces. The
+    expression is compiled by compile_dice_expression(), so rolling it later
+    does not parse it again. A ValueError is raised if it is invalid.
+    :param s: str
+    :return: str
+    """
+    return compile_dice_expression(s).text
+
+
+def compile_coin_result(raw_result):
+    """
+    This function compiles a coin treasure cell in the format:
+    {value} ({dice combo} x {number}) {currency type}. The format can appear
+    multiple times with a comma separating each set. The multiplier is
+    optional. It returns a tuple of CoinPlan. A ValueError is raised if an
+    entry does not have this format.
+    :param raw_result: str
+    :return: tuple of CoinPlan
+    """
+    plans = []
+    for result in str(raw_result).split(', '):
+        result = result.replace(",", "").rstrip()
+        try:
+            l_paren = result.index('(')
+            r_paren = result.index(')')
+        except ValueError:
+            raise ValueError(f"compile_coin_result: Coin entry, {result}, must "
+                             f"contain a dice roll in parentheses.")
+        coin_amt = result[l_paren + 1:r_paren]
+        if 'x' in coin_amt:
+            dice_txt, number_txt = coin_amt.split('x', 1)
+            try:
+                multiplier = int(number_txt)
+            except ValueError:
+                raise ValueError(f"compile_coin_result: Coin entry, {result}, has "
+                                 f"an invalid multiplier, {number_txt.strip()}.")
+        else:
+            dice_txt = coin_amt
+            multiplier = 1
+        currency = result[-2:]
+        if currency not in DENOMINATIONS:
+            raise ValueError(f"compile_coin_result: Coin entry, {result}, must end "
+                             f"with a currency: {', '.join(DENOMINATIONS)}.")
+        plans.append(CoinPlan(dice=compile_dice(dice_txt), multiplier=multiplier,
+                              currency=currency))
+    return tuple(plans)
+
+
+def compile_magic_result(raw_result):
+    """
+    This function compiles a magic items cell such as
+    '1d4 rolls on Table: Magic Items #1, 1 roll on Table: Magic Items #2'. The
+    number of rolls is an integer or a dice roll. It returns a tuple of
+    MagicPlan. A ValueError is raised if an entry does not have this format.
+    :param raw_result: str
+    :return: tuple of MagicPlan
+    """
+    plans = []
+    for item in str(raw_result).split(', '):
+        item = item.rstrip().lower().replace('.', '').replace(':', '')
+        try:
+            rolls_txt = item[:item.index('r') - 1]
+            table = int(item[item.index('#') + 1:])
+        except ValueError:
+            raise ValueError(f"compile_magic_result: Magic item entry, {item}, "
+                             f"must be in the format 'n rolls on Table: Magic "
+                             f"Items #N'.")
+        try:
+            plans.append(MagicPlan(number=int(rolls_txt), dice=None, table=table))
+        except ValueError:
+            plans.append(MagicPlan(number=None, dice=compile_dice(rolls_txt),
+                                   table=table))
+    return tuple(plans)
+
+
+def compile_other_val_result(raw_result):
+    """
+    This function compiles an other valuables cell. The entry format is
+    m (ndo) p 'den' 'type', where m, n, o, and p are integers, d denotes dice,
+    'den' is a 2-letter string for the primary currency (e.g. 'gp' or 'sp'),
+    and 'type' is 'gems' or 'valuables'. If there is only one item, the format
+    is p 'den' 'type'. Entries are separated by commas. An unknown currency is
+    treated as gold. It returns a tuple of OtherValPlan. A ValueError is raised
+    if an entry does not have this format.
+    :param raw_result: str
+    :return: tuple of OtherValPlan
+    """
+    plans = []
+    for item in str(raw_result).split(', '):
+        contents = [element for element in item.rstrip().lower().split(' ')
+                    if element != '']
+        if len(contents) < 3:
+            raise ValueError(f"compile_other_val_result: Other valuables entry, "
+                             f"{item}, must end with a value, a currency, and "
+                             f"'gems' or 'valuables'.")
+        if 'valuable' in contents[-1]:
+            item_type = 'valuables'
+        else:
+            item_type = 'gems'
+        denomination = DENOMINATIONS.get(contents[-2], 'gold')
+        value = f"{contents[-3]} {denomination}"
+        if len(contents) == 3:
+            plans.append(OtherValPlan(number=1, dice=None, item_type=item_type,
+                                      value=value))
+        else:
+            # The first number is an average roll and is ignored. The slice
+            # removes the parentheses.
+            plans.append(OtherValPlan(number=None, dice=compile_dice(contents[1][1:-1]),
+                                      item_type=item_type, value=value))
+    return tuple(plans)
+
+
+def compile_treasure_result(treasure_type, raw_result):
+    """
+    This function compiles a cell of a CR-based treasure worksheet of the
+    given treasure_type, 'coin', 'magic', or 'other', into a tuple of plans.
+    Empty cells, '-', and 'nothing' compile to an empty tuple. A ValueError is
+    raised if the cell cannot be compiled.
+    :param treasure_type: str
+    :param raw_result: str or None
+    :return: tuple of CoinPlan, MagicPlan, or OtherValPlan
+    """
+    if raw_result in EMPTY_RESULTS:
+        return ()
+    match treasure_type:
+        case 'coin':
+            return compile_coin_result(raw_result)
+        case 'magic':
+            return compile_magic_result(raw_result)
+        case 'other':
+            return compile_other_val_result(raw_result)
+        case _:
+            raise ValueError(f"compile_treasure_result: Invalid treasure type, "
+                             f"{treasure_type}.")
+
+
+class TreasurePlans:
+    """
+    This class holds the compiled plans for every row of the worksheets in a
+    CRIndex. Every worksheet is compiled by compile_tables(), which StartWindow
+    calls at load time, so malformed cells are found before any treasure is
+    generated. A worksheet whose table was replaced by a hot reload is compiled
+    again the next time it is used.
+    """
+    def __init__(self, cr_index, roll_tables):
+        self.cr_index = cr_index
+        self.roll_tables = roll_tables
+        self._compiled = {}
+
+    def compile_tables(self):
+        """
+        This method compiles every worksheet in the CR index. It returns a dict
+        mapping the worksheets that could not be compiled to their error
+        messages.
+        :return: dict
+        """
+        errors = {}
+        for ws_name in dict.fromkeys(self.cr_index.worksheets.values()):
+            try:
+                self._compile(ws_name)
+            except (KeyError, ValueError) as e:
+                errors[ws_name] = str(e)
+        logger.debug("TreasurePlans.compile_tables: Compiled %s worksheets. errors: "
+                     "%s.", len(self._compiled), errors)
+        return errors
+
+    def _compile(self, ws_name):
+        """
+        This method returns the compiled entry for ws_name, a tuple of its
+        RollTable and the list of plans for each row. An entry is reused as long
+        as its RollTable is still current.
+        :param ws_name: str
+        :return: 2-tuple of RollTable and list
+        """
+        table = self.roll_tables.get(self.cr_index.wb_name, ws_name)
+        entry = self._compiled.get(ws_name)
+        if entry is not None and entry[0] is table:
+            return entry
+        treasure_type = parse_cr_worksheet_title(ws_name)[2]
+        plans = []
+        for row, raw_result in enumerate(table.results):
+            try:
+                plans.append(compile_treasure_result(treasure_type, raw_result))
+            except ValueError as e:
+                raise ValueError(f"Row {row + 1}, {raw_result}: {e}")
+        entry = (table, plans)
+        self._compiled[ws_name] = entry
+        return entry
+
+    def get_plans(self, ws_name, roll):
+        """
+        This method returns the plans for the row of ws_name whose roll range
+        contains roll. A KeyError is raised if no row contains roll and a
+        ValueError if the worksheet cannot be compiled.
+        :param ws_name: str
+        :param roll: int
+        :return: tuple of plans
+        """
+        table, plans = self._compile(ws_name)
+        row = table.find_row(roll)
+        if row is None:
+            raise KeyError(roll)
+        return plans[row]
+
+    def expected_coins(self, cr):
+        """
+        This method returns the exact expected number of coins of each
+        currency in the coin treasure for cr. Each row of the coin worksheet is
+        weighted by the chance of rolling it, and each plan contributes the mean
+        of its dice distribution times its multiplier. No dice are rolled.
+        :param cr: int
+        :return: dict mapping currency, such as 'gp', to float
+        """
+        ws_name = self.cr_index.worksheet('coin', cr)
+        table, plans = self._compile(ws_name)
+        expected = {}
+        for row_chance, row_plans in zip(table.row_probabilities(), plans):
+            for plan in row_plans:
+                mean = compile_dice_expression(plan.dice).distribution().mean()
+                expected[plan.currency] = expected.get(plan.currency, 0.0) + \
+                    row_chance * mean * plan.multiplier
+        logger.debug("TreasurePlans.expected_coins: cr: %s. expected: %s.", cr,
+                     expected)
+        return expected
+
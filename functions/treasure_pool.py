@@ -0,0 +1,151 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from entities import RandomStream
+from .instrumentation import metrics, run_measured
+from .logging_config import configure_logging
+from .table_loading import LazyWorkbook
+from .treasure_engine import TreasureEngine
+
+logger = logging.getLogger(__name__)
+
+# The number of treasures each task generates. Larger chunks cost less to
+# send between processes; smaller ones spread a short batch over more workers.
+CHUNK_SIZE = 500
+# The number of tasks kept queued for each worker while results are streamed.
+TASKS_PER_WORKER = 2
+
+# The engine of a worker process, built once by _init_worker().
+_worker_engine = None
+
+
+def materialize_tables(tables):
+    """
+    This function returns a copy of tables in which every LazyWorkbook has
+    been fully loaded and replaced by a plain dict of its valid worksheets, so
+    the tables can be sent to another process. Other workbooks are shared, not
+    copied.
+    :param tables: dict mapping workbook names to dicts of worksheet titles
+        and pd.DataFrame, or LazyWorkbook
+    :return: dict
+    """
+    materialized = {}
+    for wb_name, ws_tables in tables.items():
+        if isinstance(ws_tables, LazyWorkbook):
+            ws_tables.warm_up()
+            ws_tables = ws_tables.to_dict()
+        materialized[wb_name] = ws_tables
+    return materialized
+
+
+def _init_worker(config, tables, log_level=None):
+    """
+    This function runs once in each worker process. It builds the engine that
+    every task of the worker uses, so the tables reach the worker only once.
+    With the 'fork' start method they are inherited rather than pickled.
+    log_level is the log level of the calling process, which a worker that was
+    not forked does not inherit. None leaves logging as it is.
+    """
+    global _worker_engine
+    if log_level is not None:
+        configure_logging(config.get('logging'), log_level)
+    _worker_engine = TreasureEngine(config, tables)
+
+
+def _generate_chunk(challenge_rating, number, rng):
+    """
+    This function generates number treasures for challenge_rating with the
+    worker's engine, drawing every roll from rng, and returns them as a list
+    of TreasureResult.
+    """
+    _worker_engine.rng = rng
+    return list(_worker_engine.generate_many(challenge_rating, number))
+
+
+def _merge_result(future):
+    """
+    This function returns the results of a task run by run_measured() and adds
+    the metrics the worker recorded for it to those of this process.
+    """
+    results, worker_metrics = future.result()
+    metrics.merge(worker_metrics)
+    return results
+
+
+def _chunks(crs, number, rng, chunk_size):
+    """
+    This generator function splits number treasures for each CR in crs into
+    tasks of at most chunk_size treasures. Each task gets its own child stream
+    of rng, in order, so the results do not depend on which worker runs it.
+    """
+    if isinstance(crs, (int, str)):
+        crs = (crs,)
+    for challenge_rating in crs:
+        remaining = number
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            remaining -= size
+            yield challenge_rating, size, rng.spawn(1)[0]
+
+
+def generate_treasures(config, tables, crs, number=1, rng=None, max_workers=None,
+                       chunk_size=CHUNK_SIZE):
+    """
+    This generator function is the multiprocess form of
+    TreasureEngine.generate_many(). It generates number treasures for each
+    challenge rating in crs on a process pool and yields them as
+    TreasureResult tuples, in the same order generate_many() would.
+
+    Each worker builds its own TreasureEngine from config and tables once, when
+    it starts. Lazily loaded workbooks are loaded in full first, by
+    materialize_tables(). The treasures are generated in tasks of chunk_size,
+    and each task draws from its own child stream of rng, a RandomStream. The
+    same seed and chunk_size give the same treasures whatever the number of
+    workers. If rng is None, a new stream is seeded from the operating system.
+
+    max_workers limits the number of worker processes. It defaults to the
+    number of CPUs. With max_workers set to 1, everything runs in the calling
+    process. The metrics recorded by the workers are added to those of the
+    calling process as their results arrive. A TreasureError for a CR with no worksheets is raised when that
+    CR's results are reached.
+    :param config: dict, the contents of config.json
+    :param tables: dict, as loaded by load_workbooks()
+    :param crs: int, str, or iterable of int or str
+    :param number: int, the number of treasures for each CR
+    :param rng: RandomStream or None
+    :param max_workers: int or None, defaults to the number of CPUs
+    :param chunk_size: int, the number of treasures in each task
+    :return: generator of TreasureResult
+    """
+    if rng is None:
+        rng = RandomStream()
+    logger.debug("generate_treasures: seed: %s. number: %s. chunk_size: %s.", rng.seed,
+                 number, chunk_size)
+    tables = materialize_tables(tables)
+    tasks = _chunks(crs, number, rng, chunk_size)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers <= 1:
+        _init_worker(config, tables)
+        for task in tasks:
+            yield from _generate_chunk(*task)
+        return
+
+    # Only a few tasks per worker are queued at a time, so a very large batch
+    # is streamed rather than held in memory.
+    log_level = logging.getLogger().getEffectiveLevel()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(config, tables, log_level)) as executor:
+        pending = deque()
+        try:
+            for task in tasks:
+                pending.append(executor.submit(run_measured, _generate_chunk, *task))
+                if len(pending) >= max_workers * TASKS_PER_WORKER:
+                    yield from _merge_result(pending.popleft())
+            while pending:
+                yield from _merge_result(pending.popleft())
+        finally:
+            # A caller that stops early does not wait for the queued tasks.
+            for future in pending:
+                future.cancel()
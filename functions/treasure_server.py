@@ -0,0 +1,280 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+from entities import RandomStream
+from .instrumentation import metrics, run_measured
+from .treasure_engine import TreasureError, parse_cr_list
+from .treasure_output import json_default, treasure_record
+from .treasure_pool import materialize_tables, _init_worker, _generate_chunk, _chunks
+
+HOST = '127.0.0.1'
+PORT = 8765
+# The largest number of treasures a single request may ask for.
+MAX_TREASURES = 100000
+# The number of treasures each worker task generates. A request for fewer is a
+# single task; larger requests are spread over the workers.
+CHUNK_SIZE = 250
+MAX_BODY_BYTES = 65536
+
+logger = logging.getLogger(__name__)
+
+
+def _generate_json(start, challenge_rating, number, rng, seed):
+    """
+    This function runs in a worker process. It generates number treasures for
+    challenge_rating from rng and returns their JSON records, numbered from
+    start, joined by commas, so the event loop only has to join the pieces.
+    """
+    results = _generate_chunk(challenge_rating, number, rng)
+    return ','.join(json.dumps(treasure_record(start + idx, result, seed),
+                               default=json_default)
+                    for idx, result in enumerate(results))
+
+
+class RequestError(ValueError):
+    """
+    This exception is raised for a request the server cannot answer. status is
+    the HTTPStatus of the response.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class TreasureServer:
+    """
+    This class answers treasure requests over HTTP on localhost. The tables are
+    loaded once by the caller and sent to each process of a worker pool when it
+    starts, as in generate_treasures(). The event loop only parses requests and
+    writes responses, so it stays responsive while the workers roll, and any
+    number of clients can be served at the same time.
+
+    GET /generate?cr=0-4,11&count=10&seed=123 or POST /generate with the JSON
+    body {"cr": ["0-4", "11"], "count": 10, "seed": 123} generates count
+    treasures for each CR. cr accepts everything parse_cr_list() does. Without
+    a seed, a new one is picked and returned. The response is a JSON object
+    with the seed, the number of treasures, latency_ms, and treasures, a list of
+    records in the JSON Lines format of generate_treasure.py. GET /health
+    reports the number of requests served and their mean latency. GET /metrics
+    returns metrics.snapshot(), which includes the stages timed in the workers.
+
+    The latency of every request, from the time it is read until its response
+    is written, is returned in the Server-Timing header and logged at the INFO level.
+    """
+    def __init__(self, config: dict, tables: dict, max_workers=None,
+                 max_treasures=MAX_TREASURES, chunk_size=CHUNK_SIZE):
+        self.config = config
+        self.tables = materialize_tables(tables)
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.max_treasures = max_treasures
+        self.chunk_size = chunk_size
+        self.executor = None
+        self.requests = 0
+        self.total_latency = 0.0
+
+    async def serve(self, host=HOST, port=PORT):
+        """
+        This coroutine starts the worker pool and answers requests until it is
+        cancelled.
+        :param host: str
+        :param port: int
+        :return: None
+        """
+        log_level = logging.getLogger().getEffectiveLevel()
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                            initializer=_init_worker,
+                                            initargs=(self.config, self.tables,
+                                                      log_level))
+        try:
+            server = await asyncio.start_server(self._handle_connection, host, port)
+            addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+            logger.info("TreasureServer.serve: Serving on %s with %s workers.",
+                        addresses, self.max_workers)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def run(self, host=HOST, port=PORT):
+        """
+        This method runs serve() until the process is interrupted, e.g. by
+        Ctrl+C.
+        :param host: str
+        :param port: int
+        :return: None
+        """
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            logger.info("TreasureServer.run: Stopped.")
+
+    async def _handle_connection(self, reader, writer):
+        """
+        This coroutine answers a single HTTP/1.1 request and closes the
+        connection.
+        """
+        start = time.perf_counter()
+        method = path = '-'
+        try:
+            method, target, body = await self._read_request(reader)
+            path = urlsplit(target).path
+            status, response = await self._dispatch(method, target, body)
+        except RequestError as e:
+            status, response = e.status, {'error': e.message}
+        except TreasureError as e:
+            status = HTTPStatus.UNPROCESSABLE_ENTITY
+            response = {'error': f"{e.severity}: {e.message}"}
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except Exception as e:
+            logger.exception("TreasureServer: %s %s failed: %r", method, path, e)
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            response = {'error': 'The treasure could not be generated.'}
+        latency_ms = (time.perf_counter() - start) * 1000
+        if 'latency_ms' in response:
+            response['latency_ms'] = round(latency_ms, 3)
+        payload = response.pop('_payload', None)
+        body = json.dumps(response).encode()
+        if payload is not None:
+            # The records were encoded by the workers and are spliced in.
+            body = body[:-1] + b', "treasures": [' + payload.encode() + b']}'
+        headers = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                   f"Content-Type: application/json\r\n"
+                   f"Content-Length: {len(body)}\r\n"
+                   f"Server-Timing: total;dur={latency_ms:.3f}\r\n"
+                   f"Connection: close\r\n\r\n")
+        try:
+            writer.write(headers.encode() + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.requests += 1
+        self.total_latency += latency_ms
+        logger.info("TreasureServer: %s %s %s %.1f ms", method, path, status.value,
+                    latency_ms)
+
+    @staticmethod
+    async def _read_request(reader):
+        """
+        This coroutine reads the request line, the headers, and the body of a
+        request. It returns the method, the target, and the body as bytes.
+        """
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed request line.")
+        method, target, _ = request_line
+        content_length = 0
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'content-length':
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    raise RequestError(HTTPStatus.BAD_REQUEST,
+                                       "Invalid Content-Length.")
+        if content_length < 0:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.")
+        if content_length > MAX_BODY_BYTES:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               "Request body is too large.")
+        body = await reader.readexactly(content_length) if content_length else b''
+        return method.upper(), target, body
+
+    async def _dispatch(self, method, target, body):
+        """
+        This coroutine routes a request and returns its status and the response
+        as a dict.
+        """
+        url = urlsplit(target)
+        match url.path:
+            case '/health':
+                mean = self.total_latency / self.requests if self.requests else 0.0
+                return HTTPStatus.OK, {'status': 'ok', 'workers': self.max_workers,
+                                       'requests': self.requests,
+                                       'mean_latency_ms': round(mean, 3)}
+            case '/metrics':
+                return HTTPStatus.OK, metrics.snapshot()
+            case '/generate':
+                if method == 'GET':
+                    query = parse_qs(url.query)
+                    params = {'cr': query.get('cr', []),
+                              'count': query.get('count', ['1'])[-1],
+                              'seed': query.get('seed', [None])[-1]}
+                elif method == 'POST':
+                    try:
+                        params = json.loads(body or b'{}')
+                    except json.decoder.JSONDecodeError:
+                        raise RequestError(HTTPStatus.BAD_REQUEST,
+                                           "The body is not valid JSON.")
+                    if not isinstance(params, dict):
+                        raise RequestError(HTTPStatus.BAD_REQUEST,
+                                           "The body must be a JSON object.")
+                else:
+                    raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED,
+                                       f"{method} is not supported.")
+                return HTTPStatus.OK, await self._generate(params)
+            case _:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {url.path}.")
+
+    async def _generate(self, params):
+        """
+        This coroutine checks the parameters of a generate request and spreads
+        its treasures over the worker pool, in chunks that each have their own
+        child stream of the request's RandomStream, as generate_treasures()
+        does. The same seed gives the same treasures.
+        """
+        cr_args = params.get('cr', [])
+        if isinstance(cr_args, (str, int)):
+            cr_args = [cr_args]
+        try:
+            crs = parse_cr_list([str(cr) for cr in cr_args])
+            count = int(params.get('count', 1))
+            seed = params.get('seed')
+            seed = None if seed in (None, '') else int(seed)
+        except (TypeError, ValueError) as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+        if not crs:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "At least one cr is required.")
+        if count < 1 or count * len(crs) > self.max_treasures:
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               f"count must be at least 1 and the request may ask "
+                               f"for at most {self.max_treasures} treasures.")
+
+        rng = RandomStream(seed)
+        loop = asyncio.get_running_loop()
+        futures = []
+        start = 1
+        for challenge_rating, size, stream in _chunks(crs, count, rng, self.chunk_size):
+            futures.append(loop.run_in_executor(self.executor, run_measured,
+                                                _generate_json, start,
+                                                challenge_rating, size, stream,
+                                                rng.seed))
+            start += size
+        try:
+            measured = await asyncio.gather(*futures)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        pieces = []
+        for piece, worker_metrics in measured:
+            pieces.append(piece)
+            metrics.merge(worker_metrics)
+        return {'seed': rng.seed, 'count': start - 1, 'latency_ms': None,
+                '_payload': ','.join(pieces)}
@@ -0,0 +1,121 @@
+import logging
+from .treasure_index import find_cr_workbook
+
+logger = logging.getLogger(__name__)
+
+WORKBOOK_ROLES = ('cr treasure', 'magic item', 'gems', 'valuables', 'character')
+# Magic Item tables are numbered from 1 to this value.
+MAGIC_ITEM_TABLES = 26
+
+
+def strip_workbook_extension(wb_name):
+    """
+    This function removes a 3 or 4 letter file extension, such as '.xls' or
+    '.xlsx', from a workbook name. Returns None if wb_name does not end with
+    one.
+    :param wb_name: str
+    :return: str or None
+    """
+    if len(wb_name) > 4 and wb_name[-4] == '.':
+        return wb_name[:-4]
+    elif len(wb_name) > 5 and wb_name[-5] == '.':
+        return wb_name[:-5]
+    return None
+
+
+class WorkbookRegistry:
+    """
+    This class sorts the workbooks in the 'required tables' section of
+    config.json by the role they play, so the treasure window does not test
+    every workbook name each time it needs a table. The roles are:
+        'cr treasure': the CR-based treasure workbook (see find_cr_workbook())
+        'magic item': names containing 'magic item'
+        'gems': names containing 'gems'
+        'valuables': names containing 'valuables'
+        'character': names containing 'character' (stat tables)
+    A workbook can have more than one role, e.g. 'Gems and Valuables.xlsx'.
+
+    The magic item worksheet names, '{wb_name_sans_ext} N', are built once for
+    each workbook and each N from 1 to MAGIC_ITEM_TABLES. The gem and valuable
+    worksheets for each item type and value are found on first use and
+    remembered.
+    """
+    def __init__(self, required_tables: dict):
+        self.required_tables = required_tables
+        self.roles = {role: [] for role in WORKBOOK_ROLES}
+        cr_wb_name = find_cr_workbook(required_tables)
+        if cr_wb_name != '':
+            self.roles['cr treasure'].append(cr_wb_name)
+        for wb_name in required_tables:
+            name = wb_name.lower()
+            if 'magic item' in name:
+                self.roles['magic item'].append(wb_name)
+            if 'gems' in name:
+                self.roles['gems'].append(wb_name)
+            if 'valuables' in name:
+                self.roles['valuables'].append(wb_name)
+            if 'character' in name:
+                self.roles['character'].append(wb_name)
+
+        # Magic item workbooks with an invalid extension map to None.
+        self.magic_item_ws_names = {}
+        self.wb_names_sans_ext = {}
+        for wb_name in self.roles['magic item']:
+            wb_name_sans_ext = strip_workbook_extension(wb_name)
+            self.wb_names_sans_ext[wb_name] = wb_name_sans_ext
+            if wb_name_sans_ext is None:
+                self.magic_item_ws_names[wb_name] = None
+            else:
+                self.magic_item_ws_names[wb_name] = {
+                    n: f"{wb_name_sans_ext} {n}"
+                    for n in range(1, MAGIC_ITEM_TABLES + 1)}
+        self._other_val_ws_names = {}
+        logger.debug("WorkbookRegistry: roles: %s.", self.roles)
+
+    def workbooks(self, role):
+        """
+        This method returns the list of workbook names with the given role, in
+        the order they appear in config.json.
+        :param role: str, one of WORKBOOK_ROLES
+        :return: list of str
+        """
+        return self.roles[role]
+
+    def magic_item_ws_name(self, wb_name, n):
+        """
+        This method returns the name of Magic Item table n in the magic item
+        workbook, wb_name. The format is '{wb_name_sans_ext} N'. A ValueError
+        is raised if the workbook name does not have a 3 or 4 letter extension.
+        :param wb_name: str
+        :param n: int
+        :return: str
+        """
+        entry = self.magic_item_ws_names[wb_name]
+        if entry is None:
+            raise ValueError(f"WorkbookRegistry.magic_item_ws_name: The magic item "
+                             f"workbook, {wb_name}, has an invalid name format.")
+        ws_name = entry.get(n)
+        if ws_name is None:
+            ws_name = f"{self.wb_names_sans_ext[wb_name]} {n}"
+        return ws_name
+
+    def other_val_ws_names(self, item_type, item_val):
+        """
+        This method returns the list of (wb_name, ws_name) tuples of the
+        worksheets for item_type, 'gems' or 'valuables', whose name contains
+        item_val, such as '10 gold'. The list is built once for each item type
+        and value.
+        :param item_type: str
+        :param item_val: str
+        :return: list of 2-tuples of str
+        """
+        key = (item_type, item_val)
+        ws_names = self._other_val_ws_names.get(key)
+        if ws_names is None:
+            ws_names = []
+            for wb_name in self.roles.get(item_type, []):
+                for ws_name in self.required_tables[wb_name]:
+                    if item_type in ws_name.lower() and item_val in ws_name.lower():
+                        ws_names.append((wb_name, ws_name))
+            self._other_val_ws_names[key] = ws_names
+        return ws_names
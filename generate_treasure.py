@@ -0,0 +1,287 @@
+"""
+This script generates treasure from the command line, without the GUI, and
+streams it as JSON Lines or CSV to stdout or a file. It loads the same
+my_data directory as main.py. For example,
+
+    python generate_treasure.py 0-4 11 41+ -n 100 --seed 12345 -o loot.jsonl
+
+generates 100 treasures for each CR from 0 to 4, 11, and 41+. With --serve, it
+keeps the tables loaded and answers requests over HTTP on localhost instead
+(see TreasureServer). Run it with -h for every option.
+"""
+from entities import RandomStream
+from functions import (load_workbooks, read_table_cache, find_cached_tables,
+                       write_table_cache, TreasureError,
+                       parse_cr_list, generate_treasures, CSV_FIELDS, json_default,
+                       treasure_record, treasure_rows, TreasureServer,
+                       configure_logging, metrics, Profiler)
+from functions.treasure_server import HOST, PORT
+import argparse
+import csv
+from contextlib import nullcontext
+from itertools import islice
+import json
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+DATA_DIRECTORY = 'my_data'
+CONFIG_FILE = 'config.json'
+TABLE_CACHE = 'table_cache.pkl'
+OUTPUT_FORMATS = ('jsonl', 'csv')
+
+
+@metrics.timed('load.load_tables')
+def load_tables(data_directory, config, use_cache=True, max_workers=None,
+                cache_fp=None):
+    """
+    This function loads and validates every workbook in the 'required tables'
+    section of config, taking unchanged workbooks from the compiled table
+    cache the GUI writes. Every worksheet is loaded up front, since a batch
+    run uses most of them. Problems that stop the GUI from starting raise a
+    ValueError here.
+    :param data_directory: str
+    :param config: dict, the contents of config.json
+    :param use_cache: bool, False ignores the table cache
+    :param max_workers: int or None, processes used to load workbooks
+    :param cache_fp: str or None, the table cache file, defaults to the one in
+        data_directory
+    :return: dict, tables as StartWindow.tables holds them
+    """
+    required_tables = config['tables']['required tables']
+    wb_names = list(required_tables)
+    wb_fps = [f"{data_directory}/{wb_name}" for wb_name in wb_names]
+    if not use_cache:
+        table_cache_fp = None
+    elif cache_fp is not None:
+        table_cache_fp = cache_fp
+    else:
+        table_cache_fp = f"{data_directory}/{TABLE_CACHE}"
+    cache = read_table_cache(table_cache_fp)
+    cached_tables, fingerprints = find_cached_tables(cache, wb_fps, wb_names,
+                                                     required_tables)
+    changed_names = [wb_name for wb_name in wb_names if wb_name not in cached_tables]
+    changed_fps = [wb_fps[idx] for idx, wb_name in enumerate(wb_names)
+                   if wb_name not in cached_tables]
+    logger.debug("load_tables: Workbooks to be parsed: %s.", changed_names)
+    workbook_checks = load_workbooks(changed_fps, changed_names, required_tables,
+                                     max_workers=max_workers)
+    problems = []
+    if workbook_checks['missing'] is not None:
+        problems.append(f"Required workbooks could not be found: "
+                        f"{', '.join(workbook_checks['missing'])}.")
+    if workbook_checks['corrupt'] is not None:
+        problems.append(f"Required workbooks could not be opened: "
+                        f"{', '.join(workbook_checks['corrupt'])}.")
+    for key, description in (('missing_worksheets', 'Missing'),
+                             ('corrupt_worksheets', 'Corrupt'),
+                             ('bad_format', 'Invalid')):
+        for wb, ws_list in workbook_checks[key].items():
+            problems.append(f"{description} worksheets in {wb}: {', '.join(ws_list)}.")
+    if problems:
+        raise ValueError(' '.join(problems))
+
+    tables = {}
+    for wb_name in wb_names:
+        if wb_name in cached_tables:
+            tables[wb_name] = cached_tables[wb_name]
+        else:
+            tables[wb_name] = workbook_checks['tables'][wb_name]
+    if table_cache_fp is not None and changed_names:
+        write_table_cache(table_cache_fp, tables, fingerprints, required_tables)
+    return tables
+
+
+def write_results(results, stream, output_format, seed):
+    """
+    This function writes each TreasureResult in results to stream as soon as it
+    is generated, so nothing is held in memory. JSON Lines output has one
+    object per treasure with its index, challenge rating, seed, contents, and
+    issues. CSV output has a header and one row per item (see treasure_rows()).
+    :param results: iterable of TreasureResult
+    :param stream: a text file object
+    :param output_format: str, 'jsonl' or 'csv'
+    :param seed: int, the seed of the run, recorded in JSON Lines output
+    :return: int, the number of treasures written
+    """
+    count = 0
+    if output_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for count, result in enumerate(results, start=1):
+            writer.writerows(treasure_rows(count, result))
+    else:
+        for count, result in enumerate(results, start=1):
+            record = treasure_record(count, result, seed)
+            stream.write(json.dumps(record, default=json_default) + '\n')
+    stream.flush()
+    return count
+
+
+def profile(profiler, label, **details):
+    """
+    This function returns profiler.profile(label, **details), or a context
+    manager that does nothing if profiler is None.
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.profile(label, **details)
+
+
+def profile_by_cr(results, profiler, crs, number, **details):
+    """
+    This generator function passes on results, the number treasures generated
+    for each CR in crs in turn, and profiles the generation of each CR's
+    treasures separately, labelled with its CR, as
+    TreasureWindow.generate_treasure() does. The treasures of a CR are held
+    until its profile ends, so writing them out is not profiled.
+    :param results: iterable of TreasureResult
+    :param profiler: Profiler
+    :param crs: list of str
+    :param number: int
+    :return: generator of TreasureResult
+    """
+    results = iter(results)
+    for cr in crs:
+        with profiler.profile('generate', cr=cr, number=number, **details):
+            batch = list(islice(results, number))
+        yield from batch
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Generate treasure without the GUI and stream it as JSON "
+                    "Lines or CSV.")
+    parser.add_argument('crs', nargs='*',
+                        help="challenge ratings, such as 0, 1/4, 11, 41+, or "
+                             "ranges such as 5-10")
+    parser.add_argument('-n', '--number', type=int, default=1,
+                        help="treasures to generate for each CR (default 1)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="random seed; the same seed replays the same "
+                             "treasures (default: a new seed, printed to stderr)")
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='jsonl',
+                        help="output format (default jsonl)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="output file (default: stdout)")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="worker processes for generation; 0 uses every CPU "
+                             "(default 1)")
+    parser.add_argument('-d', '--data-directory', default=DATA_DIRECTORY,
+                        help=f"directory with config.json and the workbooks "
+                             f"(default {DATA_DIRECTORY})")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="ignore the compiled table cache")
+    parser.add_argument('--serve', action='store_true',
+                        help="answer generate requests over HTTP instead of "
+                             "writing treasures")
+    parser.add_argument('--host', default=HOST,
+                        help=f"address the server listens on (default {HOST})")
+    parser.add_argument('--port', type=int, default=PORT,
+                        help=f"port the server listens on (default {PORT})")
+    parser.add_argument('--log-level', default=None,
+                        help="level of the messages logged to stderr, such as "
+                             "DEBUG or WARNING (default: the 'logging' section of "
+                             "config.json, or INFO)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="write the time taken by each stage of loading and "
+                             "generation to stderr as JSON when done")
+    parser.add_argument('--profile', metavar='DIRECTORY', default=None,
+                        help="profile loading and generation and write the "
+                             "reports to DIRECTORY; generation runs in this "
+                             "process")
+    parser.add_argument('--debug', action='store_const', const='DEBUG',
+                        dest='log_level', help="same as --log-level DEBUG")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        configure_logging(level=args.log_level)
+    except ValueError as e:
+        print(f"generate_treasure: {e}", file=sys.stderr)
+        return 2
+    if args.number < 1:
+        logger.error("generate_treasure: --number must be at least 1.")
+        return 2
+    try:
+        crs = parse_cr_list(args.crs)
+    except ValueError as e:
+        logger.error("generate_treasure: %s", e)
+        return 2
+    if not crs and not args.serve:
+        logger.error("generate_treasure: At least one CR is required.")
+        return 2
+    if args.profile is not None and args.serve:
+        logger.error("generate_treasure: --profile cannot be used with --serve.")
+        return 2
+
+    config_fp = f"{args.data_directory}/{CONFIG_FILE}"
+    try:
+        with open(config_fp, 'r') as f:
+            config = json.load(f)
+    except (FileNotFoundError, IOError, json.decoder.JSONDecodeError):
+        config = {}
+    if 'required tables' not in config.get('tables', {}):
+        logger.error("generate_treasure: Configuration file, %s, could not be read "
+                     "or is missing the required tables.", config_fp)
+        return 1
+    wb_names = list(config['tables']['required tables'])
+    profiler = None if args.profile is None else Profiler(args.profile)
+    try:
+        configure_logging(config.get('logging'), args.log_level)
+        with profile(profiler, 'load', workbooks=wb_names):
+            tables = load_tables(args.data_directory, config,
+                                 use_cache=not args.no_cache)
+    except ValueError as e:
+        logger.error("generate_treasure: %s", e)
+        return 1
+
+    max_workers = args.workers if args.workers > 0 else None
+    if profiler is not None and max_workers != 1:
+        # The profiler only sees this process.
+        logger.info("generate_treasure: --profile generates in a single process.")
+        max_workers = 1
+    if args.serve:
+        TreasureServer(config, tables, max_workers=max_workers).run(args.host,
+                                                                    args.port)
+        return 0
+
+    if args.output == '-':
+        # The csv module writes its own line endings.
+        sys.stdout.reconfigure(newline='')
+    rng = RandomStream(args.seed)
+    logger.info("generate_treasure: Random seed: %s.", rng.seed)
+    try:
+        with nullcontext(sys.stdout) if args.output == '-' else \
+                open(args.output, 'w', newline='') as stream:
+            # Any number of workers gives the same treasures for the same seed.
+            results = generate_treasures(config, tables, crs, args.number, rng=rng,
+                                         max_workers=max_workers)
+            if profiler is not None:
+                results = profile_by_cr(results, profiler, crs, args.number,
+                                        workbooks=wb_names, seed=rng.seed)
+            count = write_results(results, stream, args.format, rng.seed)
+    except TreasureError as e:
+        logger.error("generate_treasure: %s: %s", e.severity, e.message)
+        return 1
+    except BrokenPipeError:
+        # The reader, such as head, stopped early. Nothing more can be written.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except OSError as e:
+        logger.error("generate_treasure: Output, %s, could not be opened or "
+                     "written: %s", args.output, e)
+        return 2
+    logger.info("generate_treasure: Wrote %s treasures.", count)
+    if args.metrics:
+        json.dump(metrics.snapshot(), sys.stderr, indent=2)
+        sys.stderr.write('\n')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
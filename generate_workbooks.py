@@ -0,0 +1,293 @@
+"""
+This script writes a data directory of synthetic treasure workbooks, in the
+formats check_worksheet() accepts, and a config.json that requires all of
+them, so the loader and the treasure generator can be tested at any scale. It
+writes:
+
+    Treasure By CR.xlsx     coin, magic, and other valuables worksheets for
+                            each CR band
+    Gems and Valuables.xlsx a 3 column worksheet for each gem and valuable
+                            value, such as '50 Gold Gems'
+    Magic Items NN.xlsx     worksheets 'Magic Items NN 1' to 'Magic Items NN
+                            N', rolled on a d100 or a d1000
+
+conditions.json, damage_types.json, and highlighting.json are copied from the
+data directory of the program, so main.py can start on the new directory. For
+example, 50 magic item workbooks with 26 d1000 worksheets each:
+
+    python generate_workbooks.py -o scale_data --magic-books 50 \\
+        --magic-sheets 26 --magic-dice d1000
+
+The same seed writes the same workbooks. Run it with -h for every option.
+"""
+from functions import configure_logging
+from functions.workbook_roles import MAGIC_ITEM_TABLES
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIRECTORY = 'synthetic_data'
+# The JSON files copied from the program's own data directory.
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+JSON_FILES = ('conditions.json', 'damage_types.json', 'highlighting.json')
+CR_WORKBOOK = 'Treasure By CR.xlsx'
+OTHER_VAL_WORKBOOK = 'Gems and Valuables.xlsx'
+CR_BANDS = ('0', '1-4', '5-10', '11-16', '17-40', '41+')
+CR_DIE = 100
+CR_ROWS = 10
+GEM_VALUES = (10, 50, 100, 500, 1000, 5000)
+VALUABLE_VALUES = (25, 250, 750, 2500, 7500)
+OTHER_VAL_DIE = 12
+MAGIC_BOOKS = 2
+MAGIC_SHEETS = 9
+MAGIC_DICE = ('d100',)
+MAGIC_ROWS = 100
+SEED = 1
+CURRENCIES = ('cp', 'sp', 'ep', 'gp', 'pp')
+
+
+def roll_ranges(dice_size, rows, rng):
+    """
+    This function splits the rolls of a d{dice_size} into rows ranges of
+    random length that cover every roll once, such as ['1-3', '4', '5-20'].
+    The first range always covers at least 2 rolls, since pandas reads a '1'
+    at the top of the roll column back as a blank.
+    :param dice_size: int
+    :param rows: int, at most dice_size - 1
+    :param rng: random.Random
+    :return: list of str
+    """
+    rows = max(1, min(rows, dice_size - 1))
+    starts = [1] + sorted(rng.sample(range(3, dice_size + 1), rows - 1))
+    ends = [start - 1 for start in starts[1:]] + [dice_size]
+    return [str(start) if start == end else f"{start}-{end}"
+            for start, end in zip(starts, ends)]
+
+
+def _cr_sheet_title(band, treasure_type):
+    if '-' in band:
+        return f"Treasure For CRs {band} {treasure_type}"
+    return f"Treasure For CR {band} {treasure_type}"
+
+
+def cr_workbook(rng, magic_sheets, gem_values=GEM_VALUES,
+                valuable_values=VALUABLE_VALUES, bands=CR_BANDS, rows=CR_ROWS):
+    """
+    This function returns the worksheets of the CR-based treasure workbook.
+    Every band has a coin, a magic, and an other valuables worksheet rolled on
+    a d100. Higher bands pay more, roll more magic items, and find more
+    valuable gems. The first row of the magic and other valuables worksheets
+    is empty, as in the published tables.
+    :param rng: random.Random
+    :param magic_sheets: int, the number of Magic Items tables that exist
+    :return: dict mapping worksheet titles to pd.DataFrame
+    """
+    sheets = {}
+    for tier, band in enumerate(bands, start=1):
+        ranges = roll_ranges(CR_DIE, rows, rng)
+        coins = []
+        magic = [None]
+        other = [None]
+        for _ in range(len(ranges)):
+            entries = []
+            for currency in rng.sample(CURRENCIES, rng.randint(1, 3)):
+                number = rng.randint(1, 4 * tier)
+                size = rng.choice((4, 6, 8, 10))
+                multiplier = 10 ** rng.randint(0, min(tier, 4))
+                average = number * (size + 1) * multiplier // 2
+                entries.append(f"{average:,} ({number}d{size} x {multiplier:,}) "
+                               f"{currency}")
+            coins.append(', '.join(entries))
+        for _ in range(len(ranges) - 1):
+            entries = []
+            for _ in range(rng.randint(1, min(tier, 3))):
+                table = rng.randint(1, magic_sheets)
+                if rng.random() < 0.5:
+                    entries.append(f"1d{rng.choice((2, 4, 6))} rolls on Table: "
+                                   f"Magic Items #{table}")
+                else:
+                    number = rng.randint(1, tier)
+                    entries.append(f"{number} roll{'s' if number > 1 else ''} on "
+                                   f"Table: Magic Items #{table}")
+            magic.append(', '.join(entries))
+            entries = []
+            for _ in range(rng.randint(1, 2)):
+                if rng.random() < 0.5:
+                    item_type, values = 'gems', gem_values
+                else:
+                    item_type, values = 'valuables', valuable_values
+                value = values[min(len(values) - 1,
+                                   rng.randint(0, tier - 1) * len(values) // len(bands))]
+                number = rng.randint(1, 3)
+                size = rng.choice((4, 6, 8))
+                entries.append(f"{number * (size + 1) // 2} ({number}d{size}) "
+                               f"{value} gp {item_type}")
+            other.append(', '.join(entries))
+        sheets[_cr_sheet_title(band, 'Coin')] = pd.DataFrame(
+            {f"d{CR_DIE}": ranges, 'Coins': coins})
+        sheets[_cr_sheet_title(band, 'Magic')] = pd.DataFrame(
+            {f"d{CR_DIE}": ranges, 'Magic Items': magic})
+        sheets[_cr_sheet_title(band, 'Other')] = pd.DataFrame(
+            {f"d{CR_DIE}": ranges, 'Other': other})
+    return sheets
+
+
+def other_val_workbook(rng, gem_values=GEM_VALUES, valuable_values=VALUABLE_VALUES,
+                       dice_size=OTHER_VAL_DIE):
+    """
+    This function returns the 3 column gem and valuable worksheets, one for
+    each value, such as '10 Gold Gems' and '25 Gold Valuables'.
+    :param rng: random.Random
+    :return: dict mapping worksheet titles to pd.DataFrame
+    """
+    sheets = {}
+    for value in gem_values:
+        ranges = roll_ranges(dice_size, dice_size, rng)
+        sheets[f"{value} Gold Gems"] = pd.DataFrame(
+            {f"d{dice_size}": ranges,
+             'Gemstone': [f"Gem {value}-{idx}" for idx in range(len(ranges))],
+             'Description': [f"A {value} gp stone" for _ in ranges]})
+    for value in valuable_values:
+        ranges = roll_ranges(dice_size, dice_size, rng)
+        sheets[f"{value} Gold Valuables"] = pd.DataFrame(
+            {f"d{dice_size}": ranges,
+             'Valuable': [f"Valuable {value}-{idx}" for idx in range(len(ranges))],
+             'Example': [f"A {value} gp object" for _ in ranges]})
+    return sheets
+
+
+def magic_item_workbook(rng, wb_name_sans_ext, sheets=MAGIC_SHEETS,
+                        dice=MAGIC_DICE, rows=MAGIC_ROWS):
+    """
+    This function returns the worksheets '{wb_name_sans_ext} 1' to
+    '{wb_name_sans_ext} {sheets}' of a magic item workbook. The worksheets are
+    rolled on the dice in dice in turn, e.g. d100 and d1000, and have up to
+    rows rows.
+    :param rng: random.Random
+    :param wb_name_sans_ext: str
+    :return: dict mapping worksheet titles to pd.DataFrame
+    """
+    tables = {}
+    for n in range(1, sheets + 1):
+        die = dice[(n - 1) % len(dice)]
+        ranges = roll_ranges(int(die[1:]), rows, rng)
+        tables[f"{wb_name_sans_ext} {n}"] = pd.DataFrame(
+            {die: ranges,
+             'Magic Item': [f"{wb_name_sans_ext} item {n}-{idx}"
+                            for idx in range(len(ranges))]})
+    return tables
+
+
+def build_workbooks(magic_books=MAGIC_BOOKS, magic_sheets=MAGIC_SHEETS,
+                    magic_dice=MAGIC_DICE, magic_rows=MAGIC_ROWS, cr_rows=CR_ROWS,
+                    seed=SEED):
+    """
+    This function returns every synthetic workbook as a dict mapping workbook
+    names to dicts of worksheet titles and pd.DataFrame, in the order
+    config.json lists them.
+    :param magic_books: int
+    :param magic_sheets: int, from 1 to MAGIC_ITEM_TABLES
+    :param magic_dice: tuple of str, such as ('d100', 'd1000')
+    :param magic_rows: int
+    :param cr_rows: int
+    :param seed: int
+    :return: dict
+    """
+    rng = random.Random(seed)
+    workbooks = {CR_WORKBOOK: cr_workbook(rng, magic_sheets, rows=cr_rows),
+                 OTHER_VAL_WORKBOOK: other_val_workbook(rng)}
+    for book in range(1, magic_books + 1):
+        wb_name_sans_ext = f"Magic Items {book:02d}"
+        workbooks[f"{wb_name_sans_ext}.xlsx"] = magic_item_workbook(
+            rng, wb_name_sans_ext, magic_sheets, magic_dice, magic_rows)
+    return workbooks
+
+
+def write_workbooks(directory, workbooks):
+    """
+    This function writes each workbook in workbooks to directory, with a
+    config.json that requires every worksheet, and copies the JSON files the
+    program needs from its data directory.
+    :param directory: str
+    :param workbooks: dict, as returned by build_workbooks()
+    :return: None
+    """
+    os.makedirs(directory, exist_ok=True)
+    for wb_name, sheets in workbooks.items():
+        with pd.ExcelWriter(os.path.join(directory, wb_name)) as writer:
+            for ws_name, table in sheets.items():
+                table.to_excel(writer, sheet_name=ws_name)
+        logger.info("write_workbooks: Wrote %s with %s worksheets.", wb_name,
+                    len(sheets))
+    config = {'tables': {'required tables': {wb_name: list(sheets) for
+                                             wb_name, sheets in workbooks.items()}},
+              'stats': {}}
+    with open(os.path.join(directory, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=2)
+    for filename in JSON_FILES:
+        shutil.copy(os.path.join(DATA_DIRECTORY, filename),
+                    os.path.join(directory, filename))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Write synthetic treasure workbooks and a matching "
+                    "config.json for scale testing.")
+    parser.add_argument('-o', '--output', default=OUTPUT_DIRECTORY,
+                        help=f"directory the workbooks are written to (default "
+                             f"{OUTPUT_DIRECTORY})")
+    parser.add_argument('--magic-books', type=int, default=MAGIC_BOOKS,
+                        help=f"magic item workbooks (default {MAGIC_BOOKS})")
+    parser.add_argument('--magic-sheets', type=int, default=MAGIC_SHEETS,
+                        help=f"worksheets in each magic item workbook, at most "
+                             f"{MAGIC_ITEM_TABLES} (default {MAGIC_SHEETS})")
+    parser.add_argument('--magic-dice', nargs='+', default=list(MAGIC_DICE),
+                        choices=('d100', 'd1000'),
+                        help="dice of the magic item worksheets, used in turn "
+                             "(default d100)")
+    parser.add_argument('--magic-rows', type=int, default=MAGIC_ROWS,
+                        help=f"rows in each magic item worksheet (default "
+                             f"{MAGIC_ROWS})")
+    parser.add_argument('--cr-rows', type=int, default=CR_ROWS,
+                        help=f"rows in each CR worksheet (default {CR_ROWS})")
+    parser.add_argument('--seed', type=int, default=SEED,
+                        help=f"random seed (default {SEED})")
+    parser.add_argument('--log-level', default=None,
+                        help="level of the messages logged to stderr (default INFO)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        configure_logging(level=args.log_level)
+    except ValueError as e:
+        print(f"generate_workbooks: {e}", file=sys.stderr)
+        return 2
+    if args.magic_books < 1 or not 1 <= args.magic_sheets <= MAGIC_ITEM_TABLES:
+        logger.error("generate_workbooks: --magic-books must be at least 1 and "
+                     "--magic-sheets from 1 to %s.", MAGIC_ITEM_TABLES)
+        return 2
+    if args.magic_rows < 1 or args.cr_rows < 2:
+        logger.error("generate_workbooks: --magic-rows must be at least 1 and "
+                     "--cr-rows at least 2.")
+        return 2
+    workbooks = build_workbooks(args.magic_books, args.magic_sheets,
+                                tuple(args.magic_dice), args.magic_rows,
+                                args.cr_rows, args.seed)
+    write_workbooks(args.output, workbooks)
+    worksheets = sum(len(sheets) for sheets in workbooks.values())
+    logger.info("generate_workbooks: Wrote %s workbooks with %s worksheets to %s.",
+                len(workbooks), worksheets, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,16 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QFileDialog,
                                QMessageBox, QApplication, QMainWindow, QStatusBar,
                                QLabel, QHBoxLayout)
+from PySide6.QtCore import QFileSystemWatcher, QTimer
 
 from classes import TreasureWindow
-from functions import (find_workbooks, check_workbook, check_worksheet,
-                       fix_worksheet)
+from entities import RandomStream
+from functions import (load_workbooks, read_table_cache, find_cached_tables,
+                       write_table_cache, find_changed_files, is_cacheable,
+                       RollTableIndex, build_cr_index, WorkbookRegistry,
+                       TreasurePlans, configure_logging, metrics, Profiler)
+import argparse
+import logging
 import sys
 import json
 import os
@@ -12,17 +18,48 @@ import pandas as pd
 import numpy as np
 import openpyxl
 
+logger = logging.getLogger(__name__)
+
 DATA_DIRECTORY = 'my_data'
 CONDITIONS = f'{DATA_DIRECTORY}/conditions.json'
 DAMAGE_TYPES = f'{DATA_DIRECTORY}/damage_types.json'
 HIGHLIGHTING = f'{DATA_DIRECTORY}/highlighting.json'
 CONFIG_FILE = f'{DATA_DIRECTORY}/config.json'
+TABLE_CACHE = f'{DATA_DIRECTORY}/table_cache.pkl'
+# Number of processes used to load workbooks. None uses every CPU.
+LOAD_WORKERS = None
+# Magic item worksheets are loaded the first time they are rolled on. With
+# WARM_UP_MAGIC_ITEMS, the rest are loaded on a background thread after startup.
+LAZY_MAGIC_ITEMS = True
+WARM_UP_MAGIC_ITEMS = False
+# With HOT_RELOAD, edited workbooks and JSON files in DATA_DIRECTORY are reloaded
+# while the app runs. RELOAD_DELAY_MS lets the editor finish saving first.
+HOT_RELOAD = False
+RELOAD_DELAY_MS = 1000
+# Seed for the treasure rolls. The same seed replays the same session. None
+# picks a new seed every run; the seed used is printed at startup.
+RANDOM_SEED = None
+# Level of the messages logged to the console, such as 'DEBUG' or 'WARNING'.
+# None uses the 'logging' section of config.json, or 'INFO' without one.
+LOG_LEVEL = None
+# With SHOW_METRICS, the status bar shows how long loading took and the number
+# and mean time of the treasures generated, updated every METRICS_INTERVAL_MS.
+SHOW_METRICS = False
+METRICS_INTERVAL_MS = 1000
+# With PROFILE_DIRECTORY, or --profile DIRECTORY on the command line, startup and
+# every treasure generated are profiled and the reports are written there.
+PROFILE_DIRECTORY = None
 
 
 class StartWindow(QMainWindow):
     def __init__(self, conditions_fp=CONDITIONS, damage_types_fp=DAMAGE_TYPES,
-                 highlighting_fp=HIGHLIGHTING, config_file=CONFIG_FILE):
-        print(f"main: Starting StartWindow.__init__().")
+                 highlighting_fp=HIGHLIGHTING, config_file=CONFIG_FILE,
+                 table_cache_fp=TABLE_CACHE, load_workers=LOAD_WORKERS,
+                 lazy_magic_items=LAZY_MAGIC_ITEMS,
+                 warm_up_magic_items=WARM_UP_MAGIC_ITEMS, hot_reload=HOT_RELOAD,
+                 random_seed=RANDOM_SEED, log_level=LOG_LEVEL,
+                 show_metrics=SHOW_METRICS, profiler=None):
+        logger.debug("main: Starting StartWindow.__init__().")
         super().__init__()
         # Initialize to None any attributes handled by other methods,
         # such as init_ui, load_tables, load_config_files.
@@ -30,15 +67,36 @@ class StartWindow(QMainWindow):
         self.damage_types_fp = damage_types_fp
         self.highlighting_fp = highlighting_fp
         self.config_fp = config_file
+        # Setting table_cache_fp to None disables the compiled table cache.
+        self.table_cache_fp = table_cache_fp
+        self.load_workers = load_workers
+        self.lazy_magic_items = lazy_magic_items
+        self.warm_up_magic_items = warm_up_magic_items
+        self.log_level = log_level
+        self.profiler = profiler
+        self.rng = RandomStream(random_seed)
+        self.table_fingerprints = {}
+        self.cached_fingerprints = {}
+        self.json_fingerprints = {}
+        self.file_watcher = None
+        self.reload_timer = None
+        self.hot_reload_button = None
         self.workbook_fps = []
         self.workbook_names = []
         self.conditions = None
         self.damage_types = None
         self.highlighting = None
         self.tables = None
+        self.roll_tables = None
+        self.cr_index = None
+        self.cr_errors = []
+        self.workbook_roles = None
+        self.treasure_plans = None
         self.config = None
         self.hbox = None
         self.required_tables = None
+        self.metrics_label = None
+        self.metrics_timer = None
 
         # Create statusbar.
         self.statusbar = QStatusBar()
@@ -50,17 +108,51 @@ class StartWindow(QMainWindow):
         # Starting up the UI.
         self.init_ui()
         self.load_config_files()
+        logger.info("main: Random seed: %s.", self.rng.seed)
         self.load_tables()
-        print(f"init: Init process completed.")
+        if hot_reload:
+            self.start_hot_reload()
+        if show_metrics:
+            self.start_metrics()
+        logger.debug("init: Init process completed.")
 
+    @metrics.timed('load.load_tables')
     def load_tables(self):
         self.statusbar.showMessage("Loading and testing tables.")
 
-        print(f"load_tables: Starting StartWindow.load_tables().")
+        logger.debug("load_tables: Starting StartWindow.load_tables().")
         self.tables = {}
-        print(f"load_tables: StartWindow.workbook_fps: {self.workbook_fps}.")
-        print(f"load_tables: StartWindow.workbook_names: {self.workbook_names}.")
-        workbook_checks = find_workbooks(self.workbook_fps)
+        logger.debug("load_tables: StartWindow.workbook_fps: %s.", self.workbook_fps)
+        logger.debug("load_tables: StartWindow.workbook_names: %s.",
+                     self.workbook_names)
+        # Workbooks that have not changed since the last run are taken from the
+        # compiled table cache. They were already repaired and validated.
+        required_tables = self.config['tables']['required tables']
+        cache = read_table_cache(self.table_cache_fp)
+        cached_tables, fingerprints = find_cached_tables(cache, self.workbook_fps,
+                                                         self.workbook_names,
+                                                         required_tables)
+        changed_names = [wb_name for wb_name in self.workbook_names
+                         if wb_name not in cached_tables]
+        changed_fps = [self.workbook_fps[idx] for idx, wb_name in
+                       enumerate(self.workbook_names) if wb_name not in cached_tables]
+        if self.lazy_magic_items:
+            lazy_names = [wb_name for wb_name in changed_names
+                          if 'magic item' in wb_name.lower()]
+        else:
+            lazy_names = []
+        self.table_fingerprints = fingerprints
+        self.cached_fingerprints = {wb_name: entry['fingerprint'] for
+                                    wb_name, entry in cache.items()}
+        logger.debug("load_tables: Workbooks to be parsed: %s. Loaded on first use: "
+                     "%s.", changed_names, lazy_names)
+
+        # Each remaining workbook is opened once by a task on a process pool. The
+        # same task reports missing or corrupt workbooks and worksheets, returns
+        # the cleaned tables, and validates them.
+        workbook_checks = load_workbooks(changed_fps, changed_names, required_tables,
+                                         max_workers=self.load_workers,
+                                         lazy_names=lazy_names)
         if workbook_checks['missing'] is not None:
             missing_txt = ', '.join(str(e) for e in workbook_checks['missing'])
             error_msg = f"Required workbooks; {missing_txt}; could not be found."
@@ -76,21 +168,11 @@ class StartWindow(QMainWindow):
         # as missing or corrupt worksheets. Extra worksheets will be ignored.
         # The reason is that I often have "Blank" worksheets to make easier on
         # eyes, non-printable "dark theme" worksheets.
-        missing_worksheets = {}
-        corrupt_worksheets = {}
-        bad_format_worksheets = {}
-        print(f"load_tables: missing_worksheets: {missing_worksheets}. "
-              f"corrupt_worksheets: {corrupt_worksheets}. "
-              f"bad_format_worksheets: {bad_format_worksheets}")
-        print(f"load_tables: StartWindow.config: {self.config}.")
-        for idx, wb_name in enumerate(self.workbook_names):
-            wb_fp = self.workbook_fps[idx]
-            ws_list = self.config['tables']['required tables'][wb_name]
-            worksheet_checks = check_workbook(wb_fp, ws_list)
-            if worksheet_checks['missing'] is not None:
-                missing_worksheets[wb_fp] = worksheet_checks['missing']
-            if worksheet_checks['corrupt'] is not None:
-                corrupt_worksheets[wb_fp] = worksheet_checks['corrupt']
+        missing_worksheets = workbook_checks['missing_worksheets']
+        corrupt_worksheets = workbook_checks['corrupt_worksheets']
+        logger.debug("load_tables: missing_worksheets: %s. corrupt_worksheets: %s.",
+                     missing_worksheets, corrupt_worksheets)
+        logger.debug("load_tables: StartWindow.config: %s.", self.config)
         if missing_worksheets != {} or corrupt_worksheets != {}:
             missing_txt = ""
             corrupt_txt = ""
@@ -111,85 +193,129 @@ class StartWindow(QMainWindow):
 
             QMessageBox.critical(self, "Fatal Error", error_msg)
             self.exit_app()
-        # Now, after checking everything thoroughly, we can load the worksheets
-        # into tables.
-        for idx, wb_name in enumerate(self.workbook_names):
-            self.tables[wb_name] = {}
-            wb_fp = self.workbook_fps[idx]
-            ws_list = self.config['tables']['required tables'][wb_name]
-            f = pd.ExcelFile(wb_fp)
-            for ws_name in ws_list:
-                df = pd.read_excel(wb_fp, sheet_name=ws_name, index_col=0,
-                                   na_values=True)
-                df_pass_1 = df.replace(to_replace=np.nan, value=None)
-                # The following is a fix for an error in some magic item
-                # table conversions that changes a row in the form:
-                # '1', 'description' or 1, 'description' to
-                # np.NaN, 'description'. df_pass_1 then turns that
-                # 1 value into None.
-                if 'magic item' in ws_name.lower():
-                    df_pass_2 = fix_worksheet(df_pass_1)
-                    self.tables[wb_name][ws_name] = df_pass_2
-                else:
-                    self.tables[wb_name][ws_name] = df_pass_1
-
-            f.close()
+        # The workbooks were validated by the same tasks that loaded them.
+        loaded_tables = workbook_checks['tables']
+        bad_worksheets = workbook_checks['bad_format']
+        errors = sum(len(ws_list) for ws_list in bad_worksheets.values())
+        logger.debug("load_tables: loaded_tables: %s", loaded_tables)
+        logger.debug("load_tables: bad_worksheets: %s", bad_worksheets)
 
         self.statusbar.showMessage("Tables loaded. Application is ready.")
-        print(f"load_tables: tables: {self.tables}")
-
-        # Beginning table validation.
-        print(f"load_tables: Beginning table validation.")
-        bad_worksheets = {}
-        errors = 0
-        for wb_name in self.tables.keys():
-            print(f"load_tables: Starting validation of {wb_name} tables.")
-            # The structure of character-related tables differs from the rest.
-            # There is an override feature in check_worksheet that handles it.
-            stat_override = 'character' in wb_name.lower()
-            # We need a second override value, gem_override, to warn check_worksheet()
-            # to use a 3 column format tables used for gems and other valuables.
-            gem_override = ('gem' in wb_name.lower()) or \
-                           ('other valuable' in wb_name.lower())
-            bad_worksheets[wb_name] = None
-            bad_ws_list = []
-            for ws_name in self.tables[wb_name].keys():
-                # An error in Pandas conversion of some worksheets can result in first
-                # item in the roll_column being interpreted as a np.NaN and converted
-                # to None value. This only seems to happen when a '1' appears in the
-                # 0 element of the series.
-                if check_worksheet(self.tables[wb_name][ws_name], stat_override,
-                                   gem_override):
-                    print(f"load_tables: Validated worksheet, {ws_name}.")
-                else:
-                    bad_ws_list.append(ws_name)
-                    errors += 1
-                    print(f"load_tables: Worksheet, {ws_name}, has invalid formatting.")
-
-            if len(bad_ws_list) != 0:
-                bad_worksheets[wb_name] = bad_ws_list
-                print(f"load_tables: bad_worksheets: {bad_worksheets}")
-            else:
-                print(f"load_tables: Workbook, {wb_name}, has been fully validated.")
 
         if errors != 0:
             error_msg = ""
             invalid_txt = ""
             for wb_name in bad_worksheets.keys():
-                if bad_worksheets[wb_name] is not None:
-                    ws_list = ', '.join(str(e) for e in bad_worksheets[wb_name])
-                    invalid_txt = (f"For workbook, {wb_name}, these worksheets have an "
-                                   f"invalid format: {ws_list}. {invalid_txt}")
+                ws_list = ', '.join(str(e) for e in bad_worksheets[wb_name])
+                invalid_txt = (f"For workbook, {wb_name}, these worksheets have an "
+                               f"invalid format: {ws_list}. {invalid_txt}")
             error_msg = (f"Invalid formatting of worksheets found, listed by workbook: "
                          f"{invalid_txt}")
             QMessageBox.critical(self, "Fatal Error", error_msg)
             self.exit_app()
         else:
-            print(f"load_tables: All worksheets are valid and ready to use.")
-            print(f"load_tables: Completed StartWindow.load_tables().")
+            logger.debug("load_tables: All worksheets are valid and ready to use.")
+
+        # The tables keep the order of the workbooks in config.json.
+        for wb_name in self.workbook_names:
+            if wb_name in cached_tables:
+                self.tables[wb_name] = cached_tables[wb_name]
+            else:
+                self.tables[wb_name] = loaded_tables[wb_name]
+        if self.warm_up_magic_items:
+            for wb_name in lazy_names:
+                self.tables[wb_name].start_warm_up()
+        self.save_table_cache()
+
+        # Compile the roll column of every table into a lookup index.
+        self.roll_tables = RollTableIndex(self.tables)
+        self.roll_tables.compile_tables()
+        self.load_cr_index()
+        self.workbook_roles = WorkbookRegistry(self.config['tables']['required tables'])
+        logger.debug("load_tables: Completed StartWindow.load_tables().")
+
+    def load_cr_index(self):
+        """
+        This method indexes the worksheets of the CR-based treasure workbook by
+        CR and treasure type and compiles their cells into treasure plans.
+        Overlaps in the CR ranges and malformed cells are reported now, rather
+        than when a treasure is generated for the affected CR. Gaps are only
+        logged as warnings, since a group may never need those CRs.
+        :return: None
+        """
+        required_tables = self.config['tables']['required tables']
+        self.cr_index, self.treasure_plans, errors, warnings = self._build_cr_index(
+            required_tables, self.roll_tables)
+        self.cr_errors = errors
+        for warning_msg in warnings:
+            logger.warning("load_cr_index: %s", warning_msg)
+        for error_msg in errors:
+            QMessageBox.critical(self, "Serious Error", error_msg)
+
+    @staticmethod
+    def _build_cr_index(required_tables, roll_tables):
+        """
+        This static method builds the CR index and the treasure plans of the
+        CR-based treasure workbook from roll_tables. It returns them with the
+        lists of errors and warnings found. Overlaps, invalid titles, and
+        treasure cells that cannot be compiled are errors. CRs without a
+        worksheet are warnings. The CR index and treasure plans are None if
+        there is no CR-based workbook.
+        :param required_tables: dict
+        :param roll_tables: RollTableIndex
+        :return: 4-tuple of CRIndex, TreasurePlans, list of str, and list of str
+        """
+        errors = []
+        warnings = []
+        cr_index = build_cr_index(required_tables, roll_tables)
+        if cr_index is None:
+            return None, None, errors, warnings
+        if cr_index.gap_problems() != "":
+            warnings.append(f"The CR-based treasure workbook, {cr_index.wb_name}, "
+                            f"has CRs without a worksheet. Treasure cannot be "
+                            f"generated for the CRs listed. "
+                            f"{cr_index.gap_problems()}")
+        if cr_index.errors() != "":
+            errors.append(f"The CR-based treasure workbook, {cr_index.wb_name}, "
+                          f"has problems with its CR ranges. "
+                          f"{cr_index.errors()}")
+        treasure_plans = TreasurePlans(cr_index, roll_tables)
+        plan_errors = treasure_plans.compile_tables()
+        if plan_errors != {}:
+            error_msg = (f"The CR-based treasure workbook, {cr_index.wb_name}, "
+                         f"has entries that cannot be used. Treasure cannot be "
+                         f"generated from these worksheets: ")
+            for ws_name, error in plan_errors.items():
+                error_msg += f"{ws_name}: {error} "
+            errors.append(error_msg.rstrip())
+        return cr_index, treasure_plans, errors, warnings
+
+    def save_table_cache(self):
+        """
+        This method writes the validated tables to the compiled table cache. The
+        cache is rewritten when a workbook changed or was only touched, so its
+        content hash does not have to be recomputed on every start. A lazily
+        loaded workbook is only stored once all of its worksheets have been
+        loaded and validated.
+        :return: None
+        """
+        if self.table_cache_fp is None or self.tables is None:
+            return
+        cacheable_tables = {wb_name: ws_tables
+                            for wb_name, ws_tables in self.tables.items()
+                            if is_cacheable(ws_tables)}
+        refresh_cache = any(self.cached_fingerprints.get(wb_name) !=
+                            self.table_fingerprints[wb_name]
+                            for wb_name in cacheable_tables)
+        if refresh_cache:
+            required_tables = self.config['tables']['required tables']
+            if write_table_cache(self.table_cache_fp, cacheable_tables,
+                                 self.table_fingerprints, required_tables):
+                self.cached_fingerprints = {wb_name: self.table_fingerprints[wb_name]
+                                            for wb_name in cacheable_tables}
 
     def check_config_file(self, filepath):
-        print(f"check_config_file: Starting StartWindow.check_config_file().")
+        logger.debug("check_config_file: Starting StartWindow.check_config_file().")
         content = ""
         try:
             with open(filepath, "r") as f:
@@ -210,22 +336,23 @@ class StartWindow(QMainWindow):
                 self.exit_app()
             else:
                 return json_content
-        print(f"check_config_file: Completed StartWindow.check_config_file().")
+        logger.debug("check_config_file: Completed StartWindow.check_config_file().")
 
     def load_config_files(self):
         self.statusbar.showMessage("Loading and testing configuration files.")
 
-        print(f"load_config_files: Starting StartWindow.load_config_files().")
+        logger.debug("load_config_files: Starting StartWindow.load_config_files().")
         self.config = self.check_config_file(self.config_fp)
-        print(f"load_config_files: config: {self.config}")
+        self.configure_logging()
+        logger.debug("load_config_files: config: %s", self.config)
         self.conditions = self.check_config_file(self.conditions_fp)
-        print(f"load_config_files: conditions: {self.conditions}")
+        logger.debug("load_config_files: conditions: %s", self.conditions)
         self.damage_types = self.check_config_file(self.damage_types_fp)
-        print(f"load_config_files: damage_types: {self.damage_types}")
+        logger.debug("load_config_files: damage_types: %s", self.damage_types)
         self.highlighting = self.check_config_file(self.highlighting_fp)
-        print(f"load_config_files: highlighting: {self.highlighting}")
+        logger.debug("load_config_files: highlighting: %s", self.highlighting)
         # Check config.json to see if it has required tables and workbook dictionary.
-        print(f"load_config_files: Checking configuration file.")
+        logger.debug("load_config_files: Checking configuration file.")
         try:
             required_fp_dict = self.config["tables"]['required tables']
         except KeyError:
@@ -246,45 +373,328 @@ class StartWindow(QMainWindow):
                 self.exit_app()
 
         self.statusbar.showMessage("Configuration loaded after passing tests.")
-        print(f"load_config_files: Configuration file passed checks.")
-        print(f"load_config_files: Completed StartWindow.load_config_files().")
+        logger.debug("load_config_files: Configuration file passed checks.")
+        logger.debug("load_config_files: Completed StartWindow.load_config_files().")
+
+    def configure_logging(self):
+        """
+        This method sets the log levels from LOG_LEVEL or the 'logging' section
+        of config.json. An invalid level is reported and the default levels
+        are used instead.
+        :return: None
+        """
+        try:
+            configure_logging(self.config.get('logging'), self.log_level)
+        except ValueError as e:
+            error_msg = (f"The logging section of {self.config_fp} is invalid. "
+                         f"The default log levels are used instead. {e}")
+            QMessageBox.critical(self, "Serious Error", error_msg)
+            configure_logging()
 
     def init_ui(self):
-        print(f"init_ui: Starting StartWindow.init_ui().")
+        logger.debug("init_ui: Starting StartWindow.init_ui().")
         self.setWindowTitle("NPC Generator with Treasures")
         self.setMinimumSize(400, 300)
 
         treasure_generator_button = QPushButton("Open Treasure Window")
         treasure_generator_button.clicked.connect(self.start_treasure_window)
+        self.hot_reload_button = QPushButton("Toggle Hot Reload On")
+        self.hot_reload_button.clicked.connect(self.toggle_hot_reload)
         exit_button = QPushButton("Exit")
         exit_button.clicked.connect(self.exit_app)
         self.setCentralWidget(QWidget(self))
         self.hbox = QHBoxLayout()
         self.centralWidget().setLayout(self.hbox)
         self.hbox.addWidget(treasure_generator_button)
+        self.hbox.addWidget(self.hot_reload_button)
         self.hbox.addWidget(exit_button)
 
         self.statusbar.showMessage("UI has started.")
 
-        print(f"init_ui: Completed StartWindow.init_ui().")
+        logger.debug("init_ui: Completed StartWindow.init_ui().")
 
     def start_treasure_window(self):
-        print(f"start_treasure_window: Starting StartWindow.start_treasure_window().")
+        logger.debug("start_treasure_window: Starting "
+                     "StartWindow.start_treasure_window().")
         self.statusbar.showMessage("Opening Treasure Generation Window")
         self.treasure_window = TreasureWindow(self.config, self.conditions,
                                               self.damage_types, self.highlighting,
-                                              self.tables)
+                                              self.tables, self.roll_tables,
+                                              self.cr_index,
+                                              self.workbook_roles,
+                                              self.treasure_plans,
+                                              self.rng, profiler=self.profiler)
         self.treasure_window.show()
-        print(f"start_treasure_window: Completed StartWindow.start_treasure_window().")
+        logger.debug("start_treasure_window: Completed "
+                     "StartWindow.start_treasure_window().")
+
+    def start_metrics(self):
+        """
+        This method adds a label to the status bar with a summary of the
+        metrics of this session and refreshes it every METRICS_INTERVAL_MS.
+        """
+        self.metrics_label = QLabel()
+        self.statusbar.addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start(METRICS_INTERVAL_MS)
+        self.update_metrics()
+
+    def update_metrics(self):
+        timers = metrics.snapshot()['timers']
+        text = []
+        load = timers.get('load.load_tables')
+        if load is not None:
+            text.append(f"Loaded in {load['total_ms']:.0f} ms")
+            slowest = metrics.slowest('load.read_excel')
+            if slowest is not None:
+                text.append(f"slowest: {slowest[0]} {slowest[1]:.0f} ms")
+        generated = timers.get('generate.treasure')
+        if generated is not None:
+            text.append(f"{generated['count']} treasures, "
+                        f"{generated['mean_ms']:.1f} ms each")
+        self.metrics_label.setText('. '.join(text) or "No metrics yet.")
+
+    def toggle_hot_reload(self):
+        if self.file_watcher is None:
+            self.start_hot_reload()
+        else:
+            self.stop_hot_reload()
+
+    def start_hot_reload(self):
+        """
+        This method starts watching the workbooks, the JSON files, and the
+        folders that hold them. Every change restarts reload_timer, so the
+        reload only runs once the editor has finished saving.
+        :return: None
+        """
+        logger.debug("start_hot_reload: Starting StartWindow.start_hot_reload().")
+        self.json_fingerprints = find_changed_files(self._json_files(), {})[1]
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(RELOAD_DELAY_MS)
+        self.reload_timer.timeout.connect(self.reload_changed_files)
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self._schedule_reload)
+        self.file_watcher.directoryChanged.connect(self._schedule_reload)
+        self._watch_files()
+        self.hot_reload_button.setText("Toggle Hot Reload Off")
+        self.statusbar.showMessage("Hot reload is on. Edited tables will be reloaded.")
+
+    def stop_hot_reload(self):
+        logger.debug("stop_hot_reload: Starting StartWindow.stop_hot_reload().")
+        self.reload_timer.stop()
+        self.file_watcher.deleteLater()
+        self.file_watcher = None
+        self.hot_reload_button.setText("Toggle Hot Reload On")
+        self.statusbar.showMessage("Hot reload is off.")
+
+    def _json_files(self):
+        return {'config': self.config_fp, 'conditions': self.conditions_fp,
+                'damage_types': self.damage_types_fp,
+                'highlighting': self.highlighting_fp}
+
+    def _watch_files(self):
+        """
+        This method adds every watched file and folder that exists to the
+        file watcher. Many editors save by replacing the file, which removes it
+        from the watcher, so this runs again after every reload.
+        :return: None
+        """
+        file_fps = list(self._json_files().values()) + self.workbook_fps
+        paths = file_fps + [os.path.dirname(fp) or '.' for fp in file_fps]
+        watched = self.file_watcher.files() + self.file_watcher.directories()
+        new_paths = [fp for fp in dict.fromkeys(paths)
+                     if os.path.exists(fp) and fp not in watched]
+        if new_paths != []:
+            self.file_watcher.addPaths(new_paths)
+
+    def _schedule_reload(self, path):
+        logger.debug("_schedule_reload: Change detected in %s.", path)
+        self.reload_timer.start()
+
+    def _read_json_file(self, filepath):
+        """
+        This method reads a JSON file for reload_changed_files(). Unlike
+        check_config_file(), it never closes the app. It returns a tuple of the
+        content (None on failure) and an error message ('' on success).
+        :param filepath: str
+        :return: 2-tuple of dict or None and str
+        """
+        try:
+            with open(filepath, "r") as f:
+                return json.loads(f.read()), ""
+        except (FileNotFoundError, IOError):
+            return None, f"File, {filepath}, could not be read or does not exist."
+        except json.decoder.JSONDecodeError:
+            return None, (f"File, {filepath}, is not a valid JSON file or may be "
+                          f"corrupted.")
+
+    def reload_changed_files(self):
+        """
+        This method reloads the JSON files and workbooks that changed since they
+        were loaded. Only changed workbooks, and workbooks whose worksheet list
+        changed in config.json, are parsed and validated again. Nothing is
+        replaced unless everything that changed loads and validates, including
+        the CR ranges and treasure cells of the CR-based workbook. Then the
+        new tables are swapped into the tables dict shared with the treasure
+        window one workbook at a time, so a lookup always sees a complete
+        workbook.
+        :return: None
+        """
+        logger.debug("reload_changed_files: Starting "
+                     "StartWindow.reload_changed_files().")
+        self._watch_files()
+        changed_json, json_fingerprints = find_changed_files(self._json_files(),
+                                                             self.json_fingerprints)
+        json_content = {}
+        errors = []
+        for name in changed_json:
+            content, error_msg = self._read_json_file(self._json_files()[name])
+            if content is None:
+                errors.append(error_msg)
+            else:
+                json_content[name] = content
+
+        config = json_content.get('config', self.config)
+        try:
+            required_tables = config['tables']['required tables']
+            workbook_names = list(required_tables.keys())
+        except (KeyError, TypeError, AttributeError):
+            errors.append(f"Config file, {self.config_fp} is missing the "
+                          f"dictionary of required tables.")
+            required_tables = self.config['tables']['required tables']
+            workbook_names = self.workbook_names
+        workbook_fps = [f"{DATA_DIRECTORY}/{wb_name}" for wb_name in workbook_names]
+        workbook_files = dict(zip(workbook_names, workbook_fps))
+        changed_names, fingerprints = find_changed_files(workbook_files,
+                                                         self.table_fingerprints)
+        old_required_tables = self.config['tables']['required tables']
+        for wb_name in workbook_names:
+            if wb_name not in changed_names and \
+                    required_tables[wb_name] != old_required_tables.get(wb_name):
+                changed_names.append(wb_name)
+        removed_names = [wb_name for wb_name in self.tables
+                         if wb_name not in workbook_names]
+        logger.debug("reload_changed_files: changed_json: %s. changed_names: %s. "
+                     "removed_names: %s.", changed_json, changed_names, removed_names)
+        if changed_json == [] and changed_names == [] and removed_names == []:
+            return
+
+        self.statusbar.showMessage("Reloading changed tables.")
+        changed_fps = [workbook_files[wb_name] for wb_name in changed_names]
+        if self.lazy_magic_items:
+            lazy_names = [wb_name for wb_name in changed_names
+                          if 'magic item' in wb_name.lower()]
+        else:
+            lazy_names = []
+        workbook_checks = load_workbooks(changed_fps, changed_names, required_tables,
+                                         max_workers=self.load_workers,
+                                         lazy_names=lazy_names)
+        if workbook_checks['missing'] is not None:
+            missing_txt = ', '.join(str(e) for e in workbook_checks['missing'])
+            errors.append(f"Required workbooks; {missing_txt}; could not be found.")
+        if workbook_checks['corrupt'] is not None:
+            corrupt_txt = ', '.join(str(e) for e in workbook_checks['corrupt'])
+            errors.append(f"Required workbooks; {corrupt_txt}; could not be opened.")
+        for wb_fp, ws_list in workbook_checks['missing_worksheets'].items():
+            errors.append(f"For workbook, {wb_fp}, missing worksheets: "
+                          f"{', '.join(ws_list)}.")
+        for wb_fp, ws_list in workbook_checks['corrupt_worksheets'].items():
+            errors.append(f"For workbook, {wb_fp}, corrupt worksheets: "
+                          f"{', '.join(ws_list)}.")
+        for wb_name, ws_list in workbook_checks['bad_format'].items():
+            errors.append(f"For workbook, {wb_name}, these worksheets have an "
+                          f"invalid format: {', '.join(ws_list)}.")
+        rebuild_cr_index = 'config' in changed_json or self.cr_index is None or \
+            self.cr_index.wb_name in changed_names
+        if errors == [] and rebuild_cr_index:
+            # The CR ranges and treasure cells are checked on the new tables
+            # before anything is swapped in. Only errors the tables in use do
+            # not already have block the reload.
+            candidate_tables = {wb_name: self.tables[wb_name]
+                                for wb_name in workbook_names
+                                if wb_name not in changed_names}
+            candidate_tables.update(workbook_checks['tables'])
+            _, _, cr_errors, _ = self._build_cr_index(required_tables,
+                                                      RollTableIndex(candidate_tables))
+            errors.extend(error_msg for error_msg in cr_errors
+                          if error_msg not in self.cr_errors)
+        if errors != []:
+            # The previous tables stay in use. The files are checked again the
+            # next time they change.
+            error_msg = (f"The changed files could not be reloaded. The tables "
+                         f"already loaded are still in use. {' '.join(errors)}")
+            QMessageBox.critical(self, "Serious Error", error_msg)
+            self.statusbar.showMessage("Reload failed. Previous tables are in use.")
+            return
+
+        # Everything loaded and validated. Swap it in.
+        self.config = config
+        self.configure_logging()
+        self.conditions = json_content.get('conditions', self.conditions)
+        self.damage_types = json_content.get('damage_types', self.damage_types)
+        self.highlighting = json_content.get('highlighting', self.highlighting)
+        self.workbook_names = workbook_names
+        self.workbook_fps = workbook_fps
+        for wb_name in changed_names:
+            self.tables[wb_name] = workbook_checks['tables'][wb_name]
+        for wb_name in removed_names:
+            del self.tables[wb_name]
+        self.json_fingerprints = json_fingerprints
+        self.table_fingerprints = fingerprints
+        if self.treasure_window is not None:
+            self.treasure_window.config = self.config
+            self.treasure_window.conditions = self.conditions
+            self.treasure_window.damage_types = self.damage_types
+            self.treasure_window.highlighting = self.highlighting
+            self.treasure_window.engine.config = self.config
+        if self.warm_up_magic_items:
+            for wb_name in lazy_names:
+                self.tables[wb_name].start_warm_up()
+        self.save_table_cache()
+        self.roll_tables.compile_tables()
+        if rebuild_cr_index:
+            self.load_cr_index()
+        if 'config' in changed_json:
+            self.workbook_roles = WorkbookRegistry(self.config['tables']['required tables'])
+        if self.treasure_window is not None:
+            self.treasure_window.engine.cr_index = self.cr_index
+            self.treasure_window.engine.treasure_plans = self.treasure_plans
+            self.treasure_window.engine.workbook_roles = self.workbook_roles
+        self._watch_files()
+        reloaded = ', '.join(changed_names + [self._json_files()[name]
+                                              for name in changed_json])
+        self.statusbar.showMessage(f"Reloaded: {reloaded}.")
+        logger.debug("reload_changed_files: Completed "
+                     "StartWindow.reload_changed_files().")
+
+    def closeEvent(self, event):
+        self.save_table_cache()
+        super().closeEvent(event)
 
     def exit_app(self):
+        self.save_table_cache()
         sys.exit()
 
 
 if __name__ == "__main__":
-    sys.argv += ['-platform', 'windows:darkmode=2']
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="NPC Generator with Treasures")
+    parser.add_argument('--profile', metavar='DIRECTORY', default=PROFILE_DIRECTORY,
+                        help="profile startup and every treasure generated and "
+                             "write the reports to DIRECTORY")
+    # The remaining arguments are left to Qt.
+    args, qt_args = parser.parse_known_args()
+    configure_logging(level=LOG_LEVEL)
+    qt_args = sys.argv[:1] + qt_args + ['-platform', 'windows:darkmode=2']
+    app = QApplication(qt_args)
     app.setStyle('Fusion')
-    window = StartWindow()
+    if args.profile is None:
+        window = StartWindow()
+    else:
+        profiler = Profiler(args.profile)
+        with profiler.profile('startup') as details:
+            window = StartWindow(profiler=profiler)
+            details['workbooks'] = window.workbook_names
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The tests import the modules of the program the way main.py does, from the
+# repository root, and run the GUI without a display.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
@@ -0,0 +1,48 @@
+import time
+import numpy as np
+import pytest
+from entities import Dice
+from entities.dice import (APPROXIMATE_EXACT_MAX_DROP_DICE, CDF_MAX_DROP_DICE,
+                           compile_dice_expression, return_die_roll)
+
+
+@pytest.mark.parametrize('drop_number', [1, 50])
+def test_approximate_mid_sized_drop_pool(drop_number):
+    dice = Dice(100, dice_number=100, drop_number=drop_number,
+                sampling='approximate')
+    assert dice.sampling_mode() == "edgeworth"
+    start = time.perf_counter()
+    dice.roll()
+    assert time.perf_counter() - start < 0.1
+
+
+def test_approximate_small_drop_pool_is_exact():
+    dice = Dice(6, dice_number=APPROXIMATE_EXACT_MAX_DROP_DICE, drop_number=1,
+                sampling='approximate')
+    assert dice.sampling_mode() == "cdf"
+
+
+def test_approximate_drop_pool_moments():
+    rng = np.random.default_rng(1)
+    approximate = Dice(6, dice_number=150, drop_number=75,
+                       sampling='approximate').roll_many(20000, rng=rng)
+    rolled = Dice(6, dice_number=150, drop_number=75).roll_many(20000, rng=rng)
+    assert abs(approximate.mean() - rolled.mean()) < 0.5
+    assert abs(approximate.std() - rolled.std()) < 0.5
+    assert approximate.min() >= 75 and approximate.max() <= 450
+
+
+def test_cdf_drop_pool_limit():
+    with pytest.raises(ValueError):
+        Dice(6, dice_number=CDF_MAX_DROP_DICE + 1, drop_number=1, sampling='cdf')
+
+
+
+def test_roll_type_is_case_insensitive():
+    assert 1 <= Dice(20, roll_type='Advantage').roll() <= 20
+
+
+def test_return_die_roll_passes_debug_to_dice():
+    assert compile_dice_expression('4d6dl1', True).dice.debug is True
+    assert compile_dice_expression('4d6dl1').dice.debug is False
+    assert 3 <= return_die_roll('4d6dl1', True) <= 18
@@ -0,0 +1,84 @@
+import json
+import pandas as pd
+import pytest
+from PySide6.QtWidgets import QApplication, QMessageBox
+import main
+
+CR_WORKBOOK = 'Treasure By CR.xlsx'
+# CR 41+ is left out, so the workbook has a gap from the start.
+CR_BANDS = ('CR 0', 'CRs 1-4', 'CRs 5-10', 'CRs 11-16', 'CRs 17-40')
+
+
+def cr_worksheets(coins):
+    """
+    This function returns the worksheets of a CR-based treasure workbook with
+    a worksheet of each treasure type for every band in CR_BANDS.
+    """
+    worksheets = {}
+    for band in CR_BANDS:
+        worksheets[f"Treasure For {band} Coin"] = pd.DataFrame(
+            {'D20': ['1-10', '11-20'], 'COINS': [coins, "700 (2d6 x 100) sp"]})
+        worksheets[f"Treasure For {band} Magic"] = pd.DataFrame(
+            {'D20': ['1-10', '11-20'], 'MAGIC ITEMS': [None, None]})
+        worksheets[f"Treasure For {band} Other"] = pd.DataFrame(
+            {'D20': ['1-10', '11-20'], 'OTHER': [None, None]})
+    return worksheets
+
+
+def write_workbook(fp, worksheets):
+    with pd.ExcelWriter(fp) as writer:
+        for ws_name, df in worksheets.items():
+            df.to_excel(writer, sheet_name=ws_name)
+
+
+@pytest.fixture
+def start_window(tmp_path, monkeypatch):
+    data_directory = tmp_path / main.DATA_DIRECTORY
+    data_directory.mkdir()
+    worksheets = cr_worksheets("900 (2d8 x 100) cp")
+    write_workbook(data_directory / CR_WORKBOOK, worksheets)
+    config = {'tables': {'required tables': {CR_WORKBOOK: list(worksheets)}},
+              'stats': {}}
+    (data_directory / 'config.json').write_text(json.dumps(config))
+    for json_file in ('conditions', 'damage_types', 'highlighting'):
+        (data_directory / f"{json_file}.json").write_text('{}')
+    monkeypatch.chdir(tmp_path)
+    dialogs = []
+    monkeypatch.setattr(QMessageBox, 'critical',
+                        staticmethod(lambda parent, title, text: dialogs.append(text)))
+    app = QApplication.instance() or QApplication([])
+    window = main.StartWindow(table_cache_fp=None, hot_reload=True)
+    yield window, dialogs
+    window.close()
+
+
+def test_reload_cr_workbook_with_gap(start_window):
+    window, dialogs = start_window
+    assert window.cr_index.gaps == [(41, 'coin'), (41, 'magic'), (41, 'other')]
+    assert dialogs == []
+    old_tables = window.tables[CR_WORKBOOK]
+
+    write_workbook(f"{main.DATA_DIRECTORY}/{CR_WORKBOOK}",
+                   cr_worksheets("800 (2d8 x 100) cp"))
+    window.reload_changed_files()
+
+    assert dialogs == []
+    assert window.tables[CR_WORKBOOK] is not old_tables
+    assert window.statusbar.currentMessage() == f"Reloaded: {CR_WORKBOOK}."
+
+
+def test_reload_rejects_new_overlap(start_window):
+    window, dialogs = start_window
+    old_tables = window.tables[CR_WORKBOOK]
+    worksheets = cr_worksheets("900 (2d8 x 100) cp")
+    worksheets['Treasure For CRs 3-4 Coin'] = worksheets['Treasure For CR 0 Coin']
+    write_workbook(f"{main.DATA_DIRECTORY}/{CR_WORKBOOK}", worksheets)
+    config = {'tables': {'required tables': {CR_WORKBOOK: list(worksheets)}},
+              'stats': {}}
+    with open(main.CONFIG_FILE, 'w') as f:
+        json.dump(config, f)
+    window.reload_changed_files()
+
+    assert len(dialogs) == 1
+    assert 'Covered more than once' in dialogs[0]
+    assert window.tables[CR_WORKBOOK] is old_tables